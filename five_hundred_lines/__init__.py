@@ -0,0 +1,23 @@
+'''Notes on "500 Lines or Less": a Python interpreter, a simple object model and an ORM.
+
+    import five_hundred_lines
+    five_hundred_lines.interpreter.VirtualMachine()   # imported here, on first use
+
+Importing the package or any of its modules has no side effects: the demos are in
+each module's main(), run them with python -m five_hundred_lines <module>.
+'''
+
+import importlib
+
+__all__ = ['interpreter', 'simple_object_model', 'metaclass_learn', 'metaclass_learn2', 'benchmark']
+
+
+def __getattr__(name):
+    # 子模块用到的时候才导入（PEP 562）
+    if name in __all__:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
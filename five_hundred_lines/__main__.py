@@ -0,0 +1,18 @@
+'''python -m five_hundred_lines <module> [args...]: run the demos (or "bench") of a module.'''
+
+import sys
+
+import five_hundred_lines
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in five_hundred_lines.__all__:
+        print('usage: python -m five_hundred_lines {%s} [args...]' % ','.join(five_hundred_lines.__all__),
+              file=sys.stderr)
+        return 2
+    return getattr(five_hundred_lines, argv[0]).main(argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
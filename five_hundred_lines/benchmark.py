@@ -0,0 +1,246 @@
+'''One benchmark runner for the interpreter, the object model and the ORM.
+
+    python -m five_hundred_lines.benchmark [-n N] [--warmup W] [--repeat R] [-k PATTERN] [-o results.json]
+                        [--baseline old.json] [--threshold 0.05] [--list]
+
+Every module keeps its scenarios as bench_* functions that return run(n):
+bench_x() has one variant, bench_x(flag) has two (flag False and True).
+Each (module, scenario, variant) runs in a fresh interpreter, so the caches,
+JIT traces and garbage of one scenario do not leak into the next.
+Only the standard library is needed.
+'''
+
+import argparse
+import contextlib
+import gc
+import importlib
+import inspect
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # 包所在的目录
+
+MODULES = ['interpreter', 'simple_object_model', 'metaclass_learn'] # 包里有bench_*的模块
+
+# 有的场景一次run(n)代价大得多：按场景名缩小n
+SCALE = {
+    ('metaclass_learn', 'define_models'): 0.01,
+    ('metaclass_learn', 'prepare_models'): 0.01,
+    ('interpreter', 'toy_program'): 0.05,
+}
+
+OUTLIER_MAD = 3.0 # 离中位数超过这么多倍MAD的计时不要
+
+
+def load_module(name):
+    return importlib.import_module('%s.%s' % (__package__ or 'five_hundred_lines', name))
+
+
+def discover(module):
+    '''(scenario, flag name or None) for every bench_* function of module.'''
+    scenarios = []
+    for name, func in sorted(vars(module).items()):
+        if not name.startswith('bench_') or name == 'bench_main' or not inspect.isfunction(func):
+            continue
+        parameters = list(inspect.signature(func).parameters)
+        scenarios.append((name[len('bench_'):], parameters[0] if parameters else None))
+    return scenarios
+
+
+def variants(flag):
+    return [None] if flag is None else [False, True]
+
+
+def reject_outliers(timings):
+    '''Split timings into (kept, rejected): more than OUTLIER_MAD median absolute
+    deviations away from the median is an outlier (a page fault, another process...).'''
+    median = statistics.median(timings)
+    mad = statistics.median(abs(t - median) for t in timings)
+    if mad == 0:
+        return list(timings), []
+    kept = [t for t in timings if abs(t - median) <= OUTLIER_MAD * mad]
+    rejected = [t for t in timings if abs(t - median) > OUTLIER_MAD * mad]
+    return kept, rejected
+
+
+def measure(run, n, warmup, repeat):
+    for i in range(warmup):
+        run(n)
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    try:
+        for i in range(repeat):
+            gc.collect()
+            gc.disable()
+            start = time.perf_counter()
+            run(n)
+            timings.append(time.perf_counter() - start)
+            gc.enable()
+    finally:
+        if not gc_was_enabled:
+            gc.disable()
+    kept, rejected = reject_outliers(timings)
+    median = statistics.median(kept)
+    return {
+        'n': n,
+        'median_sec': median,
+        'mean_sec': statistics.mean(kept),
+        'stdev_sec': statistics.stdev(kept) if len(kept) > 1 else 0.0,
+        'min_sec': min(kept),
+        'ops_per_sec': n / median if median else float('inf'),
+        'rejected': len(rejected),
+        'timings': timings,
+    }
+
+
+def run_scenario(module_name, scenario, variant, n, warmup, repeat):
+    '''Run one scenario in this process; what the scenario prints goes to stderr.'''
+    logging.root.setLevel(logging.WARNING)
+    with contextlib.redirect_stdout(sys.stderr):
+        module = load_module(module_name)
+        factory = getattr(module, 'bench_' + scenario)
+        run = factory() if variant is None else factory(variant)
+        return measure(run, n, warmup, repeat)
+
+
+def run_isolated(module_name, scenario, variant, n, warmup, repeat):
+    '''Run one scenario in a fresh interpreter, return its result dict.'''
+    command = [sys.executable, '-m', 'five_hundred_lines.benchmark', '--worker', module_name, scenario,
+               json.dumps(variant), '-n', str(n), '--warmup', str(warmup), '--repeat', str(repeat)]
+    process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {'error': process.stderr.strip().splitlines()[-1] if process.stderr.strip() else
+                'exit status %d' % process.returncode}
+    return json.loads(process.stdout)
+
+
+def measure_import(module, repeat=5):
+    '''Import module in a fresh interpreter with -X importtime, return the best
+    cumulative import time in seconds.'''
+    best = None
+    for i in range(repeat):
+        out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stderr
+        # import time: self [us] | cumulative | imported package
+        for line in out.splitlines():
+            parts = [p.strip() for p in line.split('|')]
+            if len(parts) == 3 and parts[2] == module:
+                cumulative = int(parts[1]) / 1e6
+                best = cumulative if best is None else min(best, cumulative)
+    return best
+
+
+def result_key(result):
+    variant = '' if result['variant'] is None else '[%s=%s]' % (result['flag'], result['variant'])
+    return '%s.%s%s' % (result['module'], result['scenario'], variant)
+
+
+def run_all(n=20000, warmup=1, repeat=7, patterns=None, isolated=True, log=None):
+    '''Discover and run every scenario (matching one of 'patterns'), return the report.'''
+    results = []
+    for module_name in MODULES:
+        for scenario, flag in discover(load_module(module_name)):
+            for variant in variants(flag):
+                result = {'module': module_name, 'scenario': scenario, 'flag': flag, 'variant': variant}
+                key = result_key(result)
+                if patterns and not any(pattern in key for pattern in patterns):
+                    continue
+                count = max(1, int(n * SCALE.get((module_name, scenario), 1)))
+                runner = run_isolated if isolated else run_scenario
+                result.update(runner(module_name, scenario, variant, count, warmup, repeat))
+                results.append(result)
+                if log:
+                    log(format_result(result))
+    return {
+        'python': sys.version.split()[0],
+        'implementation': sys.implementation.name,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'warmup': warmup,
+        'repeat': repeat,
+        'import_sec': {name: measure_import(load_module(name).__name__, repeat) for name in MODULES},
+        'results': results,
+    }
+
+
+def format_result(result):
+    if 'error' in result:
+        return '%-55s ERROR %s' % (result_key(result), result['error'])
+    return '%-55s %12.0f ops/s  +-%4.1f%%  (%d rejected)' % (
+        result_key(result), result['ops_per_sec'],
+        100 * result['stdev_sec'] / result['median_sec'] if result['median_sec'] else 0.0,
+        result['rejected'])
+
+
+def compare(report, baseline, threshold=0.05):
+    '''One row per scenario in both reports: the change of the median time per
+    operation, and whether it is a regression (slower by more than 'threshold').'''
+    old = {result_key(result): result for result in baseline['results'] if 'error' not in result}
+    rows = []
+    for result in report['results']:
+        key = result_key(result)
+        if 'error' in result or key not in old:
+            continue
+        before = old[key]['median_sec'] / old[key]['n']
+        after = result['median_sec'] / result['n']
+        change = after / before - 1 if before else 0.0
+        rows.append({'key': key, 'change': change, 'regression': change > threshold})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the bench_* scenarios of every module and compare against a baseline.')
+    parser.add_argument('-n', type=int, default=20000, help='operations per run (scaled down for the expensive scenarios)')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs before measuring')
+    parser.add_argument('--repeat', type=int, default=7, help='timed runs per scenario')
+    parser.add_argument('-k', dest='patterns', action='append', help='only run scenarios whose key contains this (repeatable)')
+    parser.add_argument('--no-isolate', action='store_true', help='run everything in this process')
+    parser.add_argument('-o', '--output', help='write the JSON report to this file')
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.05, help='slower than the baseline by more than this is a regression')
+    parser.add_argument('--list', action='store_true', help='only list the scenarios')
+    parser.add_argument('--worker', nargs=3, metavar=('MODULE', 'SCENARIO', 'VARIANT'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        module_name, scenario, variant = args.worker
+        result = run_scenario(module_name, scenario, json.loads(variant), args.n, args.warmup, args.repeat)
+        print(json.dumps(result))
+        return 0
+    if args.list:
+        for module_name in MODULES:
+            for scenario, flag in discover(load_module(module_name)):
+                for variant in variants(flag):
+                    print(result_key({'module': module_name, 'scenario': scenario, 'flag': flag, 'variant': variant}))
+        return 0
+
+    report = run_all(args.n, args.warmup, args.repeat, args.patterns, not args.no_isolate,
+                     log=lambda line: print(line, file=sys.stderr))
+    status = 1 if any('error' in result for result in report['results']) else 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(report, json.load(f), args.threshold)
+        report['baseline'] = {'path': args.baseline, 'threshold': args.threshold, 'rows': rows}
+        for row in rows:
+            print('%-55s %+7.1f%%%s' % (row['key'], 100 * row['change'], '  REGRESSION' if row['regression'] else ''),
+                  file=sys.stderr)
+        if any(row['regression'] for row in rows):
+            status = 1
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2749 @@
+'''A Python Interpreter Written in Python'''
+'''By Allison Kaptur'''
+
+# A tiny interpreter
+
+# three instructions:
+#   LOAD_VALUE
+#   ADD_TWO_VALUES
+#   PRINT_ANSWER
+
+import bisect
+import builtins
+import collections
+import dis # A bytecode disassembler in Python standard library.
+import functools
+import gc
+import hashlib
+import inspect
+import json
+import marshal
+import mmap
+import operator
+import os
+import struct
+import sys
+import textwrap
+import time
+import types
+
+
+
+class Interpreter:
+    def __init__(self, native=False):
+        self.stack = [] # A stack based interpreter
+        self.environment = {} # Keep tracking of what names are bound to what values
+        self.native = native # 把整个程序翻译成CPython的code object再跑，见compile_program
+
+    def LOAD_VALUE(self, number):
+        self.stack.append(number)
+
+    def PRINT_ANSWER(self):
+        answer = self.stack.pop()
+        print(answer)
+
+    def STORE_NAME(self, name):
+        # 从栈中取出一个值，将其与name绑定，存入environment字典中
+        val = self.stack.pop()
+        self.environment[name] = val
+
+    def LOAD_NAME(self, name):
+        # 把变量名对应的值压入栈中
+        val = self.environment[name]
+        self.stack.append(val)
+
+    def ADD_TWO_VALUES(self):
+        first_num = self.stack.pop()
+        second_num = self.stack.pop()
+        total = first_num + second_num
+        self.stack.append(total)
+
+    def parse_argument(self, instruction, argument, what_to_execute):
+        '''Understand what the argument to each instruction means.'''
+        # 传入的argument：指令中的0，1，2，...(index)
+        # 返回的argument：具体的值，如变量名称或栈中具体的数
+        numbers = ['LOAD_VALUE']
+        names = ['LOAD_NAME', 'STORE_NAME']
+
+        if instruction in numbers:
+            argument = what_to_execute['numbers'][argument]
+        elif instruction in names:
+            argument = what_to_execute['names'][argument]
+
+        return argument
+
+    # bad implementation:
+    # def run_code(self, what_to_execute):
+    #     instructions = what_to_execute['instructions']
+        
+    #     for each_step in instructions: # loop over each instructions
+    #         instruction, argument = each_step
+    #         argument = self.parse_argument(instruction, argument, what_to_execute)
+    #         if instruction == 'LOAD_VALUE':
+    #             self.LOAD_VALUE(argument)
+    #         elif instruction == 'ADD_TWO_VALUES':
+    #             self.ADD_TWO_VALUES()
+    #         elif instruction == 'PRINT_ANSWER':
+    #             self.PRINT_ANSWER()
+    #         elif instruction == 'STORE_NAME':
+    #             self.STORE_NAME(argument)
+    #         elif instruction == 'LOAD_NAME':
+    #             self.LOAD_NAME(argument)
+
+    # good implementation:
+    # make use of Python's dynamic method lookup, aka getattr()
+    def execute(self, what_to_execute):
+        if self.native and self.compilable():
+            program = compile_program(program_fingerprint(what_to_execute))
+            if program is not None:
+                program(self.environment, self.stack, what_to_execute.get('numbers', ()))
+                return
+        instructions = what_to_execute['instructions']
+        for each_step in instructions:
+            instruction, argument = each_step
+            argument = self.parse_argument(instruction, argument, what_to_execute)
+            bytecode_method = getattr(self, instruction)
+            if argument is None:
+                bytecode_method()
+            else:
+                bytecode_method(argument)
+
+    def compilable(self):
+        '''The native backend knows what the five instructions above do; a subclass
+        that changes one of them is interpreted.'''
+        cls = type(self)
+        return all(getattr(cls, instruction) is getattr(Interpreter, instruction)
+                   for instruction in NATIVE_INSTRUCTIONS)
+
+
+# --- native backend ---
+# 整个程序一次翻译成一个函数 program(environment, stack, numbers)：
+#   LOAD_VALUE 0; LOAD_NAME 0 (a); ADD_TWO_VALUES; STORE_NAME 1 (b)
+# 变成
+#   _0 = numbers[0]
+#   _1 = environment['a']
+#   _2 = _1 + _0
+#   environment['b'] = _2
+# 栈上的东西都成了局部变量，求值顺序和一条条解释执行完全一样。程序开始时栈上已经有的值用
+# stack.pop()取，结束时还留在栈上的值放回stack。数字在运行时从numbers里取，
+# 所以只是数字不同的程序共用同一个code object。名字是直接写进去的。
+
+NATIVE_INSTRUCTIONS = {'LOAD_VALUE', 'LOAD_NAME', 'STORE_NAME', 'ADD_TWO_VALUES', 'PRINT_ANSWER'}
+
+
+def program_fingerprint(what_to_execute):
+    '''What the translated code depends on: the instructions and the names.'''
+    return tuple(map(tuple, what_to_execute['instructions'])), tuple(what_to_execute.get('names', ()))
+
+
+@functools.lru_cache(maxsize=256)
+def compile_program(fingerprint):
+    '''Translate a program to a function program(environment, stack, numbers) through
+    the ast module. Cached per fingerprint (see program_fingerprint); None if the
+    program has an instruction the backend does not know.'''
+    import ast
+    instructions, names = fingerprint
+    if not all(instruction in NATIVE_INSTRUCTIONS for instruction, argument in instructions):
+        return None
+    def load(name):
+        return ast.Name(id=name, ctx=ast.Load())
+    def item(container, key):
+        return ast.Subscript(value=load(container), slice=ast.Constant(key), ctx=ast.Load())
+
+    body = []
+    stack = [] # 编译时的栈：存的是局部变量名
+    def push(value):
+        temp = '_%d' % len(body)
+        body.append(ast.Assign(targets=[ast.Name(id=temp, ctx=ast.Store())], value=value))
+        stack.append(temp)
+    def pop():
+        if stack:
+            return load(stack.pop())
+        # 程序开始前就在栈上的值
+        return ast.Call(func=ast.Attribute(value=load('stack'), attr='pop', ctx=ast.Load()),
+                        args=[], keywords=[])
+
+    for instruction, argument in instructions:
+        if instruction == 'LOAD_VALUE':
+            push(item('numbers', argument))
+        elif instruction == 'LOAD_NAME':
+            push(item('environment', names[argument]))
+        elif instruction == 'STORE_NAME':
+            target = ast.Subscript(value=load('environment'), slice=ast.Constant(names[argument]), ctx=ast.Store())
+            body.append(ast.Assign(targets=[target], value=pop()))
+        elif instruction == 'ADD_TWO_VALUES':
+            first_num = pop()
+            second_num = pop() # BinOp先算left，两个都是stack.pop()的时候顺序也对
+            push(ast.BinOp(left=first_num, op=ast.Add(), right=second_num))
+        elif instruction == 'PRINT_ANSWER':
+            body.append(ast.Expr(ast.Call(func=load('print'), args=[pop()], keywords=[])))
+    if stack:
+        body.append(ast.Expr(ast.Call(func=ast.Attribute(value=load('stack'), attr='extend', ctx=ast.Load()),
+                                      args=[ast.List(elts=[load(temp) for temp in stack], ctx=ast.Load())],
+                                      keywords=[])))
+    arguments = ast.arguments(posonlyargs=[], args=[ast.arg(arg=name) for name in ('environment', 'stack', 'numbers')],
+                              kwonlyargs=[], kw_defaults=[], defaults=[])
+    function = ast.FunctionDef(name='program', args=arguments, body=body or [ast.Pass()], decorator_list=[])
+    module = ast.fix_missing_locations(ast.Module(body=[function], type_ignores=[]))
+    namespace = {}
+    exec(compile(module, '<program>', 'exec'), namespace)
+    return namespace['program']
+
+
+# --------- The Byterun model ------------
+
+# Four kinds of objects in Byterun:
+# 1. VirtualMachine: stores the call stack
+# 2. Frame: the frame is a collection of attributes with no methods, including code object, namespaces, stacks, and so on
+# 3. Function
+# 4. Block -> 现在换成了每个code object一张的异常表（ExceptionTableEntry），见下面
+
+# 这里跑的是宿主Python（3.11）的字节码：每条指令2个字节（wordcode），后面可能跟着CACHE，
+# try/with不再有SETUP_*指令，而是由code object里的异常表（co_exceptiontable）描述。
+
+class VirtualMachineError(Exception):
+    pass
+
+
+# 指令的解码只认3.11的wordcode：3.12起操作码和调用约定都变了（RETURN_CONST、CALL不再有PRECALL……）
+BYTECODE_VERSION = (3, 11)
+
+
+# 3.11调用约定里栈上的NULL（LOAD_GLOBAL、PUSH_NULL、LOAD_METHOD压进去的占位）
+NULL = object()
+
+
+# BINARY_OP的参数是下面这个顺序，反编译时换成老的BINARY_*/INPLACE_*名字
+BINARY_OP_NAMES = [
+    'ADD', 'AND', 'FLOOR_DIVIDE', 'LSHIFT', 'MATRIX_MULTIPLY', 'MULTIPLY', 'MODULO',
+    'OR', 'POWER', 'RSHIFT', 'SUBTRACT', 'TRUE_DIVIDE', 'XOR',
+]
+
+UNARY_OPERATORS = {
+    'POSITIVE': operator.pos,
+    'NEGATIVE': operator.neg,
+    'NOT':      operator.not_,
+    'INVERT':   operator.invert,
+}
+
+BINARY_OPERATORS = {
+    'POWER':           pow,
+    'MULTIPLY':        operator.mul,
+    'MATRIX_MULTIPLY': operator.matmul,
+    'FLOOR_DIVIDE':    operator.floordiv,
+    'TRUE_DIVIDE':     operator.truediv,
+    'MODULO':          operator.mod,
+    'ADD':             operator.add,
+    'SUBTRACT':        operator.sub,
+    'SUBSCR':          operator.getitem,
+    'LSHIFT':          operator.lshift,
+    'RSHIFT':          operator.rshift,
+    'AND':             operator.and_,
+    'XOR':             operator.xor,
+    'OR':              operator.or_,
+}
+
+INPLACE_OPERATORS = {
+    'POWER':           operator.ipow,
+    'MULTIPLY':        operator.imul,
+    'MATRIX_MULTIPLY': operator.imatmul,
+    'FLOOR_DIVIDE':    operator.ifloordiv,
+    'TRUE_DIVIDE':     operator.itruediv,
+    'MODULO':          operator.imod,
+    'ADD':             operator.iadd,
+    'SUBTRACT':        operator.isub,
+    'LSHIFT':          operator.ilshift,
+    'RSHIFT':          operator.irshift,
+    'AND':             operator.iand,
+    'XOR':             operator.ixor,
+    'OR':              operator.ior,
+}
+
+COMPARE_OPERATORS = {
+    '<':  operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>':  operator.gt,
+    '>=': operator.ge,
+}
+
+FORMAT_CONVERSIONS = [None, str, repr, ascii] # FORMAT_VALUE参数的低两位
+
+
+# Quickening：热的通用指令在反编译出来的指令列表里被原地换成按操作数类型特化的版本，
+# 比如BINARY_ADD -> BINARY_ADD_INT。特化版本先检查类型（guard），不对就换回通用版本（去优化）。
+
+QUICKEN_THRESHOLD = 16 # 通用指令执行这么多次以后尝试特化
+QUICKEN_MAX_DEOPTS = 4 # 去优化这么多次以后就一直用通用版本
+
+SPECIALIZED_OPERATORS = ('ADD', 'SUBTRACT', 'MULTIPLY')
+COMPARE_NAMES = {'<': 'LT', '<=': 'LE', '==': 'EQ', '!=': 'NE', '>': 'GT', '>=': 'GE'}
+_object_getattribute = object.__getattribute__
+
+
+def specialize(byte_name, arguments, operands, object_model=None):
+    '''The specialized form (byte_name, arguments) of a hot generic instruction
+    for these operands, or None if there is none.'''
+    if object_model is not None and type(operands[0]) is object_model.Instance:
+        return specialize_model_attr(byte_name, arguments[0], operands, object_model)
+    if byte_name in ('LOAD_METHOD', 'STORE_ATTR'):
+        return None # 只给对象模型的实例做
+    if byte_name == 'LOAD_ATTR':
+        obj, = operands
+        cls, name = type(obj), arguments[0]
+        if cls.__getattribute__ is not _object_getattribute:
+            return None
+        try:
+            instance_dict = object.__getattribute__(obj, '__dict__')
+        except AttributeError:
+            return None
+        # 只管实例自己__dict__里的属性，而且类里没有同名的东西（比如property）
+        if name in instance_dict and not any(name in vars(k) for k in cls.__mro__):
+            return 'LOAD_ATTR_INSTANCE', (name, cls)
+        return None
+    x, y = operands
+    if byte_name == 'BINARY_SUBSCR':
+        if type(x) is list and type(y) is int:
+            return 'BINARY_SUBSCR_LIST_INT', ()
+        return None
+    if type(x) is int and type(y) is int:
+        suffix = '_INT'
+    elif type(x) is float and type(y) is float:
+        suffix = '_FLOAT'
+    else:
+        return None
+    if byte_name == 'COMPARE_OP':
+        return 'COMPARE_%s%s' % (COMPARE_NAMES[arguments[0]], suffix), ()
+    if byte_name.partition('_')[2] in SPECIALIZED_OPERATORS:
+        return byte_name + suffix, ()
+    return None
+
+
+def specialize_model_attr(byte_name, name, operands, om):
+    '''Inline caches for attribute instructions on Instances of the object model,
+    keyed on the instance's map (its hidden class): the same map means the same
+    fields at the same storage indexes. What comes from the class is also keyed on
+    the class and on om._class_epoch, which changes whenever any class is written.'''
+    obj = operands[0]
+    index = obj.map.get_index(name)
+    if byte_name == 'STORE_ATTR':
+        old_map = operands[1]
+        if obj.cls._read_from_class('__setattr__') is not om.OBJECT__setattr__:
+            return None
+        if old_map is obj.map:
+            return 'STORE_ATTR_MODEL_FIELD', (name, obj.map, index, obj.cls, om._class_epoch)
+        if old_map.next_maps.get(name) is obj.map:
+            # 新加的属性：缓存map的转换
+            return 'STORE_ATTR_MODEL_ADD', (name, old_map, obj.map, obj.cls, om._class_epoch)
+        return None
+    if index != -1:
+        if byte_name == 'LOAD_ATTR':
+            return 'LOAD_ATTR_MODEL_FIELD', (name, obj.map, index)
+        return None
+    value = obj.cls._read_from_class(name)
+    if value is om.MISSING:
+        return None # 交给__getattr__
+    if byte_name == 'LOAD_METHOD':
+        if isinstance(value, Function):
+            return 'LOAD_METHOD_MODEL', (name, obj.map, obj.cls, om._class_epoch, value)
+        return None
+    if om._is_bindable(value) and not isinstance(value, Function):
+        return None # 别的descriptor，比如JIT要看的host函数，走通用的read_attr
+    return 'LOAD_ATTR_MODEL_CLASS', (name, obj.map, obj.cls, om._class_epoch, value, isinstance(value, Function))
+
+
+# 一个try/with的保护范围：[start, end)里的指令出了异常，就把栈截到depth，
+# （lasti时再压入出错指令的位置）压入异常，跳到target。下标都是反编译后指令列表里的位置。
+# 整张表在反编译时算一次；没有异常的时候什么都不用做，出了异常才查表。
+ExceptionTableEntry = collections.namedtuple('ExceptionTableEntry', 'start, end, target, depth, lasti')
+
+
+def parse_exception_table(code_obj):
+    '''Parse co_exceptiontable into (start, end, target, depth, lasti) tuples, in byte offsets.
+    The format is described in CPython's Objects/exception_handling_notes.txt.'''
+    table = iter(code_obj.co_exceptiontable)
+
+    def varint():
+        # 每个字节低6位是数据，第6位表示后面还有
+        b = next(table)
+        value = b & 63
+        while b & 64:
+            b = next(table)
+            value = (value << 6) | (b & 63)
+        return value
+
+    entries = []
+    while True:
+        try:
+            start = varint() * 2
+        except StopIteration:
+            return entries
+        length = varint() * 2
+        target = varint() * 2
+        depth_and_lasti = varint()
+        entries.append((start, start + length, target, depth_and_lasti >> 1, bool(depth_and_lasti & 1)))
+
+
+# 反编译时直接丢掉的指令：它们在这个VM里什么也不做
+SKIPPED_INSTRUCTIONS = {'CACHE', 'EXTENDED_ARG', 'NOP', 'RESUME', 'PRECALL', 'KW_NAMES'}
+
+
+class DecodedCode(object):
+    '''The instructions of one code object, decoded once: each one is a
+    (byte_name, arguments) pair with its arguments already looked up, jump targets
+    are indexes into the list, and the exception table uses the same indexes.'''
+
+    def __init__(self, instructions, exception_table):
+        self.instructions = instructions
+        self.exception_table = exception_table
+        self.handler_starts = [entry.start for entry in exception_table]
+        self.counters = [0] * len(instructions) # 通用指令执行了多少次；None：不再特化
+        self.quickened = {} # index -> [通用指令, 特化次数, 去优化次数]
+
+    def find_handler(self, index):
+        '''The exception table entry covering instruction 'index', or None.'''
+        # 编译器生成的表已经展平了，范围互不重叠
+        i = bisect.bisect_right(self.handler_starts, index) - 1
+        if i >= 0 and index < self.exception_table[i].end:
+            return self.exception_table[i]
+        return None
+
+
+def decode_code(code_obj):
+    '''Decode a code object for the VirtualMachine, see DecodedCode.'''
+    raw = list(dis.get_instructions(code_obj))
+    # 被丢掉的指令映射到它后面第一条留下来的指令
+    offsets = [instr.offset for instr in raw]
+    positions = []
+    kept = []
+    for instr in raw:
+        positions.append(len(kept))
+        if instr.opname not in SKIPPED_INSTRUCTIONS:
+            kept.append(instr)
+
+    def index(offset):
+        i = bisect.bisect_left(offsets, offset)
+        return positions[i] if i < len(positions) else len(kept)
+
+    instructions = []
+    kw_names = ()
+    for instr in raw:
+        byte_name, opcode = instr.opname, instr.opcode
+        if byte_name == 'KW_NAMES':
+            # 和后面的CALL合成一条：CALL的参数里直接带上关键字参数的名字
+            kw_names = code_obj.co_consts[instr.arg]
+            continue
+        if byte_name in SKIPPED_INSTRUCTIONS:
+            continue
+        if byte_name == 'CALL':
+            arguments = (instr.arg, kw_names)
+            kw_names = ()
+        elif byte_name == 'BINARY_OP':
+            if instr.arg < len(BINARY_OP_NAMES):
+                byte_name = 'BINARY_' + BINARY_OP_NAMES[instr.arg]
+            else:
+                byte_name = 'INPLACE_' + BINARY_OP_NAMES[instr.arg - len(BINARY_OP_NAMES)]
+            arguments = ()
+        elif byte_name == 'LOAD_GLOBAL':
+            arguments = (instr.argval, bool(instr.arg & 1)) # 名字，要不要先压一个NULL
+        elif opcode in dis.hasjrel or opcode in dis.hasjabs:
+            # 跳转目标换成指令下标；向前、向后的跳转不再区分
+            if byte_name in ('JUMP_FORWARD', 'JUMP_BACKWARD', 'JUMP_BACKWARD_NO_INTERRUPT'):
+                byte_name = 'JUMP_ABSOLUTE'
+            else:
+                byte_name = byte_name.replace('_FORWARD', '').replace('_BACKWARD', '')
+            arguments = (index(instr.argval), )
+        elif (opcode in dis.hasconst or opcode in dis.hasname or opcode in dis.haslocal
+              or opcode in dis.hasfree or opcode in dis.hascompare):
+            arguments = (instr.argval, )
+        elif opcode >= dis.HAVE_ARGUMENT:
+            arguments = (instr.arg, )
+        else:
+            arguments = ()
+        instructions.append((byte_name, arguments))
+
+    exception_table = []
+    for start, end, target, depth, lasti in parse_exception_table(code_obj):
+        start, end = index(start), index(end)
+        if start < end: # 只盖住了被丢掉的指令（比如NOP）的范围不需要了
+            exception_table.append(ExceptionTableEntry(start, end, index(target), depth, lasti))
+    return DecodedCode(instructions, exception_table)
+
+
+# 反编译结果的磁盘缓存：短命的进程启动时不用再反编译
+# 一个文件存一个模块（顶层code object）连同它里面所有嵌套的code object，
+# 文件名是内容的hash；VM_VERSION在反编译的格式变了的时候要加1
+
+VM_VERSION = 1
+CACHE_MAGIC = b'BYTERUN\0'
+# magic, VM_VERSION, 内容的key, payload的sha256, payload的长度
+CACHE_HEADER = struct.Struct('<8sI32s32sQ')
+
+
+def walk_code(code_obj):
+    '''code_obj and all the code objects nested in its constants, depth first.'''
+    yield code_obj
+    for const in code_obj.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from walk_code(const)
+
+
+class DiskCodeCache(object):
+    '''Decoded code stored on disk, addressed by the content of the code object.
+
+    Entries are read with mmap and marshal. An entry whose header, length or
+    checksum does not match is ignored and rewritten, so a stale or half-written
+    file can never be run.'''
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.hits = self.misses = self.stale = self.corrupt = 0
+
+    def key(self, code_obj):
+        '''Hash of everything decode_code() reads, plus the VM and Python versions.'''
+        content = marshal.dumps((
+            code_obj.co_code, code_obj.co_consts, code_obj.co_names, code_obj.co_varnames,
+            code_obj.co_cellvars, code_obj.co_freevars, code_obj.co_exceptiontable,
+        ), 2) # version 2：不用引用，结果和对象的引用计数无关
+        return hashlib.sha256(b'%d %s ' % (VM_VERSION, sys.implementation.cache_tag.encode()) + content).digest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key.hex() + '.bcode')
+
+    def get(self, code_obj):
+        '''A dict code object -> DecodedCode for code_obj and everything nested in it,
+        read from disk if possible, otherwise decoded and written.'''
+        key = self.key(code_obj)
+        decoded = self.load(code_obj, key)
+        if decoded is None:
+            self.misses += 1
+            decoded = {code: decode_code(code) for code in walk_code(code_obj)}
+            self.store(key, [decoded[code] for code in walk_code(code_obj)])
+        else:
+            self.hits += 1
+        return decoded
+
+    def load(self, code_obj, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return self._read(code_obj, key, data)
+        except (OSError, ValueError): # 没有这个文件，或者是空文件（mmap不了）
+            return None
+
+    def _read(self, code_obj, key, data):
+        if len(data) < CACHE_HEADER.size:
+            self.corrupt += 1
+            return None
+        magic, version, stored_key, checksum, length = CACHE_HEADER.unpack_from(data)
+        if magic != CACHE_MAGIC or version != VM_VERSION or stored_key != key:
+            self.stale += 1
+            return None
+        with memoryview(data) as view:
+            payload = view[CACHE_HEADER.size:]
+            try:
+                if len(payload) != length or hashlib.sha256(payload).digest() != checksum:
+                    self.corrupt += 1
+                    return None
+                entries = marshal.loads(payload)
+            finally:
+                payload.release()
+        codes = list(walk_code(code_obj))
+        if len(entries) != len(codes):
+            self.corrupt += 1
+            return None
+        return {code: DecodedCode(list(instructions), [ExceptionTableEntry(*entry) for entry in table])
+                for code, (instructions, table) in zip(codes, entries)}
+
+    def store(self, key, decoded):
+        payload = marshal.dumps([(code.instructions, [tuple(entry) for entry in code.exception_table])
+                                 for code in decoded])
+        header = CACHE_HEADER.pack(CACHE_MAGIC, VM_VERSION, key, hashlib.sha256(payload).digest(), len(payload))
+        # 先写临时文件再改名，别的进程不会读到写了一半的文件
+        try:
+            import tempfile
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(payload)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            pass # 缓存写不进去就算了，下次再反编译
+
+
+class VirtualMachine(object):
+
+    def __init__(self, quicken=True, disk_cache=None, object_model=None):
+        if sys.version_info[:2] != BYTECODE_VERSION:
+            raise VirtualMachineError('the VM runs Python %d.%d bytecode, this is Python %d.%d' % (
+                BYTECODE_VERSION + sys.version_info[:2]))
+        self.quicken = quicken # 是否把热的指令换成特化版本
+        self.disk_cache = disk_cache # DiskCodeCache或None
+        # simple object model模块（见load_object_model）：解释执行的class语句造出它的Class，
+        # 实例是它的Instance，属性都通过read_attr/write_attr
+        self.object_model = object_model
+        self.model_instance = object_model.Instance if object_model else None
+        self.model_class = object_model.Class if object_model else None
+        self.model_types = (self.model_instance, self.model_class) if object_model else ()
+        self.frames = [] # The call stack of frames
+        self.frame = None # The current frame
+        self.return_value = None
+        self.last_exception = None # 正在往外抛的异常
+        self.handled_exception = None # 正在except块里处理的异常，即sys.exc_info()
+        self.code_cache = {} # code object -> DecodedCode
+        self.nesting = 0 # 有几层run_frame在宿主Python的栈上（Scheduler直接跑的任务不算）
+        self.suspended = None # block_on()交出来的awaitable，见Scheduler
+        self.budget_left = None # run_frames()没用完的指令数
+
+    def run_code(self, code, global_names=None, local_names=None):
+        '''An entry point to execute code using the virtual machine.'''
+        frame = self.make_frame(code, global_names=global_names, local_names=local_names)
+        val = self.run_frame(frame)
+        # Check some invariants
+        if self.frames:
+            raise VirtualMachineError('Frames left over!')
+        return val
+
+    def decode(self, code_obj):
+        '''The DecodedCode of code_obj; every code object is decoded only once.'''
+        code = self.code_cache.get(code_obj)
+        if code is None:
+            if self.disk_cache is not None:
+                # 一次拿到整个模块里所有的code object
+                self.code_cache.update(self.disk_cache.get(code_obj))
+                code = self.code_cache[code_obj]
+            else:
+                code = self.code_cache[code_obj] = decode_code(code_obj)
+        return code
+
+    # Frame manipulation
+    def make_frame(self, code, callargs={}, global_names=None, local_names=None, closure=None):
+        if global_names is not None:
+            if local_names is None:
+                local_names = global_names
+        elif self.frames:
+            global_names = self.frame.global_names
+            local_names = {}
+        else:
+            global_names = local_names = {
+                '__builtins__': __builtins__,
+                '__name__': '__main__',
+                '__doc__': None,
+                '__package__': None,
+            }
+        local_names.update(callargs)
+        frame = Frame(code, self.decode(code), global_names, local_names, self.frame, closure)
+        return frame
+
+    def push_frame(self, frame):
+        self.frames.append(frame)
+        self.frame = frame
+
+    def pop_frame(self):
+        self.frames.pop()
+        if self.frames:
+            self.frame = self.frames[-1]
+        else:
+            self.frame = None
+
+    # Data stack manipulation
+    def top(self):
+        return self.frame.stack[-1]
+
+    def pop(self):
+        return self.frame.stack.pop()
+
+    def push(self, *vals):
+        self.frame.stack.extend(vals)
+
+    def popn(self, n):
+        '''
+        Pop a number of values from the value stack.
+        A list of 'n' values is return, the deepest value first.
+        '''
+        if n:
+            ret = self.frame.stack[-n:]
+            self.frame.stack[-n:] = []
+            return ret
+        else:
+            return []
+
+    def jump(self, jump):
+        '''Move the instruction pointer to instruction number 'jump', so it will execute next.'''
+        self.frame.last_instruction = jump
+
+    def parse_byte_and_args(self):
+        '''
+        Takes the next instruction of the frame and its arguments.
+        The code object was decoded when the frame was made (see decode_code),
+        so this is only a list lookup.
+        It also updates the frame's attribute: last_instruction
+        '''
+        f = self.frame
+        byte_name, arguments = f.code.instructions[f.last_instruction]
+        f.last_instruction += 1
+        return byte_name, arguments
+
+
+    def dispatch(self, byte_name, argument):
+        '''
+        It looks up the operations for a given instruction and executes them.
+        Define a method for each bytename and then use getattr to look it up.
+
+        Dispatch by bytename to the corresponding method.
+        Exceptions are caught and set on the virtual machine.
+        '''
+
+        # When unwinding after an error (or returning, or yielding),
+        # we need to keep track of why we are doing it.
+        why = None
+        try:
+            bytecode_fn = getattr(self, 'byte_%s' % byte_name, None)
+            if bytecode_fn is None:
+                if byte_name.startswith('UNARY_'):
+                    self.unaryOperator(byte_name[6:])
+                elif byte_name.startswith('BINARY_'):
+                    self.binaryOperator(byte_name[7:])
+                elif byte_name.startswith('INPLACE_'):
+                    self.inplaceOperator(byte_name[8:])
+                else:
+                    raise VirtualMachineError(
+                        'unsupported bytecode type: %s' % byte_name
+                    )
+            else:
+                why = bytecode_fn(*argument)
+        except:
+            # deal with exceptions encountered while executing the op.
+            self.last_exception = sys.exc_info()[1]
+            why = 'exception'
+
+        return why
+
+    def run_frame(self, frame, exception=None):
+        '''Run a frame until it returns (somehow), or yields.
+        Exceptions are raised, the return value is returned.
+        A suspended generator frame can be resumed with an exception thrown into it.
+        '''
+        self.push_frame(frame)
+        why = None
+        if exception is not None:
+            self.last_exception = exception
+            why = self.unwind_exception()
+        self.nesting += 1
+        try:
+            why = self.run_frames(len(self.frames), why)
+        finally:
+            self.nesting -= 1
+
+        self.pop_frame()
+
+        if why == 'exception':
+            raise self.last_exception
+
+        return self.return_value
+
+    def run_frames(self, base, why=None, budget=None):
+        '''The interpreter loop. Runs the frame at depth 'base' of the call stack, and the
+        frames of the interpreted functions it calls, which are pushed on the same stack
+        instead of recursing (see call_function).
+        Returns why the base frame stopped: 'return', 'yield' or 'exception'; 'suspend' if
+        some frame called block_on(); None once 'budget' instructions have run.'''
+        while True:
+            if why is None:
+                if budget is not None:
+                    if budget == 0:
+                        self.budget_left = 0
+                        return None
+                    budget -= 1
+                byte_name, arguments = self.parse_byte_and_args()
+                why = self.dispatch(byte_name, arguments)
+                if why == 'exception':
+                    # 只有出了异常才去查异常表
+                    why = self.unwind_exception()
+            elif why == 'suspend' or len(self.frames) == base:
+                self.budget_left = budget
+                return why
+            else:
+                # 被调用的函数结束了，回到调用它的帧
+                self.pop_frame()
+                if why == 'return':
+                    self.push(self.return_value)
+                    why = None
+                else: # 'exception'：在调用它的那条CALL上接着找handler
+                    why = self.unwind_exception()
+
+    def unwind_exception(self):
+        '''Look up the instruction that raised in the exception table of its code.
+        If a handler covers it, reset the data stack to the recorded depth, push the
+        exception and continue there. Otherwise the exception leaves the frame.'''
+        frame = self.frame
+        raised_at = frame.last_instruction - 1
+        entry = frame.code.find_handler(raised_at)
+        if entry is None:
+            return 'exception'
+        del frame.stack[entry.depth:]
+        if entry.lasti:
+            self.push(raised_at)
+        self.push(self.last_exception)
+        self.jump(entry.target)
+        return None
+
+    ## Quickening
+
+    def adapt(self, *operands):
+        '''Called by the generic form of a specializable instruction after it ran.
+        Counts executions; once the instruction is hot, rewrites it in the decoded
+        stream into the variant specialized for these operand types, if any.'''
+        if not self.quicken:
+            return
+        f = self.frame
+        code, i = f.code, f.last_instruction - 1
+        counter = code.counters[i]
+        if counter is None:
+            return
+        if counter < QUICKEN_THRESHOLD:
+            code.counters[i] = counter + 1
+            return
+        code.counters[i] = 0
+        generic = code.instructions[i]
+        specialized = specialize(generic[0], generic[1], operands, self.object_model)
+        if specialized is not None:
+            code.quickened.setdefault(i, [generic, 0, 0])[1] += 1
+            code.instructions[i] = specialized
+
+    def deoptimize(self):
+        '''A guard of the current specialized instruction failed: put the generic
+        instruction back. It may specialize again later, after a longer warm-up
+        each time, until it gives up after QUICKEN_MAX_DEOPTS.'''
+        f = self.frame
+        code, i = f.code, f.last_instruction - 1
+        entry = code.quickened[i]
+        code.instructions[i] = entry[0]
+        entry[2] += 1
+        code.counters[i] = None if entry[2] >= QUICKEN_MAX_DEOPTS else -(QUICKEN_THRESHOLD << entry[2])
+
+    def specialization_stats(self):
+        '''One row per instruction that was ever specialized: where it is, its generic
+        and its current form, how many times it was specialized and deoptimized.'''
+        rows = []
+        for code_obj, code in self.code_cache.items():
+            for i, (generic, specializations, deopts) in sorted(code.quickened.items()):
+                rows.append({
+                    'code': code_obj.co_qualname,
+                    'index': i,
+                    'generic': generic[0],
+                    'current': code.instructions[i][0],
+                    'specializations': specializations,
+                    'deopts': deopts,
+                })
+        return rows
+
+    def byte_BINARY_SUBSCR_LIST_INT(self):
+        stack = self.frame.stack
+        container, index = stack[-2], stack[-1]
+        if type(container) is list and type(index) is int:
+            del stack[-1]
+            stack[-1] = container[index]
+        else:
+            self.deoptimize()
+            self.binaryOperator('SUBSCR')
+
+    def byte_LOAD_ATTR_INSTANCE(self, attr, cls):
+        stack = self.frame.stack
+        obj = stack[-1]
+        # 特化以后类也可能被改：加了同名的属性（比如property），或者换了__getattribute__
+        if type(obj) is cls and cls.__getattribute__ is _object_getattribute:
+            for k in cls.__mro__:
+                if attr in k.__dict__:
+                    break
+            else:
+                try:
+                    stack[-1] = obj.__dict__[attr]
+                    return
+                except KeyError:
+                    pass
+        self.deoptimize()
+        self.byte_LOAD_ATTR(attr)
+
+    # object model: the caches are keyed on the instance's map, see specialize_model_attr
+
+    def byte_LOAD_ATTR_MODEL_FIELD(self, attr, map, index):
+        stack = self.frame.stack
+        obj = stack[-1]
+        if type(obj) is self.model_instance and obj.map is map:
+            stack[-1] = obj.storage[index]
+        else:
+            self.deoptimize()
+            self.byte_LOAD_ATTR(attr)
+
+    def byte_LOAD_ATTR_MODEL_CLASS(self, attr, map, cls, epoch, value, bind):
+        stack = self.frame.stack
+        obj = stack[-1]
+        if (type(obj) is self.model_instance and obj.map is map and obj.cls is cls
+                and self.object_model._class_epoch == epoch):
+            stack[-1] = value.__get__(obj, None) if bind else value
+        else:
+            self.deoptimize()
+            self.byte_LOAD_ATTR(attr)
+
+    def byte_LOAD_METHOD_MODEL(self, name, map, cls, epoch, method):
+        stack = self.frame.stack
+        obj = stack[-1]
+        if (type(obj) is self.model_instance and obj.map is map and obj.cls is cls
+                and self.object_model._class_epoch == epoch):
+            # 不用造绑定方法：CALL会把obj当成第一个参数
+            stack[-1] = method
+            stack.append(obj)
+        else:
+            self.deoptimize()
+            self.byte_LOAD_METHOD(name)
+
+    def byte_STORE_ATTR_MODEL_FIELD(self, name, map, index, cls, epoch):
+        stack = self.frame.stack
+        obj = stack[-1]
+        if (type(obj) is self.model_instance and obj.map is map and obj.cls is cls
+                and self.object_model._class_epoch == epoch):
+            obj.storage[index] = stack[-2]
+            del stack[-2:]
+        else:
+            self.deoptimize()
+            self.byte_STORE_ATTR(name)
+
+    def byte_STORE_ATTR_MODEL_ADD(self, name, old_map, new_map, cls, epoch):
+        om = self.object_model
+        stack = self.frame.stack
+        obj = stack[-1]
+        if (type(obj) is self.model_instance and obj.map is old_map and obj.cls is cls
+                and om._class_epoch == epoch and om.SPACE is None):
+            with om._LOCK: # 和Instance._write_dict一样：先放值，再换map
+                if obj.map is old_map:
+                    obj.storage.append(stack[-2])
+                    obj.map = new_map
+                    del stack[-2:]
+                    return
+        self.deoptimize()
+        self.byte_STORE_ATTR(name)
+
+    ## Stack manipulation
+
+    def byte_LOAD_CONST(self, const):
+        self.push(const)
+
+    def byte_POP_TOP(self):
+        self.pop()
+
+    def byte_PUSH_NULL(self):
+        self.push(NULL)
+
+    def byte_COPY(self, i):
+        self.push(self.frame.stack[-i])
+
+    def byte_SWAP(self, i):
+        stack = self.frame.stack
+        stack[-i], stack[-1] = stack[-1], stack[-i]
+
+    ## Names
+
+    def byte_LOAD_NAME(self, name):
+        frame = self.frame
+        if name in frame.local_names:
+            val = frame.local_names[name]
+        elif name in frame.global_names:
+            val = frame.global_names[name]
+        elif name in frame.builtin_names:
+            val = frame.builtin_names[name]
+        else:
+            raise NameError("name '%s' is not defined" % name)
+        self.push(val)
+
+    def byte_STORE_NAME(self, name):
+        self.frame.local_names[name] = self.pop()
+
+    def byte_DELETE_NAME(self, name):
+        del self.frame.local_names[name]
+
+    def byte_LOAD_FAST(self, name):
+        if name in self.frame.local_names:
+            val = self.frame.local_names[name]
+        else:
+            raise UnboundLocalError(
+                "cannot access local variable '%s' where it is not associated with a value" % name
+            )
+        self.push(val)
+
+    def byte_STORE_FAST(self, name):
+        self.frame.local_names[name] = self.pop()
+
+    def byte_DELETE_FAST(self, name):
+        del self.frame.local_names[name]
+
+    def byte_LOAD_GLOBAL(self, name, push_null):
+        f = self.frame
+        if name in f.global_names:
+            val = f.global_names[name]
+        elif name in f.builtin_names:
+            val = f.builtin_names[name]
+        else:
+            raise NameError("name '%s' is not defined" % name)
+        if push_null:
+            self.push(NULL)
+        self.push(val)
+
+    def byte_STORE_GLOBAL(self, name):
+        self.frame.global_names[name] = self.pop()
+
+    def byte_DELETE_GLOBAL(self, name):
+        del self.frame.global_names[name]
+
+    ## Cells: closures use real cell objects, so that real functions and classes can share them
+
+    def byte_MAKE_CELL(self, name):
+        cell = types.CellType()
+        if name in self.frame.local_names: # 参数也被内层函数用到的时候
+            cell.cell_contents = self.frame.local_names[name]
+        self.frame.cells[name] = cell
+
+    def byte_COPY_FREE_VARS(self, n):
+        frame = self.frame
+        frame.cells.update(zip(frame.code_obj.co_freevars, frame.closure))
+
+    def byte_LOAD_CLOSURE(self, name):
+        self.push(self.frame.cells[name])
+
+    def byte_LOAD_DEREF(self, name):
+        try:
+            self.push(self.frame.cells[name].cell_contents)
+        except ValueError:
+            raise NameError(
+                "cannot access free variable '%s' where it is not associated with a value in enclosing scope" % name
+            )
+
+    def byte_LOAD_CLASSDEREF(self, name):
+        if name in self.frame.local_names:
+            self.push(self.frame.local_names[name])
+        else:
+            self.byte_LOAD_DEREF(name)
+
+    def byte_STORE_DEREF(self, name):
+        self.frame.cells[name].cell_contents = self.pop()
+
+    def byte_DELETE_DEREF(self, name):
+        del self.frame.cells[name].cell_contents
+
+    ## Operators
+
+    def unaryOperator(self, op):
+        x = self.pop()
+        self.push(UNARY_OPERATORS[op](x))
+
+    def binaryOperator(self, op):
+        x, y = self.popn(2)
+        self.push(BINARY_OPERATORS[op](x, y))
+        self.adapt(x, y)
+
+    def inplaceOperator(self, op):
+        x, y = self.popn(2)
+        self.push(INPLACE_OPERATORS[op](x, y))
+        self.adapt(x, y)
+
+    def byte_COMPARE_OP(self, opname):
+        x, y = self.popn(2)
+        self.push(COMPARE_OPERATORS[opname](x, y))
+        self.adapt(x, y)
+
+    def byte_IS_OP(self, invert):
+        x, y = self.popn(2)
+        self.push(x is not y if invert else x is y)
+
+    def byte_CONTAINS_OP(self, invert):
+        x, y = self.popn(2)
+        self.push(x not in y if invert else x in y)
+
+    ## Attributes and indexing
+
+    def byte_LOAD_ATTR(self, attr):
+        obj = self.pop()
+        if type(obj) in self.model_types:
+            self.push(obj.read_attr(attr))
+        else:
+            self.push(getattr(obj, attr))
+        self.adapt(obj)
+
+    def byte_STORE_ATTR(self, name):
+        obj, val = self.pop(), self.pop()
+        if type(obj) is self.model_instance:
+            old_map = obj.map
+            obj.write_attr(name, val)
+            self.adapt(obj, old_map)
+        elif type(obj) is self.model_class:
+            obj.write_attr(name, val)
+        else:
+            setattr(obj, name, val)
+
+    def byte_DELETE_ATTR(self, name):
+        obj = self.pop()
+        delattr(obj, name)
+
+    def byte_LOAD_METHOD(self, name):
+        # 不区分方法和普通属性：总是 NULL, 绑定好的属性
+        obj = self.pop()
+        if type(obj) in self.model_types:
+            self.push(NULL, obj.read_attr(name))
+            self.adapt(obj)
+        else:
+            self.push(NULL, getattr(obj, name))
+
+    def byte_STORE_SUBSCR(self):
+        key, obj, val = self.pop(), self.pop(), self.pop()
+        obj[key] = val
+
+    def byte_DELETE_SUBSCR(self):
+        key, obj = self.pop(), self.pop()
+        del obj[key]
+
+    ## Building
+
+    def byte_BUILD_TUPLE(self, count):
+        self.push(tuple(self.popn(count)))
+
+    def byte_BUILD_LIST(self, count):
+        self.push(self.popn(count))
+
+    def byte_BUILD_SET(self, count):
+        self.push(set(self.popn(count)))
+
+    def byte_BUILD_MAP(self, count):
+        items = self.popn(2 * count)
+        self.push(dict(zip(items[::2], items[1::2])))
+
+    def byte_BUILD_CONST_KEY_MAP(self, count):
+        keys = self.pop()
+        self.push(dict(zip(keys, self.popn(count))))
+
+    def byte_BUILD_STRING(self, count):
+        self.push(''.join(self.popn(count)))
+
+    def byte_BUILD_SLICE(self, count):
+        self.push(slice(*self.popn(count)))
+
+    def byte_LIST_APPEND(self, count):
+        val = self.pop()
+        self.frame.stack[-count].append(val)
+
+    def byte_SET_ADD(self, count):
+        val = self.pop()
+        self.frame.stack[-count].add(val)
+
+    def byte_MAP_ADD(self, count):
+        key, val = self.popn(2)
+        self.frame.stack[-count][key] = val
+
+    def byte_LIST_EXTEND(self, count):
+        val = self.pop()
+        self.frame.stack[-count].extend(val)
+
+    def byte_SET_UPDATE(self, count):
+        val = self.pop()
+        self.frame.stack[-count].update(val)
+
+    def byte_DICT_UPDATE(self, count):
+        val = self.pop()
+        self.frame.stack[-count].update(val)
+
+    def byte_DICT_MERGE(self, count):
+        # f(**a, **b)：同一个关键字参数不能出现两次
+        val = self.pop()
+        target = self.frame.stack[-count]
+        for key in val.keys():
+            if key in target:
+                raise TypeError('got multiple values for keyword argument %r' % key)
+        target.update(val)
+
+    def byte_LIST_TO_TUPLE(self):
+        self.push(tuple(self.pop()))
+
+    def byte_FORMAT_VALUE(self, flags):
+        spec = self.pop() if flags & 0x04 else ''
+        val = self.pop()
+        conversion = FORMAT_CONVERSIONS[flags & 0x03]
+        if conversion is not None:
+            val = conversion(val)
+        self.push(format(val, spec))
+
+    def byte_UNPACK_SEQUENCE(self, count):
+        seq = list(self.pop())
+        if len(seq) != count:
+            raise ValueError('expected %d values to unpack, got %d' % (count, len(seq)))
+        self.push(*reversed(seq))
+
+    def byte_UNPACK_EX(self, counts):
+        before, after = counts & 0xFF, counts >> 8
+        seq = list(self.pop())
+        if len(seq) < before + after:
+            raise ValueError('not enough values to unpack (expected at least %d, got %d)' % (before + after, len(seq)))
+        rest = seq[before:len(seq) - after]
+        self.push(*reversed(seq[:before] + [rest] + seq[len(seq) - after:]))
+
+    def byte_SETUP_ANNOTATIONS(self):
+        if '__annotations__' not in self.frame.local_names:
+            self.frame.local_names['__annotations__'] = {}
+
+    ## Jumps
+
+    def byte_JUMP_ABSOLUTE(self, jump):
+        self.jump(jump)
+
+    def byte_POP_JUMP_IF_TRUE(self, jump):
+        if self.pop():
+            self.jump(jump)
+
+    def byte_POP_JUMP_IF_FALSE(self, jump):
+        if not self.pop():
+            self.jump(jump)
+
+    def byte_POP_JUMP_IF_NONE(self, jump):
+        if self.pop() is None:
+            self.jump(jump)
+
+    def byte_POP_JUMP_IF_NOT_NONE(self, jump):
+        if self.pop() is not None:
+            self.jump(jump)
+
+    def byte_JUMP_IF_TRUE_OR_POP(self, jump):
+        if self.top():
+            self.jump(jump)
+        else:
+            self.pop()
+
+    def byte_JUMP_IF_FALSE_OR_POP(self, jump):
+        if not self.top():
+            self.jump(jump)
+        else:
+            self.pop()
+
+    ## Iteration. Loops need no block: break and continue are plain jumps
+
+    def byte_GET_ITER(self):
+        self.push(iter(self.pop()))
+
+    def byte_GET_YIELD_FROM_ITER(self):
+        iterable = self.pop()
+        if not isinstance(iterable, (Generator, types.GeneratorType)):
+            iterable = iter(iterable)
+        self.push(iterable)
+
+    def byte_FOR_ITER(self, jump):
+        iterobj = self.top()
+        try:
+            v = next(iterobj)
+            self.push(v)
+        except StopIteration:
+            self.pop()
+            self.jump(jump)
+
+    def byte_GET_LEN(self):
+        self.push(len(self.top()))
+
+    ## Exceptions: the handlers come from the exception table, see unwind_exception
+
+    def byte_PUSH_EXC_INFO(self):
+        val = self.pop()
+        self.push(self.handled_exception, val)
+        self.handled_exception = val
+
+    def byte_POP_EXCEPT(self):
+        self.handled_exception = self.pop()
+
+    def byte_CHECK_EXC_MATCH(self):
+        exc_type = self.pop()
+        self.push(isinstance(self.top(), exc_type))
+
+    def byte_RERAISE(self, lasti):
+        raise self.pop()
+
+    def byte_LOAD_ASSERTION_ERROR(self):
+        self.push(AssertionError)
+
+    def byte_RAISE_VARARGS(self, argc):
+        cause = exc = None
+        if argc == 2:
+            cause = self.pop()
+            exc = self.pop()
+        elif argc == 1:
+            exc = self.pop()
+        return self.do_raise(exc, cause, argc)
+
+    def do_raise(self, exc, cause, argc):
+        if argc == 0: # reraise
+            if self.handled_exception is None:
+                raise RuntimeError('No active exception to reraise')
+            raise self.handled_exception
+        if isinstance(exc, type) and issubclass(exc, BaseException):
+            exc = exc()
+        elif not isinstance(exc, BaseException):
+            raise TypeError('exceptions must derive from BaseException')
+        if argc == 2:
+            if isinstance(cause, type) and issubclass(cause, BaseException):
+                cause = cause()
+            elif cause is not None and not isinstance(cause, BaseException):
+                raise TypeError('exception causes must derive from BaseException')
+            exc.__cause__ = cause
+        if self.handled_exception is not None and self.handled_exception is not exc:
+            exc.__context__ = self.handled_exception
+        raise exc
+
+    def byte_BEFORE_WITH(self):
+        mgr = self.pop()
+        self.push(mgr.__exit__)
+        self.push(mgr.__enter__())
+
+    def byte_WITH_EXCEPT_START(self):
+        # stack: __exit__, lasti, the previous exception, the exception
+        exc = self.top()
+        exit_func = self.frame.stack[-4]
+        self.push(exit_func(type(exc), exc, exc.__traceback__))
+
+    ## Functions
+
+    def byte_MAKE_FUNCTION(self, flags):
+        code = self.pop()
+        closure = self.pop() if flags & 0x08 else None
+        annotations = self.pop() if flags & 0x04 else None
+        kwdefaults = self.pop() if flags & 0x02 else None
+        defaults = self.pop() if flags & 0x01 else ()
+        fn = Function(code.co_qualname, code, self.frame.global_names, defaults, kwdefaults, closure, self)
+        if annotations:
+            fn.func_dict['__annotations__'] = dict(zip(annotations[::2], annotations[1::2]))
+        self.push(fn)
+
+    def byte_CALL(self, argc, kw_names):
+        args = self.popn(argc)
+        self_or_callable = self.pop()
+        callable_or_null = self.pop()
+        if callable_or_null is NULL:
+            func = self_or_callable
+        else:
+            func = callable_or_null
+            args.insert(0, self_or_callable)
+        kwargs = {}
+        if kw_names:
+            kwargs = dict(zip(kw_names, args[-len(kw_names):]))
+            del args[-len(kw_names):]
+        return self.call_function(func, args, kwargs)
+
+    def byte_CALL_FUNCTION_EX(self, flags):
+        kwargs = self.pop() if flags & 0x01 else {}
+        args = self.pop()
+        func = self.pop()
+        self.pop() # NULL
+        return self.call_function(func, list(args), kwargs)
+
+    def call_function(self, func, args, kwargs):
+        '''Call func and push the result. Interpreted functions of this VM are not called
+        through the host: their frame is pushed and run_frames carries on in it.'''
+        if isinstance(func, types.MethodType) and isinstance(func.__func__, Function):
+            args.insert(0, func.__self__)
+            func = func.__func__
+        if isinstance(func, Function) and func._vm is self:
+            if len(self.frames) >= sys.getrecursionlimit():
+                raise RecursionError('maximum recursion depth exceeded')
+            self.push_frame(func.make_call_frame(args, kwargs))
+            return None
+        if type(func) is self.model_class:
+            self.push(self.instantiate(func, args, kwargs))
+            return None
+        if func is super and not args:
+            # super()要从调用它的帧里找__class__和第一个参数，宿主Python看不到我们的帧
+            frame = self.frame
+            first = frame.code_obj.co_varnames[0]
+            args = [frame.cells['__class__'].cell_contents,
+                    frame.cells[first].cell_contents if first in frame.cells else frame.local_names[first]]
+        result = func(*args, **kwargs)
+        if type(result) is Suspend:
+            if self.nesting:
+                raise VirtualMachineError('block_on() can only be called by a task of a Scheduler, '
+                                          'and not from a function called by the host')
+            self.suspended = result.awaitable
+            return 'suspend'
+        self.push(result)
+
+    def byte_RETURN_VALUE(self):
+        self.return_value = self.pop()
+        if self.frame.generator:
+            self.frame.generator.finished = True
+        return 'return'
+
+    ## Generators
+
+    def byte_RETURN_GENERATOR(self):
+        # 生成器函数一开始就返回生成器，帧停在这里，第一次send时接着往下跑
+        gen = Generator(self.frame, self)
+        self.frame.generator = gen
+        self.return_value = gen
+        return 'return'
+
+    def byte_YIELD_VALUE(self):
+        self.return_value = self.pop()
+        return 'yield'
+
+    def byte_SEND(self, jump):
+        val = self.pop()
+        receiver = self.top()
+        try:
+            if val is None:
+                retval = next(receiver)
+            else:
+                retval = receiver.send(val)
+        except StopIteration as e:
+            # yield from结束：换成它的返回值，跳过yield
+            self.pop()
+            self.push(e.value)
+            self.jump(jump)
+        else:
+            self.push(retval)
+
+    ## Classes
+
+    def byte_LOAD_BUILD_CLASS(self):
+        self.push(self.build_class)
+
+    def build_class(self, func, name, *bases, **kwds):
+        '''Like builtins.__build_class__, but the class body runs on this virtual machine.'''
+        if not isinstance(func, Function):
+            raise TypeError('func must be a function')
+        if self.object_model is not None and not kwds and all(type(base) is self.model_class for base in bases):
+            return self.build_model_class(func, name, bases)
+        metaclass, namespace, kwds = types.prepare_class(name, bases, kwds)
+        frame = self.make_frame(func.func_code, global_names=func.func_globals,
+                                local_names=namespace, closure=func.func_closure)
+        self.run_frame(frame)
+        # 类体把__class__的cell存在__classcell__里，type.__new__会把类放进去，super()就能用了
+        return metaclass(name, bases, namespace, **kwds)
+
+    def build_model_class(self, func, name, bases):
+        '''A class of the object model: the class body gives its fields.'''
+        om = self.object_model
+        if len(bases) > 1:
+            raise TypeError('classes of the object model have a single base class')
+        namespace = {}
+        frame = self.make_frame(func.func_code, global_names=func.func_globals,
+                                local_names=namespace, closure=func.func_closure)
+        self.run_frame(frame)
+        classcell = namespace.pop('__classcell__', None)
+        cls = om.Class(name=name, base_class=bases[0] if bases else om.OBJECT, fields=namespace, metaclass=om.TYPE)
+        if classcell is not None:
+            classcell.cell_contents = cls
+        return cls
+
+    def instantiate(self, cls, args, kwargs):
+        '''Calling a class of the object model: a new Instance, passed to __init__.'''
+        obj = self.model_instance(cls)
+        init = cls._read_from_class('__init__')
+        if init is not self.object_model.MISSING:
+            init(obj, *args, **kwargs)
+        elif args or kwargs:
+            raise TypeError('%s() takes no arguments' % cls.name)
+        return obj
+
+    ## Importing
+
+    def byte_IMPORT_NAME(self, name):
+        level, fromlist = self.popn(2)
+        frame = self.frame
+        self.push(__import__(name, frame.global_names, frame.local_names, fromlist, level))
+
+    def byte_IMPORT_FROM(self, name):
+        mod = self.top()
+        try:
+            self.push(getattr(mod, name))
+        except AttributeError:
+            raise ImportError('cannot import name %r from %r' % (name, getattr(mod, '__name__', mod)))
+
+    def byte_IMPORT_STAR(self):
+        mod = self.pop()
+        names = getattr(mod, '__all__', None)
+        if names is None:
+            names = [name for name in dir(mod) if not name.startswith('_')]
+        for name in names:
+            self.frame.local_names[name] = getattr(mod, name)
+
+
+def _specialized_operator(generic, op, operand_type):
+    '''The handler of e.g. BINARY_ADD_INT: both operands must be exactly operand_type.'''
+    fn = (COMPARE_OPERATORS if generic == 'byte_COMPARE_OP' else
+          INPLACE_OPERATORS if generic == 'inplaceOperator' else BINARY_OPERATORS)[op]
+
+    def byte_specialized(self):
+        stack = self.frame.stack
+        x, y = stack[-2], stack[-1]
+        if type(x) is operand_type and type(y) is operand_type:
+            del stack[-1]
+            stack[-1] = fn(x, y)
+        else:
+            self.deoptimize()
+            getattr(self, generic)(op)
+    return byte_specialized
+
+for _suffix, _operand_type in (('_INT', int), ('_FLOAT', float)):
+    for _op in SPECIALIZED_OPERATORS:
+        setattr(VirtualMachine, 'byte_BINARY_%s%s' % (_op, _suffix),
+                _specialized_operator('binaryOperator', _op, _operand_type))
+        setattr(VirtualMachine, 'byte_INPLACE_%s%s' % (_op, _suffix),
+                _specialized_operator('inplaceOperator', _op, _operand_type))
+    for _op, _name in COMPARE_NAMES.items():
+        setattr(VirtualMachine, 'byte_COMPARE_%s%s' % (_name, _suffix),
+                _specialized_operator('byte_COMPARE_OP', _op, _operand_type))
+
+
+class Frame(object):
+
+    def __init__(self, code_obj, code, global_names, local_names, prev_frame, closure=None):
+        self.code_obj = code_obj
+        self.code = code # DecodedCode of code_obj
+        self.global_names = global_names
+        self.local_names = local_names
+        self.prev_frame = prev_frame
+        self.stack = []
+        self.closure = closure # 函数的闭包：cell的tuple，COPY_FREE_VARS时放进cells
+        self.cells = {} # name -> cell，内层函数要用到的变量和自由变量
+        self.generator = None # 生成器的帧：它属于哪个Generator
+
+        if prev_frame:
+            self.builtin_names = prev_frame.builtin_names
+        else:
+            self.builtin_names = global_names.get('__builtins__', builtins)
+            if hasattr(self.builtin_names, '__dict__'):
+                self.builtin_names = self.builtin_names.__dict__
+
+        self.last_instruction = 0 # 下一条要执行的指令在code.instructions里的下标
+
+
+class Function(object):
+    '''
+    Create a realistic function object, defining the things the interpreter expect
+
+    '''
+    __slots__ = [
+        'func_code', 'func_name', 'func_defaults', 'func_kwdefaults', 'func_globals',
+        'func_locals', 'func_dict', 'func_closure',
+        '__name__', '__qualname__', '__dict__',
+        '_vm', '_func'
+    ]
+
+    def __init__(self, name, code, globs, defaults, kwdefaults, closure, vm):
+        '''Don't have to follow this closely'''
+        self._vm = vm
+        self.func_code = code
+        self.__qualname__ = name or code.co_qualname
+        self.func_name = self.__name__ = code.co_name
+        self.func_defaults = tuple(defaults)
+        self.func_kwdefaults = kwdefaults
+        self.func_globals = globs
+        self.func_locals = self._vm.frame.local_names
+        self.__dict__ = self.func_dict = {}
+        self.func_closure = closure
+        # 不是类的__doc__，放在实例的__dict__里
+        self.__dict__['__doc__'] = code.co_consts[0] if code.co_consts and isinstance(code.co_consts[0], str) else None
+        self.__dict__['__module__'] = globs.get('__name__')
+
+        # Sometimes we need a real Python function. This is for that.
+        kw = {
+            'argdefs': self.func_defaults,
+        }
+        if closure:
+            kw['closure'] = tuple(make_cell(0) for _ in closure)
+        self._func = types.FunctionType(code, globs, **kw)
+        self._func.__kwdefaults__ = kwdefaults
+
+    def __repr__(self):
+        return '<Function %s at 0x%08x>' % (self.__qualname__, id(self))
+
+    def __get__(self, instance, owner):
+        # 放在类里就是方法
+        if instance is None:
+            return self
+        return types.MethodType(self, instance)
+
+    def __call__(self, *args, **kwargs):
+        '''When calling a Function, make a new frame and run it.'''
+        return self._vm.run_frame(self.make_call_frame(args, kwargs))
+
+    def make_call_frame(self, args, kwargs):
+        '''The frame of a call with these arguments, ready to run.'''
+        code = self.func_code
+        if (not kwargs and len(args) == code.co_argcount and not code.co_kwonlyargcount
+                and not code.co_flags & (inspect.CO_VARARGS | inspect.CO_VARKEYWORDS)):
+            # 最常见的情况：参数个数刚好，全是位置参数
+            callargs = dict(zip(code.co_varnames, args))
+        else:
+            callargs = inspect.getcallargs(self._func, *args, **kwargs)
+        # Use callargs to provide a mapping of arguments: values to pass into the frame
+        return self._vm.make_frame(
+            code, callargs, self.func_globals, {}, self.func_closure
+        )
+
+def make_cell(value):
+    '''Create a real Python closure and grab a cell.'''
+    fn = (lambda x: lambda: x)(value)
+    return fn.__closure__[0]
+
+
+class Generator(object):
+    '''A generator whose frame runs on the virtual machine. Each send() resumes
+    the frame until its next YIELD_VALUE or RETURN_VALUE.'''
+
+    def __init__(self, g_frame, vm):
+        self.gi_frame = g_frame
+        self.vm = vm
+        self.started = False
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def send(self, value=None):
+        if not self.started and value is not None:
+            raise TypeError("can't send non-None value to a just-started generator")
+        if self.finished:
+            raise StopIteration
+        self.started = True
+        self.gi_frame.stack.append(value) # 这就是yield表达式的值
+        return self.resume()
+
+    def throw(self, exc_type, value=None, traceback=None):
+        exc = exc_type() if isinstance(exc_type, type) else exc_type
+        if value is not None:
+            exc = value
+        if not self.started or self.finished:
+            self.finished = True
+            raise exc
+        inner = self.yielding_from()
+        if inner is not None:
+            # 停在yield from里：和CPython一样先交给里面的迭代器
+            try:
+                if isinstance(exc, GeneratorExit):
+                    close = getattr(inner, 'close', None)
+                    if close is not None:
+                        close()
+                else:
+                    throw = getattr(inner, 'throw', None)
+                    if throw is not None:
+                        return throw(exc)
+            except StopIteration as e:
+                # 里面的迭代器结束了：像SEND一样，换成它的返回值，跳过yield
+                f = self.gi_frame
+                f.stack[-1] = e.value
+                f.last_instruction = f.code.instructions[f.last_instruction - 2][1][0]
+                return self.resume()
+            except BaseException as e:
+                exc = e
+        return self.resume(exc)
+
+    def __del__(self):
+        # 和CPython一样：挂起的生成器被回收时先close()，finally和with的清理才会执行
+        if self.started and not self.finished:
+            self.close()
+
+    def yielding_from(self):
+        '''The iterator that a paused yield from delegates to, or None.'''
+        f = self.gi_frame
+        i, instructions = f.last_instruction, f.code.instructions
+        if i >= 2 and instructions[i - 1][0] == 'YIELD_VALUE' and instructions[i - 2][0] == 'SEND':
+            return f.stack[-1]
+        return None
+
+    def close(self):
+        try:
+            self.throw(GeneratorExit)
+        except (GeneratorExit, StopIteration):
+            pass
+        else:
+            raise RuntimeError('generator ignored GeneratorExit')
+
+    def resume(self, exception=None):
+        try:
+            val = self.vm.run_frame(self.gi_frame, exception)
+        except StopIteration as e:
+            self.finished = True
+            raise RuntimeError('generator raised StopIteration') from e
+        except BaseException:
+            self.finished = True
+            raise
+        if self.finished:
+            raise StopIteration(val)
+        return val
+
+
+# -------- object model --------
+# VirtualMachine(object_model=load_object_model())：解释执行的class语句造出对象模型的Class。
+
+def load_object_model():
+    '''The simple object model module, imported on first use.'''
+    from . import simple_object_model
+    return simple_object_model
+
+
+# -------- green threads --------
+# 一个VirtualMachine上轮流跑很多个解释执行的任务：每个任务有自己的帧栈，
+# 跑够quantum条指令就换下一个。调用解释执行的函数不占宿主Python的栈（见call_function），
+# 所以换任务只是换一下vm.frames。asyncio导入要几十毫秒，用到的时候才导入。
+
+Suspend = collections.namedtuple('Suspend', 'awaitable')
+
+
+def block_on(awaitable):
+    '''Called from interpreted code run by a Scheduler: park the task until awaitable
+    (a coroutine, Task or Future) is done on the asyncio loop, then return its result
+    or raise its exception. Other tasks keep running in the meantime.'''
+    return Suspend(awaitable)
+
+
+class Task(object):
+    '''One green thread of a Scheduler: its own stack of frames.'''
+
+    def __init__(self, frame):
+        self.frames = [frame]
+        self.handled_exception = None
+        self.send_value = None # block_on()的结果，恢复的时候压到栈上
+        self.send_exception = None # 或者要在block_on()那里抛出的异常
+        self.resuming = False
+        self.done = False
+        self.result = None
+        self.exception = None
+        self.instructions = 0 # 一共分到了多少条指令
+        self.slices = 0 # 被调度了几次
+
+    def get_result(self):
+        if not self.done:
+            raise VirtualMachineError('task is not done')
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+class Scheduler(object):
+    '''Run many interpreted tasks on one VirtualMachine, each for 'quantum'
+    instructions at a time, round robin. Tasks waiting in block_on() are resumed
+    from the asyncio loop when their awaitable is done.'''
+
+    def __init__(self, vm=None, quantum=1000):
+        self.vm = vm or VirtualMachine()
+        self.quantum = quantum
+        self.ready = collections.deque()
+        self.waiting = 0
+        self._wakeup = None
+
+    def spawn(self, func, *args, **kwargs):
+        '''Start a task running func(*args, **kwargs); func is a Function of this
+        scheduler's VM, or a code object to run as a module (args: its globals).'''
+        if isinstance(func, types.CodeType):
+            global_names = args[0] if args else {'__builtins__': __builtins__, '__name__': '__main__'}
+            frame = self.vm.make_frame(func, global_names=global_names)
+        else:
+            frame = func.make_call_frame(list(args), kwargs)
+        task = Task(frame)
+        self.ready.append(task)
+        return task
+
+    def run(self):
+        '''Run until every task is done, on a new asyncio loop.'''
+        import asyncio
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        '''Run until every task is done, on the running asyncio loop.'''
+        import asyncio
+        self._wakeup = asyncio.Event()
+        while self.ready or self.waiting:
+            if not self.ready:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            for i in range(len(self.ready)):
+                self.run_slice(self.ready.popleft())
+            await asyncio.sleep(0) # 让事件循环处理一下IO和回调
+
+    def run_slice(self, task):
+        vm = self.vm
+        vm.frames, vm.frame = task.frames, task.frames[-1]
+        vm.handled_exception = task.handled_exception
+        why = None
+        if task.resuming:
+            task.resuming = False
+            if task.send_exception is not None:
+                vm.last_exception, task.send_exception = task.send_exception, None
+                why = vm.unwind_exception() # 就像是block_on()那条CALL抛出的
+            else:
+                vm.push(task.send_value)
+                task.send_value = None
+        why = vm.run_frames(1, why, self.quantum)
+        task.slices += 1
+        task.instructions += self.quantum - vm.budget_left
+        task.handled_exception = vm.handled_exception
+        if why is None: # 时间片用完了
+            self.ready.append(task)
+        elif why == 'suspend':
+            import asyncio
+            awaitable, vm.suspended = vm.suspended, None
+            try:
+                future = asyncio.ensure_future(awaitable)
+            except Exception as e:
+                # 不是awaitable（比如block_on(42)）：在这个任务里抛出，别的任务照样跑
+                task.resuming = True
+                task.send_exception = e
+                self.ready.append(task)
+            else:
+                self.waiting += 1
+                future.add_done_callback(lambda future: self._resume(task, future))
+        else:
+            task.done = True
+            if why == 'exception':
+                task.exception = vm.last_exception
+            else:
+                task.result = vm.return_value
+            task.frames = []
+        vm.frames, vm.frame = [], None
+
+    def _resume(self, task, future):
+        self.waiting -= 1
+        task.resuming = True
+        if future.cancelled():
+            import asyncio
+            task.send_exception = asyncio.CancelledError()
+        elif future.exception() is not None:
+            task.send_exception = future.exception()
+        else:
+            task.send_value = future.result()
+        self.ready.append(task)
+        self._wakeup.set()
+
+
+# -------- process pool --------
+# 一个VirtualMachine只能用一个核。VMPool先在父进程里把VM和共享的全局变量准备好，
+# 再fork出worker：它们直接继承已经解码好的code和setup定义的函数（写时复制，不用再加载一遍）。
+# 任务和结果都用marshal在管道里传。
+
+class RemoteError(VirtualMachineError):
+    '''An exception raised by a task in a VMPool worker that is not a builtin
+    exception type, so it cannot be rebuilt in the parent.'''
+
+    def __init__(self, type_name, args):
+        super().__init__('%s%r' % (type_name, tuple(args)))
+        self.type_name = type_name
+        self.remote_args = args
+
+
+def _marshal_exception(e):
+    args = e.args
+    try:
+        marshal.dumps(args)
+    except ValueError:
+        args = tuple(str(arg) for arg in args)
+    return (type(e).__module__, type(e).__qualname__, args)
+
+
+def _rebuild_exception(module, name, args):
+    exc_type = getattr(builtins, name, None) if module == 'builtins' else None
+    if isinstance(exc_type, type) and issubclass(exc_type, BaseException):
+        try:
+            return exc_type(*args)
+        except TypeError:
+            pass
+    return RemoteError(name, args)
+
+
+def _pool_worker(conn, vm, global_names, max_tasks):
+    '''The loop of a VMPool worker process: vm and global_names are the parent's,
+    inherited through fork.'''
+    done = 0
+    while max_tasks is None or done < max_tasks:
+        try:
+            message = conn.recv_bytes()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if not message: # 父进程让我们退出
+            break
+        index, code, names = marshal.loads(message)
+        namespace = dict(global_names)
+        if names:
+            namespace.update(names)
+        start = time.perf_counter()
+        try:
+            reply = (index, True, vm.run_code(code, namespace))
+        except Exception as e:
+            vm.frames, vm.frame = [], None
+            reply = (index, False, _marshal_exception(e))
+        elapsed = time.perf_counter() - start
+        try:
+            message = marshal.dumps(reply + (elapsed,))
+        except ValueError:
+            error = ('builtins', 'TypeError', ('result of type %s cannot be marshalled' % type(reply[2]).__name__,))
+            message = marshal.dumps((index, False, error, elapsed))
+        conn.send_bytes(message)
+        done += 1
+    conn.close()
+
+
+class _Worker(object):
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.in_flight = set() # 已经发出去、还没收到结果的任务
+        self.dispatched = 0
+        self.completed = 0
+        self.busy = 0.0 # 跑任务一共花的时间（worker自己量的）
+
+    def stats(self):
+        return {'pid': self.process.pid, 'tasks': self.completed, 'busy_sec': self.busy,
+                'tasks_per_sec': self.completed / self.busy if self.busy else 0.0,
+                'alive': self.process.is_alive()}
+
+
+class VMPool(object):
+    '''Run code objects on several worker processes, each with a warm VirtualMachine.
+
+    'setup' (source or a code object) is run once in the parent, into the globals every
+    task starts from; then the workers are forked. A task is a code object, or a
+    (code, names) pair whose names are added to a copy of those globals. Its result is
+    what run_code returns, so compile expressions with mode 'eval':
+
+        pool = VMPool(4, setup='def work(n): ...')
+        results = pool.map(compile('work(%d)' % n, '<task>', 'eval') for n in sizes)
+
+    Code, names and results go through marshal. Each worker gets at most 'queue_depth'
+    tasks ahead; with 'max_tasks_per_worker' a worker exits after that many tasks and a
+    fresh one is forked from the parent. Needs the fork start method (not Windows).'''
+
+    def __init__(self, processes=None, setup=None, global_names=None, queue_depth=2,
+                 max_tasks_per_worker=None, quicken=True):
+        self.processes = processes or os.cpu_count() or 1
+        self.queue_depth = queue_depth
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.vm = VirtualMachine(quicken=quicken)
+        self.global_names = {'__builtins__': __builtins__, '__name__': '__pool__'}
+        self.global_names.update(global_names or {})
+        if setup is not None:
+            if isinstance(setup, str):
+                setup = compile(setup, '<pool setup>', 'exec')
+            self.vm.run_code(setup, self.global_names)
+        import multiprocessing # 和asyncio一样，用到才导入
+        self.context = multiprocessing.get_context('fork')
+        self.workers = []
+        self.retired = [] # 做满max_tasks_per_worker或者挂掉的worker，留着看统计
+        self.restarts = 0
+        for i in range(self.processes):
+            self.workers.append(self._start_worker())
+
+    def _start_worker(self):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(target=_pool_worker, daemon=True,
+            args=(child_conn, self.vm, self.global_names, self.max_tasks_per_worker))
+        # fork之前把现有的对象都挪到gc的永久代，免得子进程里的垃圾回收去写它们的引用计数页；
+        # 父进程fork完就挪回来，不然这些对象在父进程里永远不会被回收
+        gc.freeze()
+        try:
+            process.start()
+        finally:
+            gc.unfreeze()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _replace(self, worker):
+        worker.conn.close()
+        worker.process.join()
+        self.retired.append(worker)
+        self.workers[self.workers.index(worker)] = self._start_worker()
+        self.restarts += 1
+
+    def _accepts(self, worker):
+        if len(worker.in_flight) >= self.queue_depth:
+            return False
+        return self.max_tasks_per_worker is None or worker.dispatched < self.max_tasks_per_worker
+
+    def _completed(self, tasks):
+        '''Yield (index, ok, value) for every task as it completes.'''
+        from multiprocessing.connection import wait
+        tasks = iter(tasks)
+        index = 0
+        exhausted = False
+        try:
+            while True:
+                # 先把还有空位的worker喂饱
+                for worker in self.workers:
+                    while not exhausted and self._accepts(worker):
+                        task = next(tasks, NULL)
+                        if task is NULL:
+                            exhausted = True
+                            break
+                        code, names = task if isinstance(task, tuple) else (task, None)
+                        message = marshal.dumps((index, code, names))
+                        try:
+                            worker.conn.send_bytes(message)
+                        except OSError:
+                            pass # worker已经挂了，下面收结果的时候会发现
+                        worker.in_flight.add(index)
+                        worker.dispatched += 1
+                        index += 1
+                busy = {worker.conn: worker for worker in self.workers if worker.in_flight}
+                if not busy:
+                    return
+                for conn in wait(list(busy)):
+                    worker = busy[conn]
+                    try:
+                        message = conn.recv_bytes()
+                    except (EOFError, OSError): # worker挂了：它手上的任务都算失败，换一个新的
+                        error = VirtualMachineError('worker %d died' % worker.process.pid)
+                        lost, worker.in_flight = worker.in_flight, set()
+                        self._replace(worker)
+                        for i in sorted(lost):
+                            yield i, False, error
+                        continue
+                    i, ok, value, elapsed = marshal.loads(message)
+                    worker.in_flight.discard(i)
+                    worker.completed += 1
+                    worker.busy += elapsed
+                    if worker.dispatched == self.max_tasks_per_worker and not worker.in_flight:
+                        self._replace(worker) # 它已经自己退出了
+                    yield i, ok, value if ok else _rebuild_exception(*value)
+        finally:
+            # 调用者中途不要结果了：把已经发出去的收回来，管道里不能留着旧的结果
+            for worker in list(self.workers):
+                while worker.in_flight:
+                    try:
+                        i = marshal.loads(worker.conn.recv_bytes())[0]
+                    except (EOFError, OSError):
+                        worker.in_flight.clear()
+                        self._replace(worker)
+                        break
+                    worker.in_flight.discard(i)
+                    worker.completed += 1
+                else:
+                    if worker.dispatched == self.max_tasks_per_worker:
+                        self._replace(worker)
+
+    @staticmethod
+    def _outcome(ok, value, return_exceptions):
+        if ok or return_exceptions:
+            return value
+        raise value
+
+    def imap(self, tasks, return_exceptions=False):
+        '''Results in task order. A task's exception is raised when its turn comes,
+        or yielded in its place with return_exceptions=True.'''
+        buffered = {}
+        next_index = 0
+        for index, ok, value in self._completed(tasks):
+            buffered[index] = (ok, value)
+            while next_index in buffered:
+                ok, value = buffered.pop(next_index)
+                next_index += 1
+                yield self._outcome(ok, value, return_exceptions)
+
+    def imap_unordered(self, tasks, return_exceptions=False):
+        '''(index, result) pairs, in the order the tasks complete.'''
+        for index, ok, value in self._completed(tasks):
+            yield index, self._outcome(ok, value, return_exceptions)
+
+    def map(self, tasks, return_exceptions=False):
+        return list(self.imap(tasks, return_exceptions))
+
+    def stats(self):
+        '''Per-worker task counts and throughput, retired workers included.'''
+        return [worker.stats() for worker in self.retired + self.workers]
+
+    def close(self):
+        for worker in self.workers:
+            try:
+                worker.conn.send_bytes(b'')
+            except OSError:
+                pass
+        for worker in self.workers:
+            worker.process.join()
+            worker.conn.close()
+        self.retired.extend(self.workers)
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+
+# -------------------------------- BENCHMARKS ----------------------------------
+# python -m five_hundred_lines.interpreter bench [-n N] [--repeat R] [--processes P] [scenario ...]
+# 每个bench_*(quicken)返回run(n)，分别在打开和关掉quickening的VM上跑；bench_toy_program(native)比较玩具解释器的两种跑法
+
+BENCH_SOURCE = textwrap.dedent('''
+    def numeric_loop(n):
+        total = 0
+        i = 0
+        while i < n:
+            total += i * 2 - 1
+            i += 1
+        return total
+
+    class Point:
+        def __init__(self, x, y):
+            self.x = x
+            self.y = y
+
+    def attr_loop(n):
+        p = Point(1.5, 2.5)
+        total = 0.0
+        for i in range(n):
+            total = total + p.x * p.y
+        return total
+    ''')
+
+def _bench_namespace(quicken):
+    vm = VirtualMachine(quicken=quicken)
+    namespace = {'__builtins__': __builtins__, '__name__': '__bench__'}
+    vm.run_code(compile(BENCH_SOURCE, '<bench>', 'exec'), namespace)
+    return vm, namespace
+
+MODEL_BENCH_SOURCE = textwrap.dedent('''
+    class Vec:
+        def __init__(self, x, y):
+            self.x = x
+            self.y = y
+
+        def dot(self, other):
+            return self.x * other.x + self.y * other.y
+
+    def model_loop(n):
+        v = Vec(1.5, 2.5)
+        w = Vec(0.5, 1.0)
+        total = 0.0
+        for i in range(n):
+            total = total + v.dot(w) + v.x * w.y
+            w.x = v.y
+        return total
+    ''')
+
+def bench_model_loop(quicken):
+    ''' classes of the object model: with quickening, attribute access hits the map caches'''
+    vm = VirtualMachine(quicken=quicken, object_model=load_object_model())
+    namespace = {'__builtins__': __builtins__, '__name__': '__bench__'}
+    vm.run_code(compile(MODEL_BENCH_SOURCE, '<bench>', 'exec'), namespace)
+    def run(n):
+        namespace['model_loop'](n)
+    return run
+
+def bench_numeric_loop(quicken):
+    vm, namespace = _bench_namespace(quicken)
+    def run(n):
+        namespace['numeric_loop'](n)
+    return run
+
+def bench_attr_loop(quicken):
+    vm, namespace = _bench_namespace(quicken)
+    def run(n):
+        namespace['attr_loop'](n)
+    return run
+
+def bench_toy_program(native):
+    ''' the toy Interpreter running one 50-addition program over and over'''
+    instructions = [('LOAD_VALUE', 0), ('STORE_NAME', 0)]
+    instructions += [('LOAD_NAME', 0), ('LOAD_VALUE', 1), ('ADD_TWO_VALUES', None), ('STORE_NAME', 0)] * 50
+    program = {'instructions': instructions, 'numbers': [0, 1], 'names': ['total']}
+    interpreter = Interpreter(native)
+    def run(n):
+        for i in range(n):
+            interpreter.execute(program)
+    return run
+
+def measure_startup(path=inspect.__file__, repeat=5):
+    ''' time decoding every code object of the module at 'path' in a fresh VM:
+    cold (no disk cache) and warm (DiskCodeCache already filled)'''
+    with open(path) as f:
+        code_obj = compile(f.read(), path, 'exec')
+    def decode_all(disk_cache):
+        vm = VirtualMachine(disk_cache=disk_cache)
+        for code in walk_code(code_obj):
+            vm.decode(code)
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        disk_cache = DiskCodeCache(directory)
+        decode_all(disk_cache) # 填缓存
+        timings = {}
+        for name, cache in (('cold_sec', None), ('warm_sec', disk_cache)):
+            best = None
+            for i in range(repeat):
+                start = time.perf_counter()
+                decode_all(cache)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+    timings['module'] = path
+    timings['code_objects'] = sum(1 for code in walk_code(code_obj))
+    return timings
+
+def measure_pool_scaling(max_processes=None, tasks=32, n=20000, repeat=3):
+    ''' time 'tasks' calls of numeric_loop(n) in-process (serial) and on a VMPool of
+    1..max_processes workers; speedup is relative to the serial run'''
+    max_processes = max_processes or os.cpu_count() or 1
+    work = [compile('numeric_loop(%d)' % n, '<bench task>', 'eval')] * tasks
+    def best_of(run):
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+    vm, namespace = _bench_namespace(True)
+    serial = best_of(lambda: [vm.run_code(code, dict(namespace)) for code in work])
+    rows = [{'processes': 0, 'best_sec': serial, 'tasks_per_sec': tasks / serial, 'speedup': 1.0}]
+    for processes in range(1, max_processes + 1):
+        with VMPool(processes, setup=BENCH_SOURCE) as pool:
+            pool.map(work[:processes]) # 每个worker先热一下
+            elapsed = best_of(lambda: pool.map(work))
+        rows.append({'processes': processes, 'best_sec': elapsed, 'tasks_per_sec': tasks / elapsed,
+                     'speedup': serial / elapsed})
+    return {'cpu_count': os.cpu_count(), 'tasks': tasks, 'n': n, 'results': rows}
+
+def measure_toy_backends(size=200, executions=1000, repeat=5):
+    ''' the toy Interpreter on a program of 'size' additions, getattr loop vs the native
+    backend: one-off (translated every time) and repeated (cached code, run 'executions' times)'''
+    instructions = [('LOAD_VALUE', 0), ('STORE_NAME', 0)]
+    instructions += [('LOAD_NAME', 0), ('LOAD_VALUE', 1), ('ADD_TWO_VALUES', None), ('STORE_NAME', 0)] * size
+    program = {'instructions': instructions, 'numbers': [0, 1], 'names': ['total']}
+    def best_of(run):
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+    def one_off(native):
+        if native:
+            compile_program.cache_clear()
+        interpreter = Interpreter(native)
+        interpreter.execute(program)
+        assert interpreter.environment['total'] == size
+    def repeated(native):
+        interpreter = Interpreter(native)
+        for i in range(executions):
+            interpreter.execute(program)
+    results = []
+    for native in (False, True):
+        results.append({'backend': 'native' if native else 'interpret',
+                        'one_off_sec': best_of(lambda: one_off(native)),
+                        'repeated_sec_per_execution': best_of(lambda: repeated(native)) / executions})
+    return {'size': size, 'executions': executions, 'results': results}
+
+def run_benchmarks(n=20000, repeat=5, names=None, processes=None):
+    ''' run every bench_* scenario with its flag (quicken, or native for the toy Interpreter)
+    off and on, return a JSON-able dict'''
+    scenarios = sorted((name[len('bench_'):], func) for name, func in globals().items()
+                       if name.startswith('bench_') and name != 'bench_main')
+    results = []
+    for name, scenario in scenarios:
+        if names and name not in names:
+            continue
+        flag, = inspect.signature(scenario).parameters
+        for value in (False, True):
+            run = scenario(value)
+            run(min(n, 1000)) # warm up: the instructions get specialized here
+            timings = []
+            for i in range(repeat):
+                start = time.perf_counter()
+                run(n)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            results.append({'scenario': name, flag: value, 'n': n, 'best_sec': best,
+                            'iterations_per_sec': n / best if best else float('inf')})
+    report = {'python': sys.version.split()[0], 'repeat': repeat, 'results': results,
+              'startup': measure_startup(repeat=repeat)}
+    report['toy_interpreter'] = measure_toy_backends(repeat=repeat)
+    if processes != 0:
+        report['pool_scaling'] = measure_pool_scaling(processes, n=n, repeat=min(repeat, 3))
+    return report
+
+def bench_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the Byterun VM with and without quickening.')
+    parser.add_argument('-n', type=int, default=20000, help='loop iterations per run')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per scenario, the best one is reported')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='VMPool scaling up to this many workers (default: all cores, 0: skip)')
+    parser.add_argument('scenarios', nargs='*', help='only run these scenarios')
+    args = parser.parse_args(argv)
+    print(json.dumps(run_benchmarks(args.n, args.repeat, args.scenarios, args.processes), indent=2))
+
+
+
+
+# -------------------------------- TEST CODE ----------------------------------
+
+def _run_both(source, *names):
+    '''Run source natively and on the VirtualMachine, check that 'names' end up equal.'''
+    code = compile(source, '<demo>', 'exec')
+    native, interpreted = {}, {'__builtins__': __builtins__, '__name__': '__main__'}
+    exec(code, native)
+    VirtualMachine().run_code(code, interpreted)
+    for name in names:
+        assert native[name] == interpreted[name], (name, native[name], interpreted[name])
+    return interpreted
+
+def test_control_flow():
+    _run_both(textwrap.dedent('''
+        def cond():
+            x = 3
+            if x < 5:
+                return 'yes'
+            else:
+                return 'no'
+        def loop():
+            x = 1
+            while x < 5:
+                x = x + 1
+            return x
+        result = cond(), loop()
+        '''), 'result')
+
+def test_exception_table():
+    # try/except/finally and with: no blocks are pushed, the handlers come from the exception table
+    env = _run_both(textwrap.dedent('''
+        log = []
+        def f(n):
+            try:
+                if n:
+                    raise ValueError(n)
+                log.append('ok')
+            except ValueError as e:
+                log.append(('caught', e.args))
+            finally:
+                log.append('finally')
+            for i in range(3):
+                try:
+                    continue
+                finally:
+                    log.append(i)
+        f(0)
+        f(1)
+        def g():
+            try:
+                1 / 0
+            except KeyError:
+                pass
+        try:
+            g() # 异常穿过g的帧
+        except ZeroDivisionError as e:
+            log.append(type(e).__name__)
+        class Suppress:
+            def __enter__(self):
+                return self
+            def __exit__(self, *exc_info):
+                log.append(exc_info[0])
+                return True
+        with Suppress():
+            raise KeyError('k')
+        '''), 'log')
+    assert env['log'][-1] is KeyError
+
+def test_closures_classes_generators():
+    # closures, classes with super(), comprehensions and generators
+    _run_both(textwrap.dedent('''
+        def counter():
+            n = 0
+            def inc(k=1, *, by=1):
+                nonlocal n
+                n += k * by
+                return n
+            return inc
+        c = counter()
+        counts = [c(), c(2, by=3), c()]
+        class A:
+            def __init__(self, v):
+                self.v = v
+            def get(self):
+                return self.v
+        class B(A):
+            def get(self):
+                return super().get() + 1
+        got = B(1).get()
+        squares = {i: i * i for i in range(5) if i != 2}
+        def gen(n):
+            for i in range(n):
+                sent = yield i
+                if sent:
+                    yield sent * 10
+            return 'done'
+        def outer():
+            r = yield from gen(3)
+            yield r
+        items = list(outer())
+        g = gen(5)
+        next(g)
+        sent = g.send(7)
+        log = []
+        def inner():
+            try:
+                yield 1
+            except KeyError:
+                yield 'caught'
+            finally:
+                log.append('inner closed')
+            return 'inner done'
+        def delegate():
+            r = yield from inner()
+            log.append(r)
+            yield 'after'
+        g = delegate()
+        next(g)
+        thrown = [g.throw(KeyError), next(g)] # throw() goes to the generator yield from is waiting on
+        g.close()
+        g = delegate()
+        next(g)
+        g.close() # and so does close()
+        def returns():
+            try:
+                yield 1
+            except KeyError:
+                return 'stopped'
+        def delegate_value():
+            r = yield from returns()
+            yield r
+        g = delegate_value()
+        next(g)
+        thrown.append(g.throw(KeyError)) # the inner generator returned: yield from gives its value
+        def cleanup():
+            try:
+                yield 1
+            finally:
+                log.append('cleaned up')
+        g = cleanup()
+        next(g)
+        del g
+        import gc
+        gc.collect() # a suspended generator is closed when it is collected
+        '''), 'counts', 'got', 'squares', 'items', 'sent', 'thrown', 'log')
+
+
+def test_quickening():
+    # quickening: the hot instructions of a monomorphic loop get specialized; a guard that
+    # fails puts the generic instruction back
+    vm = VirtualMachine()
+    namespace = {'__builtins__': __builtins__, '__name__': '__demo__'}
+    vm.run_code(compile(BENCH_SOURCE, '<bench>', 'exec'), namespace)
+    assert namespace['numeric_loop'](200) == sum(i * 2 - 1 for i in range(200))
+    assert namespace['attr_loop'](100) == 100 * 1.5 * 2.5
+    current = {row['current'] for row in vm.specialization_stats()}
+    assert {'COMPARE_LT_INT', 'BINARY_MULTIPLY_INT', 'INPLACE_ADD_INT', 'LOAD_ATTR_INSTANCE',
+            'BINARY_MULTIPLY_FLOAT', 'BINARY_ADD_FLOAT'} <= current, current
+    assert namespace['numeric_loop'](2.0 ** 3) == sum(i * 2 - 1 for i in range(8)) # float n: COMPARE_LT_INT deoptimizes
+    row, = [row for row in vm.specialization_stats() if row['generic'] == 'COMPARE_OP']
+    assert row['current'] == 'COMPARE_OP' and row['deopts'] == 1
+    # a property added to the class afterwards wins over the instance __dict__: LOAD_ATTR_INSTANCE deoptimizes
+    vm.run_code(compile(textwrap.dedent('''
+        class P:
+            pass
+        p = P()
+        p.x = 1
+        def read_x():
+            return p.x
+        '''), '<demo>', 'exec'), namespace)
+    assert [namespace['read_x']() for i in range(QUICKEN_THRESHOLD + 2)][-1] == 1
+    assert 'LOAD_ATTR_INSTANCE' in {row['current'] for row in vm.specialization_stats()}
+    namespace['P'].x = property(lambda self: 42)
+    assert namespace['read_x']() == 42
+
+
+def test_disk_cache():
+    global VM_VERSION
+    import tempfile
+    # the decoded code can be kept on disk: a second VM (or process) does not decode again
+    with tempfile.TemporaryDirectory() as directory:
+        code_obj = compile(BENCH_SOURCE, '<bench>', 'exec')
+        cold = VirtualMachine(disk_cache=DiskCodeCache(directory))
+        cold.run_code(code_obj, {'__builtins__': __builtins__, '__name__': '__demo__'})
+        assert cold.disk_cache.misses == 1 and len(os.listdir(directory)) == 1
+        warm_cache = DiskCodeCache(directory)
+        warm = VirtualMachine(disk_cache=warm_cache)
+        namespace = {'__builtins__': __builtins__, '__name__': '__demo__'}
+        warm.run_code(code_obj, namespace)
+        assert namespace['numeric_loop'](10) == sum(i * 2 - 1 for i in range(10))
+        assert warm_cache.hits == 1 and warm_cache.misses == 0 # the nested functions came with the module
+        assert warm.code_cache[code_obj].instructions == decode_code(code_obj).instructions
+        # a damaged file is noticed, decoded again and rewritten
+        path, = [os.path.join(directory, name) for name in os.listdir(directory)]
+        with open(path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+        damaged = DiskCodeCache(directory)
+        VirtualMachine(disk_cache=damaged).decode(code_obj)
+        assert damaged.corrupt == 1 and damaged.misses == 1
+        # so is one written by another VM version
+        key = damaged.key(code_obj)
+        VM_VERSION += 1
+        try:
+            stale = DiskCodeCache(directory)
+            assert stale.load(code_obj, key) is None and stale.stale == 1
+        finally:
+            VM_VERSION -= 1
+        fresh = DiskCodeCache(directory)
+        VirtualMachine(disk_cache=fresh).decode(code_obj)
+        assert fresh.hits == 1
+
+
+def test_scheduler():
+    import asyncio
+    # green threads: many interpreted tasks share one VM, each runs 'quantum' instructions
+    # at a time; a task in block_on() waits on the asyncio loop while the others go on
+    SCHEDULER_SOURCE = textwrap.dedent('''
+        def fib(n):
+            return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+        def worker(i, trace):
+            total = 0
+            for k in range(20):
+                total += fib(3)
+                trace.append(i)
+            return total + i
+
+        def sleeper(i, delay):
+            block_on(asyncio.sleep(delay))
+            return i * i
+
+        def failing():
+            try:
+                block_on(asyncio.sleep(0.001))
+                block_on(raise_later())
+            except ValueError as e:
+                return 'caught ' + str(e)
+            return 'not caught'
+
+        def not_awaitable():
+            try:
+                block_on(42)
+            except TypeError:
+                return 'caught TypeError'
+        ''')
+
+    async def raise_later():
+        await asyncio.sleep(0.001)
+        raise ValueError('boom')
+
+    scheduler = Scheduler(quantum=50)
+    namespace = {'__builtins__': __builtins__, '__name__': '__demo__', 'block_on': block_on,
+                 'asyncio': asyncio, 'raise_later': raise_later}
+    scheduler.vm.run_code(compile(SCHEDULER_SOURCE, '<scheduler>', 'exec'), namespace)
+    trace = []
+    tasks = [scheduler.spawn(namespace['worker'], i, trace) for i in range(1000)]
+    scheduler.run()
+    assert [task.get_result() for task in tasks] == [20 * 2 + i for i in range(1000)]
+    assert len(set(trace[:20])) > 1 # 各任务是交错着跑的
+    assert all(task.slices > 1 for task in tasks) and not scheduler.vm.frames
+
+    scheduler = Scheduler(quantum=50)
+    scheduler.vm.run_code(compile(SCHEDULER_SOURCE, '<scheduler>', 'exec'), namespace)
+    started = time.perf_counter()
+    tasks = [scheduler.spawn(namespace['sleeper'], i, 0.05) for i in range(100)]
+    failing = scheduler.spawn(namespace['failing'])
+    bad = scheduler.spawn(namespace['not_awaitable']) # the error stays in its task
+    scheduler.run()
+    assert time.perf_counter() - started < 1.0 # 100个0.05秒的sleep是一起等的
+    assert [task.get_result() for task in tasks] == [i * i for i in range(100)]
+    assert failing.get_result() == 'caught boom'
+    assert bad.get_result() == 'caught TypeError'
+
+
+def test_pool():
+    # a pool of forked workers, each with the VM and the setup's functions already loaded
+    frozen = gc.get_freeze_count()
+    with VMPool(2, setup=BENCH_SOURCE + 'class Oops(Exception): pass\ndef bad(): raise Oops(1)\n',
+                queue_depth=1, max_tasks_per_worker=5) as pool:
+        tasks = [compile('numeric_loop(%d)' % n, '<task>', 'eval') for n in range(20)]
+        assert pool.map(tasks) == [sum(i * 2 - 1 for i in range(n)) for n in range(20)]
+        assert pool.restarts >= 3 and all(row['tasks'] == 5 for row in pool.stats()[:pool.restarts]) # 每个worker跑5个任务就换一个新的
+        assert sorted(pool.imap_unordered(tasks[:4])) == [(n, sum(i * 2 - 1 for i in range(n))) for n in range(4)]
+        outcomes = pool.map([(compile('x * 2', '<task>', 'eval'), {'x': 21}), compile('1 / 0', '<task>', 'eval'),
+                             compile('bad()', '<task>', 'eval')], return_exceptions=True)
+        assert outcomes[0] == 42 and type(outcomes[1]) is ZeroDivisionError and type(outcomes[2]) is RemoteError
+        outcomes = pool.map([compile("__import__('os')._exit(1)", '<task>', 'eval'), tasks[3]], return_exceptions=True)
+        assert type(outcomes[0]) is VirtualMachineError and outcomes[1] == 3 # 挂掉的worker被换掉了
+        assert sum(row['tasks'] for row in pool.stats()) == 20 + 4 + 3 + 1
+    assert gc.get_freeze_count() == frozen # gc.freeze() only around the forks
+
+
+def test_object_model_classes():
+    # classes of the simple object model: attributes go through read_attr/write_attr,
+    # and the hot attribute instructions cache the instance's map
+    om = load_object_model()
+    vm = VirtualMachine(object_model=om)
+    namespace = {'__builtins__': __builtins__, '__name__': '__demo__'}
+    vm.run_code(compile(MODEL_BENCH_SOURCE + textwrap.dedent('''
+        class Lazy(Vec):
+            def __getattr__(self, name):
+                return name * 2
+        lazy = Lazy(1, 2)
+        vectors = [Vec(i, i) for i in range(50)]
+        '''), '<model>', 'exec'), namespace)
+    Vec, lazy = namespace['Vec'], namespace['lazy']
+    assert type(Vec) is om.Class and type(lazy) is om.Instance and lazy.isinstance(Vec)
+    assert lazy.read_attr('y') == 2 and lazy.read_attr('zz') == 'zzzz' # 走的是对象模型的__getattr__
+    native = {}
+    exec(MODEL_BENCH_SOURCE, native)
+    assert namespace['model_loop'](100) == native['model_loop'](100)
+    current = {row['current'] for row in vm.specialization_stats()}
+    assert {'LOAD_ATTR_MODEL_FIELD', 'LOAD_METHOD_MODEL', 'STORE_ATTR_MODEL_FIELD', 'STORE_ATTR_MODEL_ADD'} <= current, current
+    # 往类里写东西：类上的缓存都失效了，换回通用指令，结果还是对的
+    Vec.write_attr('dot', lambda self, other: 0.0)
+    native['Vec'].dot = lambda self, other: 0.0
+    assert namespace['model_loop'](10) == native['model_loop'](10)
+
+
+def main(argv=None):
+    '''Run the demos below; "bench" runs the benchmarks instead.'''
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['bench']:
+        bench_main(argv[1:])
+        return
+
+    what_to_execute_0 = { # 7 + 5
+        'instructions':[('LOAD_VALUE', 0), # the first number
+                        ('LOAD_VALUE', 1), # the second number
+                        ('ADD_TWO_VALUES', None),
+                        ('PRINT_ANSWER', None)],
+        'numbers': [7, 5]
+    }
+
+    # 加3个数，Interpreter 类不用做任何修改
+
+    what_to_execute_1 = { # 7 + 5 + 8
+        'instructions':[('LOAD_VALUE', 0), 
+                        ('LOAD_VALUE', 1), 
+                        ('ADD_TWO_VALUES', None),
+                        ('LOAD_VALUE', 2),
+                        ('ADD_TWO_VALUES', None),
+                        ('PRINT_ANSWER', None)],
+        'numbers': [7, 5, 8]
+    }
+
+
+    # def s():
+    #     a = 1
+    #     b = 2
+    #     print(a + b)
+
+    '''complier for 's' '''
+
+    what_to_execute_2 = { # 7 + 5 + 8
+        'instructions':[('LOAD_VALUE', 0),
+                        ('STORE_NAME', 0), 
+                        ('LOAD_VALUE', 1),
+                        ('STORE_NAME', 1), 
+                        ('LOAD_NAME', 0),
+                        ('LOAD_NAME', 1),
+                        ('ADD_TWO_VALUES', None),
+                        ('PRINT_ANSWER', None)],
+        'numbers': [1, 2],
+        'names': ['a', 'b']
+    }
+
+    interpreter = Interpreter()
+    interpreter.execute(what_to_execute_2)
+
+    # 同一个程序翻译成CPython的code object来跑，结果一样；只是数字不同的程序共用一份翻译
+    native = Interpreter(native=True)
+    native.execute(what_to_execute_2)
+    assert native.environment == interpreter.environment == {'a': 1, 'b': 2}
+    native.execute(dict(what_to_execute_2, numbers=[10, 20]))
+    assert native.environment == {'a': 10, 'b': 20} and compile_program.cache_info().hits >= 1
+    native.stack.extend(['x', 'y'])
+    native.execute({'instructions': [('ADD_TWO_VALUES', None), ('LOAD_VALUE', 0)], 'numbers': [3]})
+    assert native.stack == ['yx', 3] # 接着用之前留在栈上的值，没用完的留在栈上，和解释执行一样
+
+
+    # --- demo of a real python bytecode ---
+
+    def cond():
+        x = 3
+        if x < 5:
+            return 'yes'
+        else:
+            return 'no'
+
+    print(cond.__code__.co_code)
+    print(list(cond.__code__.co_code))
+
+    # print(dis.dis(cond))
+    print_result = '''
+                    142           0 LOAD_CONST               1 (3)
+                                  2 STORE_FAST               0 (x)
+
+                    143           4 LOAD_FAST                0 (x)
+                                  6 LOAD_CONST               2 (5)
+                                  8 COMPARE_OP               0 (<)
+                                 10 POP_JUMP_IF_FALSE       16
+
+                    144          12 LOAD_CONST               3 ('yes')
+                                 14 RETURN_VALUE
+
+                    146     >>   16 LOAD_CONST               4 ('no')
+                                 18 RETURN_VALUE
+                                 20 LOAD_CONST               0 (None)
+                                 22 RETURN_VALUE
+
+                    '''
+
+    def loop():
+        x = 1
+        while x < 5:
+            x = x + 1
+        return x
+
+    # print(dis.dis(loop))
+    print_result = '''    
+                    173           0 LOAD_CONST               1 (1)
+                                  2 STORE_FAST               0 (x)
+
+                    174           4 SETUP_LOOP              20 (to 26)
+                            >>    6 LOAD_FAST                0 (x)
+                                  8 LOAD_CONST               2 (5)
+                                 10 COMPARE_OP               0 (<)
+                                 12 POP_JUMP_IF_FALSE       24
+
+                    175          14 LOAD_FAST                0 (x)
+                                 16 LOAD_CONST               1 (1)
+                                 18 BINARY_ADD
+                                 20 STORE_FAST               0 (x)
+                                 22 JUMP_ABSOLUTE            6
+                            >>   24 POP_BLOCK
+
+                    176     >>   26 LOAD_FAST                0 (x)
+                                 28 RETURN_VALUE
+
+                    '''
+
+
+
+
+    
+
+    # --- the same programs on the VirtualMachine ---
+    test_control_flow()
+    test_exception_table()
+    test_closures_classes_generators()
+    test_quickening()
+    test_disk_cache()
+    test_scheduler()
+    test_pool()
+    test_object_model_classes()
+
+
+if __name__ == '__main__':
+    main()
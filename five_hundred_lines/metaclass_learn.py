@@ -0,0 +1,1940 @@
+
+'''From liaoxuefeng.com'''
+
+import collections
+import contextlib
+import datetime
+import itertools
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import sys
+import time
+
+# 这个模块的日志都走这个logger：logging.debug()这些模块级函数在root没有handler时会调用basicConfig()，
+# 库不应该替程序配置日志
+log = logging.getLogger(__name__)
+
+class Hello(object):
+    def hello(self, name='world'):
+        print('Hello, %s.' % name)
+
+# 用type()创建class
+
+def fn(self, name='world'):
+    print('Hello, %s.' % name)
+
+# Hello = type('Hello', (object,), dict(hello=fn)) # 创建Hello class
+
+# metaclass是类的模版，必须从'type'类型派生：
+class ListMetaclass(type):
+    def __new__(cls, name, bases, attrs):
+        # cls: 当前准备创建的类的对象
+        # name: 类的名字 (MyList)
+        # bases: 继承的父类 (list)
+        # attrs: 类的方法集合
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('%s', cls)
+        attrs['add'] = lambda self, value: self.append(value)
+        return type.__new__(cls, name, bases, attrs)
+
+class MyList(list, metaclass=ListMetaclass):
+    pass
+
+# 用元类编写一个ORM框架
+
+# 数据库连接：用标准库的sqlite3，不需要数据库服务器也能测试
+
+_connection = None
+_transaction_depth = 0
+
+def connect(database=':memory:', **kw):
+    '''Open the connection that all models use, and return it.'''
+    global _connection, _transaction_depth
+    if _connection is not None:
+        _connection.close()
+    # autocommit mode: transactions are started explicitly by transaction()
+    _connection = sqlite3.connect(database, isolation_level=None, **kw)
+    _transaction_depth = 0
+    if _cache is not None:
+        _cache.clear() # 换了数据库
+    return _connection
+
+def get_connection():
+    if _connection is None:
+        raise RuntimeError('no database connection, call connect() first')
+    return _connection
+
+@contextlib.contextmanager
+def transaction():
+    '''Run the statements inside in one transaction; nested calls join the outer one.'''
+    global _transaction_depth
+    conn = get_connection()
+    if _transaction_depth:
+        _transaction_depth += 1
+        try:
+            yield conn
+        finally:
+            _transaction_depth -= 1
+        return
+    conn.execute('begin')
+    _transaction_depth = 1
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('rollback')
+        raise
+    else:
+        conn.execute('commit')
+    finally:
+        _transaction_depth = 0
+        if _dirty_tables:
+            for table in _dirty_tables:
+                _invalidate(table)
+            _dirty_tables.clear()
+
+def execute(sql, args=()):
+    '''Execute one INSERT/UPDATE/DELETE and return the number of affected rows.'''
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('SQL: %s ARGS: %s', sql, args)
+    with transaction() as conn:
+        return conn.execute(sql, args).rowcount
+
+# 查询结果缓存：默认关闭，enable_cache()打开
+# 缓存的是数据库返回的原始行（tuple），每次读都重新decode，拿到的模型对象互不影响
+
+class QueryCache(object):
+    '''An LRU cache of query results, keyed by SQL and parameters and bounded by
+    both the number of entries and their approximate size in bytes.
+
+    Entries are grouped by table; the ORM drops a table's entries whenever it
+    writes to that table. Writes that bypass the ORM are not seen, and neither are
+    other tables referenced by a hand-written where clause.'''
+
+    def __init__(self, max_entries=1000, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict() # (sql, args) -> (table, rows, size)，最近用过的在后面
+        self._tables = {} # table -> set of keys
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, sql, args):
+        '''The cached rows of sql with args, or None.'''
+        key = (sql, args)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, table, sql, args, rows):
+        key = (sql, args)
+        size = rows_size(rows)
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (table, rows, size)
+        self._tables.setdefault(table, set()).add(key)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, table):
+        '''Drop every cached result read from table.'''
+        for key in self._tables.pop(table, ()):
+            self.invalidations += 1
+            self.bytes -= self._entries.pop(key)[2]
+
+    def clear(self):
+        self._entries.clear()
+        self._tables.clear()
+        self.bytes = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            table, rows, size = entry
+            self.bytes -= size
+            keys = self._tables[table]
+            keys.discard(key)
+            if not keys:
+                del self._tables[table]
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.bytes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'invalidations': self.invalidations}
+
+
+def rows_size(rows):
+    '''Approximate memory taken by a list of row tuples, in bytes.'''
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+    return size
+
+_cache = None
+_dirty_tables = set() # 当前事务里写过的表，事务结束时再清一次缓存
+
+def enable_cache(max_entries=1000, max_bytes=16 * 1024 * 1024):
+    '''Cache the results of find() and select() from now on; return the QueryCache.'''
+    global _cache
+    _cache = QueryCache(max_entries, max_bytes)
+    return _cache
+
+def disable_cache():
+    global _cache
+    _cache = None
+
+def get_cache():
+    '''The QueryCache in use, or None when caching is off.'''
+    return _cache
+
+def _cache_key(args):
+    # 参数不能做dict的key（比如list）时就不缓存
+    args = tuple(args)
+    try:
+        hash(args)
+    except TypeError:
+        return None
+    return args
+
+def _invalidate(table):
+    '''Called by the ORM whenever it writes to table.'''
+    if _cache is not None:
+        _cache.invalidate(table)
+        if _transaction_depth:
+            # 事务里读到的是还没提交的数据，可能被回滚，事务结束时要再清一次
+            _dirty_tables.add(table)
+
+
+# 根据字段类型生成转换/校验函数：value -> 写进数据库的值
+# 不合法的值抛出TypeError、ValueError或OverflowError（太大的int转float）；None总是可以的
+
+_INT_RANGES = {
+    'tinyint': 8, 'smallint': 16, 'int': 32, 'integer': 64, 'bigint': 64,
+}
+
+def _int_converter(bits):
+    low, high = -2 ** (bits - 1), 2 ** (bits - 1) - 1
+    def convert(value):
+        if type(value) is not int:
+            if value is None:
+                return None
+            if isinstance(value, bool):
+                raise TypeError('expected an integer, got a bool')
+            if isinstance(value, float):
+                if not value.is_integer():
+                    raise ValueError('%r is not an integer' % value)
+            elif not isinstance(value, (int, str)):
+                raise TypeError('expected an integer, got %s' % type(value).__name__)
+            value = int(value)
+        if not low <= value <= high:
+            raise ValueError('%d does not fit in %d bits' % (value, bits))
+        return value
+    return convert
+
+def _string_converter(max_length):
+    def convert(value):
+        if type(value) is not str:
+            if value is None:
+                return None
+            raise TypeError('expected a string, got %s' % type(value).__name__)
+        if max_length is not None and len(value) > max_length:
+            raise ValueError('longer than %d characters' % max_length)
+        return value
+    return convert
+
+def _float_converter(value):
+    if type(value) is not float:
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise TypeError('expected a number, got %s' % type(value).__name__)
+        value = float(value)
+    if not math.isfinite(value):
+        raise ValueError('%r is not a finite number' % value) # 'nan'、'1e400'都能转成float，但不是合法的值
+    return value
+
+_BOOLEAN_STRINGS = {'true': True, 'false': False, '1': True, '0': False}
+
+def _bool_converter(value):
+    if type(value) is not bool:
+        if value is None:
+            return None
+        if isinstance(value, int) and value in (0, 1):
+            return bool(value)
+        if isinstance(value, str) and value.lower() in _BOOLEAN_STRINGS:
+            return _BOOLEAN_STRINGS[value.lower()]
+        raise ValueError('%r is not a boolean' % (value, ))
+    return value
+
+def _datetime_converter(value):
+    # stored as ISO 8601 text, which sqlite's date functions understand
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    elif not isinstance(value, datetime.datetime):
+        if type(value) is not datetime.date:
+            raise TypeError('expected a datetime, got %s' % type(value).__name__)
+        value = datetime.datetime(value.year, value.month, value.day)
+    return value.isoformat(' ')
+
+def _blob_converter(value):
+    if type(value) is not bytes:
+        if value is None:
+            return None
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            raise TypeError('expected bytes, got %s' % type(value).__name__)
+        value = bytes(value)
+    return value
+
+def _identity(value):
+    return value
+
+def make_converter(column_type):
+    '''The converter/validator function for a column type such as 'varchar(100)' or 'bigint'.'''
+    match = re.match(r'\s*(\w+)\s*(?:\(\s*(\d+)\s*\))?', column_type.lower())
+    if match is None:
+        raise ValueError('unsupported column type %r' % (column_type, ))
+    kind, size = match.group(1), match.group(2)
+    if kind in ('varchar', 'char', 'text'):
+        return _string_converter(int(size) if size else None)
+    if kind in _INT_RANGES:
+        return _int_converter(_INT_RANGES[kind])
+    if kind in ('real', 'float', 'double'):
+        return _float_converter
+    if kind in ('boolean', 'bool'):
+        return _bool_converter
+    if kind in ('datetime', 'timestamp'):
+        return _datetime_converter
+    if kind == 'blob':
+        return _blob_converter
+    return _identity
+
+
+class Field(object):
+
+    # 负责保存数据库表的字段名和字段类型
+    def __init__(self, name, column_type, primary_key=False, unique=False):
+        self.name = name
+        self.column_type = column_type
+        self.primary_key = primary_key # 建表时声明为主键
+        self.unique = unique # 建表时加unique约束
+        self.convert = make_converter(column_type) # 由字段类型决定的转换/校验函数
+
+    def column_definition(self):
+        '''The column as written in CREATE TABLE.'''
+        sql = '%s %s' % (self.name, self.column_type)
+        if self.primary_key:
+            sql += ' primary key'
+        elif self.unique:
+            sql += ' unique'
+        return sql
+
+    def __str__(self):
+        return '<%s:%s>' % (self.__class__.__name__, self.name) # self.__class__.__name__: self这个实例所属的类的名称
+
+
+class StringField(Field):
+
+    def __init__(self, name, column_type='varchar(100)', **kw):
+        super(StringField, self).__init__(name, column_type, **kw)
+
+
+class IntegerField(Field):
+
+    def __init__(self, name, **kw):
+        super(IntegerField, self).__init__(name, 'bigint', **kw)
+
+
+class FloatField(Field):
+
+    def __init__(self, name, **kw):
+        super(FloatField, self).__init__(name, 'real', **kw)
+
+
+class BooleanField(Field):
+
+    def __init__(self, name, **kw):
+        super(BooleanField, self).__init__(name, 'boolean', **kw)
+
+
+class DateTimeField(Field):
+
+    def __init__(self, name, **kw):
+        super(DateTimeField, self).__init__(name, 'datetime', **kw)
+
+
+class BlobField(Field):
+
+    def __init__(self, name, **kw):
+        super(BlobField, self).__init__(name, 'blob', **kw)
+
+
+def convert_rows(converters, rows):
+    '''Run the field converters over a batch of encoded rows, one column at a time.
+    converters is a list of (field name, convert function) in column order.
+    Returns the converted good rows and {index in rows: {field name: error}} for the bad ones.'''
+    if not rows or not converters:
+        return rows, {}
+    errors = {}
+    columns = []
+    for (k, convert), column in zip(converters, zip(*rows)):
+        try:
+            columns.append(list(map(convert, column)))
+        except (TypeError, ValueError, OverflowError):
+            # 这一列里有不合法的值：再逐个转换，记下是哪几行
+            values = []
+            for i, value in enumerate(column):
+                try:
+                    values.append(convert(value))
+                except (TypeError, ValueError, OverflowError) as e:
+                    errors.setdefault(i, {})[k] = str(e)
+                    values.append(None)
+            columns.append(values)
+    rows = list(zip(*columns))
+    if errors:
+        rows = [row for i, row in enumerate(rows) if i not in errors]
+    return rows, errors
+
+def _convert_one(model, converters, row):
+    rows, errors = convert_rows(converters, [row])
+    if errors:
+        raise ValueError('invalid %s: %s' % (model.__name__, ', '.join(
+            '%s (%s)' % item for item in sorted(errors[0].items()))))
+    return rows[0]
+
+# save_many跳过的行：第几批，在输入里是第几个，对象本身，{字段: 错误}
+RejectedRow = collections.namedtuple('RejectedRow', 'batch, index, model, errors')
+QueryPlan = collections.namedtuple('QueryPlan', 'sql, details, uses_index') # Persistent.explain()的结果
+LoadReport = collections.namedtuple('LoadReport', 'rows, rejected, seconds, rows_per_sec') # Persistent.load_stream()的结果
+
+
+# load_stream()的流水线：
+#   读线程把输入切成批（JSONL是原始的行，CSV是csv模块拆好的格子），交给工作进程；
+#   工作进程解析、按__mappings__的字段类型转换/校验（_load_batch）；
+#   调用load_stream的线程是唯一的writer，executemany，每commit_rows行左右提交一次。
+# 读线程和writer之间是有界队列：writer跟不上时读线程就停下来，在路上的最多queue_size批
+
+_LOAD_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+_load_converters = {} # 工作进程里：((字段, 字段类型), ...) -> 转换函数，每个进程只生成一次
+
+def _load_batch(fields, format, layout, records):
+    '''Parse and convert one batch of records; runs in a worker process.
+    fields is ((field name, column type), ...) in __insert__ order. For CSV, layout
+    is the position of each field in a record, None when the file doesn't have it.
+    Returns the good rows and {index in records: {field name: error}} for the bad ones.'''
+    converters = _load_converters.get(fields)
+    if converters is None:
+        converters = _load_converters[fields] = [(k, make_converter(t)) for k, t in fields]
+    errors = {}
+    if format == 'jsonl':
+        keys = [k for k, t in fields]
+        rows, positions = [], []
+        for i, line in enumerate(records):
+            if not line or line.isspace():
+                continue # 空行不算错
+            try:
+                record = json.loads(line)
+                if type(record) is not dict:
+                    raise ValueError('expected an object, got %s' % type(record).__name__)
+            except ValueError as e:
+                errors[i] = {'': str(e)}
+                continue
+            rows.append(tuple(map(record.get, keys)))
+            positions.append(i)
+    else:
+        # CSV里空的格子是None
+        rows = [tuple(record[j] or None if j is not None and j < len(record) else None for j in layout)
+                for record in records]
+        positions = None
+    rows, bad = convert_rows(converters, rows)
+    for i, e in bad.items():
+        errors[positions[i] if positions is not None else i] = e
+    return rows, errors
+
+
+def _compile_codecs(model, keys, primary_key, compact):
+    '''Generate the row encode/decode functions of a model class with compile().
+    For a compact (Record) class the __init__ is generated too.'''
+    # 直接生成代码，不用每次save时再循环__mappings__
+    others = [k for k in keys if k != primary_key]
+    update_keys = others + [primary_key] if primary_key is not None else []
+    if compact:
+        # 每个字段都是一个slot，读写就是普通的属性访问
+        get = 'row.%s'
+        source = [
+            'def __init__(_record, %s):' % ''.join('%s=None, ' % k for k in keys),
+        ] + ['    _record.%s = %s' % (k, k) for k in keys] + [
+            '    pass',
+            'def decode(values):',
+            '    obj = _new(_model)', # 不调用__init__
+            '    %s = values' % ('(%s)' % ''.join('obj.%s, ' % k for k in keys)),
+            '    return obj',
+        ]
+    else:
+        # dict.get取值：不经过__getattr__，缺少的字段就是None
+        get = '_get(row, %r)'
+        source = [
+            'def decode(values):',
+            '    obj = _new(_model)', # 不调用__init__
+            '    _update(obj, {%s})' % ', '.join('%r: values[%d]' % (k, i) for i, k in enumerate(keys)),
+            '    return obj',
+        ]
+    source += [
+        'def encode(row):',
+        '    return (%s)' % ''.join(get % k + ', ' for k in keys),
+        'def encode_update(row):',
+        '    return (%s)' % ''.join(get % k + ', ' for k in update_keys),
+    ]
+    namespace = {'_get': dict.get, '_update': dict.update, '_model': model,
+                 '_new': object.__new__ if compact else dict.__new__}
+    exec(compile('\n'.join(source), '<%s row codecs>' % model.__name__, 'exec'), namespace)
+    return namespace.get('__init__'), namespace['encode'], namespace['encode_update'], namespace['decode']
+
+
+class _Prepared(object):
+    '''A class attribute that ModelMetaclass derives from __mappings__ on first use.
+    The first read calls prepare(), which stores the real values on the class
+    itself, so later reads never come back here.'''
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        owner.prepare()
+        return getattr(owner, self.name)
+
+
+# 每个模型类都放一份，第一次用到其中任何一个时ModelMetaclass.prepare()把它们全部换成真正的值
+_PREPARED = {name: _Prepared(name) for name in (
+    '__primary_key__', '__indexes__', '__create_table__', '__create_indexes__',
+    '__insert__', '__select__', '__find__', '__update__', '__converters__', '__update_converters__',
+    '__encode__', '__encode_update__', '__decode__')}
+
+
+def _prepare_and_init(self, *args, **kw):
+    # Record子类在prepare()之前的__init__：生成真正的__init__再调用它
+    cls = type(self)
+    cls.prepare()
+    cls.__init__(self, *args, **kw)
+
+
+class ModelMetaclass(type):
+
+    def __new__(cls, name, bases, attrs):
+        if name in ('Model', 'Record'): # 如果是父类，直接按默认方法创建
+            return type.__new__(cls, name, bases, attrs)
+        debug = log.isEnabledFor(logging.DEBUG) # 关掉的时候连字符串都不用拼
+        if debug:
+            log.debug('Found model: %s', name)
+        mappings = dict()
+        # 在User类中查找定义的类的所有属性；
+        # 如果找到一个Field属性，就把它保存到__mappings__这个dict中；
+        # 之后要从类属性中删除该Field属性（实例属性会覆盖类的同名属性）
+        for k,v in attrs.items():
+            if isinstance(v, Field):
+                if debug:
+                    log.debug('Found mapping: %s ==> %s', k, v)
+                mappings[k] = v
+        for k in mappings.keys():
+            attrs.pop(k)
+        attrs['__mappings__'] = mappings # 保存属性和列的映射关系
+        attrs['__table__'] = attrs.get('__table__') or name # 假设表名和类名一致 （User）
+        attrs['__declared_indexes__'] = attrs.pop('indexes', ())
+        if any(issubclass(b, Record) for b in bases):
+            # Record的子类：字段放在__slots__里，不再有dict
+            attrs['__slots__'] = tuple(mappings)
+            attrs['__init__'] = _prepare_and_init
+        # 主键、SQL、转换函数和编解码函数等到第一次用到时再由prepare()生成，
+        # 定义了很多模型但只用到其中一部分时，其余的都不用付出代价
+        attrs.update(_PREPARED)
+        return type.__new__(cls, name, bases, attrs)
+
+    def prepare(model):
+        '''Derive the primary key, the SQL, the converters and the row codecs from
+        __mappings__ and store them on the class. Called on first use; calling it
+        again does nothing.'''
+        if not isinstance(model.__dict__.get('__decode__'), _Prepared):
+            return
+        name, mappings, table = model.__name__, model.__mappings__, model.__table__
+        compact = issubclass(model, Record)
+        # __mappings__和__table__在类创建之后就不变了，SQL只需要生成一次
+        # 主键：声明了primary_key=True的字段；没有的话用叫id的字段，再没有就用第一个字段
+        declared = [k for k, v in mappings.items() if v.primary_key]
+        if len(declared) > 1:
+            raise ValueError('%s: more than one primary key: %s' % (name, ', '.join(declared)))
+        if declared:
+            primary_key = declared[0]
+        else:
+            primary_key = 'id' if 'id' in mappings else next(iter(mappings), None)
+        columns = [v.name for v in mappings.values()]
+        # 索引：indexes = ['name', ('name', 'email'), ...]，每一项是一个字段或几个字段组成的索引
+        indexes = []
+        for index in model.__declared_indexes__:
+            index = (index, ) if isinstance(index, str) else tuple(index)
+            for k in index:
+                if k not in mappings:
+                    raise ValueError('%s.indexes: unknown field %r' % (name, k))
+            indexes.append(index)
+        attrs = {}
+        attrs['__indexes__'] = indexes
+        attrs['__create_table__'] = 'create table if not exists %s (%s)' % (
+            table, ', '.join(v.column_definition() for v in mappings.values()))
+        attrs['__create_indexes__'] = [
+            'create index if not exists idx_%s_%s on %s (%s)' % (
+                table, '_'.join(index), table, ','.join(mappings[k].name for k in index))
+            for index in indexes]
+        attrs['__primary_key__'] = primary_key
+        attrs['__insert__'] = 'insert into %s (%s) values (%s)' % (table, ','.join(columns), ','.join('?' * len(columns)))
+        attrs['__select__'] = 'select %s from %s' % (','.join(columns), table)
+        attrs['__find__'] = attrs['__update__'] = None
+        # 转换/校验函数，顺序和__insert__、__update__的参数一致
+        attrs['__converters__'] = [(k, v.convert) for k, v in mappings.items()]
+        attrs['__update_converters__'] = [(k, v.convert) for k, v in mappings.items() if k != primary_key]
+        if primary_key is not None:
+            attrs['__update_converters__'].append((primary_key, mappings[primary_key].convert))
+            key_column = mappings[primary_key].name
+            attrs['__find__'] = '%s where %s=?' % (attrs['__select__'], key_column)
+            others = [v.name for k, v in mappings.items() if k != primary_key]
+            if others:
+                attrs['__update__'] = 'update %s set %s where %s=?' % (
+                    table, ','.join('%s=?' % c for c in others), key_column)
+        init, encode, encode_update, decode = _compile_codecs(model, list(mappings), primary_key, compact)
+        if init is not None:
+            attrs['__init__'] = init
+        attrs['__encode__'] = staticmethod(encode) # model -> tuple of column values, in __insert__ order
+        attrs['__encode_update__'] = staticmethod(encode_update) # model -> values in __update__ order
+        for k, v in attrs.items():
+            type.__setattr__(model, k, v)
+        # __decode__放在最后：其它线程看到它就说明别的都已经设好了
+        type.__setattr__(model, '__decode__', staticmethod(decode)) # tuple of column values -> model
+
+
+class Persistent(object):
+    '''The database methods shared by Model and Record.'''
+
+    __slots__ = ()
+
+    def save(self):
+        # for k,v in self.__mappings__.items(): # k: User class field name; v: User class field object
+        #     args.append(getattr(self, k, None)) # 若不存在k这个attribute，返回None，即实例中定义的attribute若在mapping中找不到，则返回None
+        # 现在由ModelMetaclass生成的__encode__完成
+        _invalidate(self.__table__)
+        execute(self.__insert__, _convert_one(type(self), self.__converters__, self.__encode__(self)))
+
+    def update_row(self):
+        '''Write every field back to the row with the same primary key.
+        Returns the number of rows changed.'''
+        if self.__update__ is None:
+            raise AttributeError('%s has no fields to update' % self.__table__)
+        _invalidate(self.__table__)
+        return execute(self.__update__, _convert_one(type(self), self.__update_converters__, self.__encode_update__(self)))
+
+    @classmethod
+    def find(cls, pk):
+        '''Load the model whose primary key is pk, or return None.'''
+        if _cache is None:
+            row = get_connection().execute(cls.__find__, (pk, )).fetchone()
+            return None if row is None else cls.__decode__(row)
+        rows = _cache.get(cls.__find__, (pk, ))
+        if rows is None:
+            rows = get_connection().execute(cls.__find__, (pk, )).fetchmany(1)
+            _cache.put(cls.__table__, cls.__find__, (pk, ), rows)
+        return cls.__decode__(rows[0]) if rows else None
+
+    @classmethod
+    def create_table(cls):
+        '''Create the table and its declared indexes, if they do not exist yet.'''
+        with transaction() as conn:
+            for sql in [cls.__create_table__] + cls.__create_indexes__:
+                log.debug('SQL: %s', sql)
+                conn.execute(sql)
+
+    @classmethod
+    def explain(cls, query, args=()):
+        '''Run EXPLAIN QUERY PLAN for a Query or an SQL string.
+        Returns a QueryPlan; uses_index is False when some table is scanned
+        without an index.'''
+        if isinstance(query, Query):
+            query, args = query.sql, query.args
+        rows = get_connection().execute('explain query plan ' + query, tuple(args)).fetchall()
+        details = [row[-1] for row in rows]
+        uses_index = not any(d.startswith('SCAN') and ' USING ' not in d for d in details)
+        return QueryPlan(query, details, uses_index)
+
+    @classmethod
+    def select(cls, where=None, args=(), order_by=None, limit=None, batch_size=1000):
+        '''A lazy query over the table, see Query.'''
+        return Query(cls, where, args, order_by, limit, batch_size)
+
+    @classmethod
+    def save_many(cls, models, batch_size=1000, rejected=None):
+        '''Insert many models with executemany, batch_size rows at a time, all in one transaction.
+        Each batch is converted and validated column by column first. Invalid rows are
+        skipped, logged per batch and appended to the list 'rejected' as RejectedRow.
+        Returns the number of rows inserted.'''
+        count = 0
+        with transaction() as conn:
+            _invalidate(cls.__table__)
+            for rows in cls._insert_batches(models, batch_size, rejected):
+                conn.executemany(cls.__insert__, rows)
+                count += len(rows)
+        return count
+
+    @classmethod
+    def _insert_batches(cls, models, batch_size, rejected):
+        '''Encode and convert the models batch by batch, yield the rows to insert.'''
+        models = iter(models)
+        start = 0
+        for batch_number in itertools.count():
+            batch = list(itertools.islice(models, batch_size))
+            if not batch:
+                break
+            rows, errors = convert_rows(cls.__converters__, list(map(cls.__encode__, batch)))
+            if errors:
+                log.warning('%s: %d of %d rows rejected in batch %d', cls.__table__, len(errors), len(batch), batch_number)
+                if rejected is not None:
+                    rejected.extend(RejectedRow(batch_number, start + i, batch[i], errors[i]) for i in sorted(errors))
+            log.debug('SQL: %s ROWS: %d', cls.__insert__, len(rows))
+            yield rows
+            start += len(batch)
+
+    @classmethod
+    def load_stream(cls, source, format=None, workers=None, batch_size=5000, queue_size=8,
+                    commit_rows=100000, rejected=None):
+        '''Bulk load a CSV or JSONL file into the table and return a LoadReport.
+        source is a path or an iterable of lines; format ('csv' or 'jsonl') is taken
+        from the file extension when not given. CSV columns are matched to fields by
+        field or column name through the header line; empty cells are None.
+        Batches of batch_size records are parsed and validated by 'workers' processes
+        (default: one per CPU; 0 or 1 does it in a thread), at most queue_size batches
+        in flight, while this thread inserts them, committing every commit_rows rows.
+        An error rolls back the rows since the last commit. Invalid records are skipped
+        and appended to 'rejected' as RejectedRow, whose model is the input record:
+        the JSONL line, or the CSV cells as a dict.'''
+        import csv
+        import queue
+        import threading
+        start_time = time.perf_counter()
+        if isinstance(source, (str, os.PathLike)):
+            format = format or _LOAD_FORMATS.get(os.path.splitext(source)[1].lower())
+        if format not in ('csv', 'jsonl'):
+            raise ValueError('unknown format %r, expected csv or jsonl' % (format, ))
+        mappings = cls.__mappings__
+        fields = tuple((k, v.column_type) for k, v in mappings.items())
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        with contextlib.ExitStack() as stack:
+            lines = source
+            if isinstance(source, (str, os.PathLike)):
+                lines = stack.enter_context(open(source, newline='', encoding='utf-8'))
+            records, header, layout = iter(lines), None, None
+            if format == 'csv':
+                records = csv.reader(records)
+                header = next(records, None) or []
+                layout = [header.index(k) if k in header else header.index(v.name) if v.name in header else None
+                          for k, v in mappings.items()]
+                if header and all(j is None for j in layout):
+                    raise ValueError('%s: none of the fields is in the CSV header %r' % (cls.__name__, header))
+            pool = None
+            if workers > 1:
+                import multiprocessing
+                # 在读线程启动之前fork
+                pool = stack.enter_context(multiprocessing.get_context('fork').Pool(workers))
+            pending = queue.Queue(queue_size)
+            stop = threading.Event()
+
+            def put(item):
+                # 队列满了就等writer，writer出错时不再等
+                while not stop.is_set():
+                    try:
+                        pending.put(item, timeout=0.1)
+                        return True
+                    except queue.Full:
+                        pass
+                return False
+
+            def read():
+                try:
+                    for batch in iter(lambda: list(itertools.islice(records, batch_size)), []):
+                        args = (fields, format, layout, batch)
+                        if not put((batch, pool.apply_async(_load_batch, args) if pool else _load_batch(*args))):
+                            return
+                    put(None)
+                except BaseException as e:
+                    put(e)
+
+            rejected_count = 0
+
+            def batches():
+                nonlocal rejected_count
+                start = 0
+                for batch_number in itertools.count():
+                    item = pending.get()
+                    if item is None:
+                        return
+                    if isinstance(item, BaseException):
+                        raise item
+                    batch, result = item
+                    rows, errors = result.get() if pool else result
+                    if errors:
+                        rejected_count += len(errors)
+                        log.warning('%s: %d of %d rows rejected in batch %d', cls.__table__, len(errors), len(batch), batch_number)
+                        if rejected is not None:
+                            rejected.extend(RejectedRow(batch_number, start + i, batch[i] if header is None else dict(zip(header, batch[i])), errors[i])
+                                            for i in sorted(errors))
+                    yield rows
+                    start += len(batch)
+
+            reader = threading.Thread(target=read, name='load_stream reader', daemon=True)
+            reader.start()
+            count = 0
+            try:
+                rows_iter, done = batches(), False
+                while not done:
+                    # 一个事务写commit_rows行左右
+                    written = 0
+                    with transaction() as conn:
+                        _invalidate(cls.__table__)
+                        for rows in rows_iter:
+                            conn.executemany(cls.__insert__, rows)
+                            written += len(rows)
+                            if written >= commit_rows:
+                                break
+                        else:
+                            done = True
+                    count += written
+            finally:
+                stop.set()
+                reader.join()
+        seconds = time.perf_counter() - start_time
+        report = LoadReport(count, rejected_count, seconds, count / seconds if seconds else 0.0)
+        log.info('%s: loaded %d rows, %d rejected, in %.2f s (%.0f rows/sec)', cls.__table__, *report)
+        return report
+
+    # 异步版本：通过连接池执行，见create_pool()
+
+    async def asave(self):
+        row = _convert_one(type(self), self.__converters__, self.__encode__(self))
+        async with get_pool().transaction() as conn:
+            await conn.execute(self.__insert__, row)
+        _invalidate(self.__table__)
+
+    async def aupdate_row(self):
+        if self.__update__ is None:
+            raise AttributeError('%s has no fields to update' % self.__table__)
+        row = _convert_one(type(self), self.__update_converters__, self.__encode_update__(self))
+        async with get_pool().transaction() as conn:
+            count = await conn.execute(self.__update__, row)
+        _invalidate(self.__table__)
+        return count
+
+    @classmethod
+    async def afind(cls, pk):
+        async with get_pool().connection() as conn:
+            async with contextlib.aclosing(conn.fetch(cls.__find__, (pk, ), 1)) as batches:
+                async for rows in batches:
+                    return cls.__decode__(rows[0])
+        return None
+
+    @classmethod
+    async def asave_many(cls, models, batch_size=1000, rejected=None):
+        count = 0
+        async with get_pool().transaction() as conn:
+            for rows in cls._insert_batches(models, batch_size, rejected):
+                await conn.executemany(cls.__insert__, rows)
+                count += len(rows)
+        _invalidate(cls.__table__)
+        return count
+
+
+class Query(object):
+    '''A lazy SELECT. Nothing runs until it is iterated; rows are then fetched
+    batch_size at a time with fetchmany and decoded one by one.
+
+    where is either an SQL condition with ? placeholders (values in args),
+    or a dict of field name -> value that must all be equal.'''
+
+    def __init__(self, model, where=None, args=(), order_by=None, limit=None, batch_size=1000):
+        sql = [model.__select__]
+        args = list(args)
+        if isinstance(where, dict):
+            conditions = []
+            for k, v in where.items():
+                conditions.append('%s=?' % model.__mappings__[k].name)
+                args.append(v)
+            where = ' and '.join(conditions)
+        if where:
+            sql.append('where %s' % where)
+        if order_by:
+            sql.append('order by %s' % order_by)
+        if limit is not None:
+            sql.append('limit ?')
+            args.append(limit)
+        self.model = model
+        self.sql = ' '.join(sql)
+        self.args = args
+        self.batch_size = batch_size
+
+    def iter_tuples(self):
+        '''The raw rows, without building any model objects.
+        With the query cache on, a result that was read to the end is kept
+        (unless it is bigger than the whole cache) and served from memory next time.'''
+        cache, key = _cache, None
+        if cache is not None:
+            key = _cache_key(self.args)
+            if key is not None:
+                rows = cache.get(self.sql, key)
+                if rows is not None:
+                    yield from rows
+                    return
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('SQL: %s ARGS: %s', self.sql, self.args)
+        cursor = get_connection().execute(self.sql, self.args)
+        result, size = [] if key is not None else None, 0
+        try:
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                if result is not None:
+                    # 边读边攒，超过缓存大小就不再攒了，大结果集照样是流式读取
+                    size += rows_size(rows)
+                    if size <= cache.max_bytes:
+                        result.extend(rows)
+                    else:
+                        result = None
+                yield from rows
+        finally:
+            cursor.close()
+        if result is not None:
+            cache.put(self.model.__table__, self.sql, key, result)
+
+    def __iter__(self):
+        return map(self.model.__decode__, self.iter_tuples())
+
+    # async for model in query / async for row in query.aiter_tuples(): 通过连接池读
+
+    async def aiter_tuples(self):
+        async with get_pool().connection() as conn:
+            # closed explicitly, so the cursor is gone before the connection goes back to the pool
+            async with contextlib.aclosing(conn.fetch(self.sql, self.args, self.batch_size)) as batches:
+                async for rows in batches:
+                    for row in rows:
+                        yield row
+
+    async def __aiter__(self):
+        decode = self.model.__decode__
+        async for row in self.aiter_tuples():
+            yield decode(row)
+
+
+class Model(dict, Persistent, metaclass=ModelMetaclass):
+    # 继承自python的built-in: dict
+
+    def __init__(self, **kw):
+        super(Model, self).__init__(**kw)
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError('Model object has no attribute %s' % key)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+        # 被Session跟踪的对象，记下哪些字段改过
+        changed = self.__dict__.get('_changed')
+        if changed is not None:
+            changed.add(key)
+
+    @classmethod
+    def record_class(cls):
+        '''The compact Record class with the same table and fields as this model.'''
+        record = cls.__dict__.get('__record_class__')
+        if record is None:
+            attrs = dict(cls.__mappings__, __table__=cls.__table__, __module__=cls.__module__,
+                         indexes=cls.__indexes__)
+            record = ModelMetaclass(cls.__name__ + 'Record', (Record, ), attrs)
+            type.__setattr__(cls, '__record_class__', record)
+        return record
+
+
+class Record(Persistent, metaclass=ModelMetaclass):
+    '''A compact model: ModelMetaclass turns the fields into __slots__, so there is no
+    per-row hash table and attribute access is native. Every field exists and
+    defaults to None. Dict-style access still works for the declared fields.'''
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__mappings__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__mappings__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        if key not in self.__mappings__:
+            return default
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__mappings__
+
+    def __iter__(self):
+        return iter(self.__mappings__)
+
+    def __len__(self):
+        return len(self.__mappings__)
+
+    def keys(self):
+        return self.__mappings__.keys()
+
+    def values(self):
+        return [getattr(self, k) for k in self.__mappings__]
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self.__mappings__]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        if not isinstance(other, dict):
+            return NotImplemented
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join('%s=%r' % item for item in self.items()))
+
+
+class Session(object):
+    '''Unit of work: an identity map keyed by (model class, primary key), plus the
+    new and changed models, written by flush() in one transaction.
+
+    Changes to a Model are recorded by Model.__setattr__ (model.name = ...; not
+    model['name'] = ...). A Record has no room for that, so its values are compared
+    with the ones it was loaded with.'''
+
+    _update_sql = {} # (model class, changed columns) -> UPDATE statement
+
+    def __init__(self):
+        self.identity = {} # (model class, primary key) -> model
+        self.new = [] # models to insert on flush
+        self._loaded = {} # id(record) -> values at load time
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def _track(self, model):
+        if isinstance(model, Record):
+            self._loaded[id(model)] = model.__encode__(model)
+        else:
+            object.__setattr__(model, '_changed', set())
+
+    def add(self, model):
+        '''Insert 'model' on the next flush.'''
+        pk = model.get(model.__primary_key__)
+        if pk is not None:
+            key = (type(model), pk)
+            if self.identity.get(key, model) is not model:
+                raise ValueError('another %s with primary key %r is already in the session' % (type(model).__name__, pk))
+            self.identity[key] = model
+        self.new.append(model)
+
+    def get(self, cls, pk):
+        '''The model with primary key pk: the same object every time within this session.'''
+        model = self.identity.get((cls, pk))
+        if model is None:
+            model = cls.find(pk)
+            if model is not None:
+                self._track(model)
+                self.identity[(cls, pk)] = model
+        return model
+
+    def _changes(self, model):
+        '''The fields of 'model' changed since it was loaded, in column order.'''
+        if isinstance(model, Record):
+            loaded = self._loaded.get(id(model))
+            if loaded is None:
+                return []
+            return [k for k, old, new in zip(model.__mappings__, loaded, model.__encode__(model)) if old != new]
+        changed = model.__dict__.get('_changed')
+        if not changed:
+            return []
+        return [k for k in model.__mappings__ if k in changed]
+
+    def flush(self):
+        '''Write everything: the new models with one executemany per class,
+        the changed ones with one UPDATE per class and set of changed columns.'''
+        inserts = {}
+        for model in self.new:
+            inserts.setdefault(type(model), []).append(model)
+        updates = {}
+        new_ids = set(map(id, self.new))
+        for (cls, pk), model in self.identity.items():
+            if id(model) in new_ids:
+                continue
+            keys = self._changes(model)
+            if not keys:
+                continue
+            if cls.__primary_key__ in keys:
+                raise ValueError('the primary key of a %s in the session was changed' % cls.__name__)
+            values = [model.get(k) for k in keys]
+            values.append(pk)
+            converters = [(k, cls.__mappings__[k].convert) for k in keys + [cls.__primary_key__]]
+            updates.setdefault((cls, tuple(keys)), []).append(_convert_one(cls, converters, values))
+
+        if inserts or updates:
+            with transaction() as conn:
+                for table in {cls.__table__ for cls in inserts} | {cls.__table__ for cls, keys in updates}:
+                    _invalidate(table)
+                for cls, models in inserts.items():
+                    rows, errors = convert_rows(cls.__converters__, list(map(cls.__encode__, models)))
+                    if errors:
+                        # 一个unit of work要么全写进去，要么都不写
+                        _convert_one(cls, cls.__converters__, cls.__encode__(models[min(errors)]))
+                    log.debug('SQL: %s ROWS: %d', cls.__insert__, len(rows))
+                    conn.executemany(cls.__insert__, rows)
+                for (cls, keys), rows in updates.items():
+                    sql = self._update_sql.get((cls, keys))
+                    if sql is None:
+                        sql = self._update_sql[(cls, keys)] = 'update %s set %s where %s=?' % (
+                            cls.__table__, ','.join('%s=?' % cls.__mappings__[k].name for k in keys),
+                            cls.__mappings__[cls.__primary_key__].name)
+                    log.debug('SQL: %s ROWS: %d', sql, len(rows))
+                    conn.executemany(sql, rows)
+
+        # everything is written, start over from the current state
+        for model in self.identity.values():
+            self._track(model)
+        self.new = []
+
+# 异步模式：连接池 + 可替换的driver（asyncio导入很慢，只有用到异步模式才导入）
+# driver只需要一个 async connect()，返回的连接要有这些协程方法：
+#   execute(sql, args) -> rowcount, executemany(sql, rows) -> rowcount,
+#   begin(), commit(), rollback(), close(),
+#   以及异步生成器 fetch(sql, args, batch_size)，每次产生一批行
+
+class SQLiteConnection(object):
+    '''A sqlite3 connection whose calls run in its own worker thread.'''
+
+    def __init__(self, database, **kw):
+        # one thread per connection: sqlite3 connections must not be used concurrently
+        import concurrent.futures
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._database = database
+        self._kw = kw
+        self._conn = None
+
+    async def _run(self, fn, *args):
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def open(self):
+        self._conn = await self._run(lambda: sqlite3.connect(
+            self._database, isolation_level=None, check_same_thread=False, **self._kw))
+        return self
+
+    async def execute(self, sql, args=()):
+        log.debug('SQL: %s ARGS: %s', sql, args)
+        return (await self._run(self._conn.execute, sql, args)).rowcount
+
+    async def executemany(self, sql, rows):
+        return (await self._run(self._conn.executemany, sql, rows)).rowcount
+
+    async def begin(self):
+        # immediate: take the write lock up front, so that two transactions can't deadlock
+        await self._run(self._conn.execute, 'begin immediate')
+
+    async def commit(self):
+        await self._run(self._conn.execute, 'commit')
+
+    async def rollback(self):
+        await self._run(self._conn.execute, 'rollback')
+
+    async def fetch(self, sql, args, batch_size):
+        log.debug('SQL: %s ARGS: %s', sql, args)
+        cursor = await self._run(self._conn.execute, sql, args)
+        try:
+            while True:
+                rows = await self._run(cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            await self._run(cursor.close)
+
+    async def close(self):
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+
+class SQLiteDriver(object):
+    '''The default driver: stdlib sqlite3, each connection in a worker thread.'''
+
+    def __init__(self, database, **kw):
+        self.database = database
+        self.kw = kw
+
+    async def connect(self):
+        return await SQLiteConnection(self.database, **self.kw).open()
+
+
+class Pool(object):
+    '''At most 'size' connections; callers wait for a free one. A connection
+    that was in use when an error happened is closed instead of reused.'''
+
+    def __init__(self, driver, size=5):
+        self.driver = driver
+        self.size = size
+        self._idle = []
+        self._busy = set() # 借出去的连接，close()时也要关掉
+        self._created = 0
+        import asyncio
+        self._available = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._available:
+            while not self._idle and self._created >= self.size:
+                await self._available.wait()
+            if self._idle:
+                conn = self._idle.pop()
+                self._busy.add(conn)
+                return conn
+            self._created += 1
+        try:
+            conn = await self.driver.connect()
+        except BaseException:
+            async with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+        self._busy.add(conn)
+        return conn
+
+    async def release(self, conn, broken=False):
+        '''Give conn back; a broken one is closed and a new one made when needed.'''
+        async with self._available:
+            if conn not in self._busy:
+                return # close()已经把它关掉了
+            self._busy.remove(conn)
+            if not broken:
+                self._idle.append(conn)
+            else:
+                self._created -= 1
+            self._available.notify()
+        if broken:
+            await self._close(conn)
+
+    async def _close(self, conn):
+        try:
+            await conn.close()
+        except Exception:
+            log.debug('closing a connection failed', exc_info=True)
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        conn = await self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            # 出错以后连接处在什么状态不知道（事务、游标、线程），不再用它
+            await self.release(conn, broken=True)
+            raise
+        else:
+            await self.release(conn)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        async with self.connection() as conn:
+            await conn.begin()
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+    async def close(self):
+        '''Close every connection, including the ones still in use.'''
+        async with self._available:
+            conns = self._idle + list(self._busy)
+            self._idle, self._busy = [], set()
+            self._created -= len(conns)
+            self._available.notify_all()
+        for conn in conns:
+            await self._close(conn)
+
+
+_pool = None
+
+async def create_pool(database=None, driver=None, size=5, **kw):
+    '''Create the pool all async methods use: a SQLiteDriver on 'database' unless a driver is given.'''
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+    _pool = Pool(driver or SQLiteDriver(database, **kw), size)
+    return _pool
+
+def get_pool():
+    if _pool is None:
+        raise RuntimeError('no connection pool, call create_pool() first')
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+# -------- BENCHMARKS ----------
+# python -m five_hundred_lines.metaclass_learn bench [-n N] [--repeat R] [-o report.json] [scenario ...]
+# 每个bench_*返回run(n)；define/prepare的n是定义多少个模型类，其余的是访问次数
+
+BENCH_FIELDS = 8 # 每个测试模型的字段数
+
+def _bench_models(n, base=None):
+    '''Define n fresh model classes with BENCH_FIELDS fields each.'''
+    base = base or Model
+    fields = [StringField('f%d' % i) for i in range(BENCH_FIELDS - 1)]
+    models = []
+    for i in range(n):
+        attrs = dict(('f%d' % j, field) for j, field in enumerate(fields))
+        attrs['id'] = IntegerField('id')
+        attrs['indexes'] = ['f0']
+        models.append(ModelMetaclass('Bench%d' % i, (base, ), attrs))
+    return models
+
+def bench_define_models():
+    # 只定义类：SQL和编解码函数都还没生成
+    def run(n):
+        _bench_models(n)
+    return run
+
+def bench_prepare_models():
+    # 定义之后马上用到：和以前在__new__里全部生成的代价一样
+    def run(n):
+        for model in _bench_models(n):
+            model.prepare()
+    return run
+
+def bench_model_getattr():
+    class BenchUser(Model):
+        id = IntegerField('id')
+        name = StringField('name')
+    u = BenchUser(id=1, name='Michael')
+    def run(n):
+        for i in range(n):
+            u.name
+    return run
+
+def bench_record_getattr():
+    BenchRecord = _bench_models(1, Record)[0]
+    r = BenchRecord(id=1, f0='Michael')
+    def run(n):
+        for i in range(n):
+            r.f0
+    return run
+
+def bench_decode():
+    BenchUser = _bench_models(1)[0]
+    BenchUser.prepare()
+    row = (1, ) + ('x', ) * (BENCH_FIELDS - 1)
+    def run(n):
+        decode = BenchUser.__decode__
+        for i in range(n):
+            decode(row)
+    return run
+
+def bench_load_stream(parallel=False):
+    # n行JSONL写进内存里的sqlite；parallel：两个工作进程解析、校验
+    class BenchReading(Model):
+        id = IntegerField('id')
+        sensor = StringField('sensor')
+        value = FloatField('value')
+        taken = DateTimeField('taken')
+    connect(':memory:')
+    BenchReading.create_table()
+    line = '{"id": 1, "sensor": "s1", "value": 2.5, "taken": "2020-09-17T10:00:00"}\n'
+    def run(n):
+        BenchReading.load_stream(itertools.repeat(line, n), format='jsonl', workers=2 if parallel else 0)
+    return run
+
+def bench_base_getattr():
+    # metaclass_learn2.Base：每次__getattr__都要先看一下logging的级别
+    from . import metaclass_learn2
+    class BenchUser(metaclass_learn2.Base):
+        user_id = metaclass_learn2.IntegerField(0)
+    u = BenchUser(user_id=1)
+    def run(n):
+        for i in range(n):
+            u.user_id
+    return run
+
+def run_benchmarks(n=100000, models=300, repeat=5, names=None):
+    '''Run the bench_* scenarios and time importing the modules; return a JSON-able dict.'''
+    scenarios = sorted((name[len('bench_'):], func) for name, func in globals().items()
+                       if name.startswith('bench_') and name != 'bench_main')
+    results = []
+    level = logging.root.level
+    logging.root.setLevel(logging.WARNING) # 和线上一样：debug/info都关掉
+    try:
+        for name, scenario in scenarios:
+            if names and name not in names:
+                continue
+            count = models if name.endswith('_models') else n
+            run = scenario()
+            timings = []
+            for i in range(repeat):
+                start = time.perf_counter()
+                run(count)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            results.append({'scenario': name, 'n': count, 'best_sec': best,
+                            'usec_per_op': best / count * 1e6})
+    finally:
+        logging.root.setLevel(level)
+    from .benchmark import measure_import
+    imports = {module: measure_import(module, repeat) for module in (__package__ + '.metaclass_learn', __package__ + '.metaclass_learn2')}
+    return {
+        'python': sys.version.split()[0],
+        'repeat': repeat,
+        'import_sec': imports,
+        'results': results,
+    }
+
+def bench_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark model definition, first use, attribute access and import time.')
+    parser.add_argument('-n', type=int, default=100000, help='attribute accesses per run')
+    parser.add_argument('--models', type=int, default=300, help='model classes defined per run')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per scenario, the best one is reported')
+    parser.add_argument('-o', '--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('scenarios', nargs='*', help='only run these scenarios')
+    args = parser.parse_args(argv)
+    report = json.dumps(run_benchmarks(args.n, args.models, args.repeat, args.scenarios), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+# 调用示例:
+
+#     class User(Model):
+
+#         id = IntegerField('id')
+#         name = StringField('username')
+#         email = StringField('email')
+#         password = StringField('password')
+
+#     # User类的__init__继承的是dict的__init__
+
+#     u = User(id=12345, name='Michael', email='test@orm.org', password='my_pwd')
+
+#     connect('test.db')
+#     u.save()
+#     User.save_many(User(id=i, name='user%d' % i) for i in range(10000))
+
+
+
+# -------- TEST CODE ----------
+
+def _user_model():
+    '''A new User model class; each test makes its own.'''
+    class User(Model):
+        id = IntegerField('id', primary_key=True)
+        name = StringField('name')
+        email = StringField('email')
+        password = StringField('password')
+        indexes = ['name']
+    return User
+
+
+def test_save_many():
+    User = _user_model()
+    conn = connect(':memory:')
+    User.create_table()
+    User(id=12345, name='Michael', email='test@orm.org', password='my-pwd').save()
+    assert User.save_many((User(id=i, name='user%d' % i) for i in range(2500)), batch_size=1000) == 2500
+    assert conn.execute('select count(*) from User').fetchone() == (2501, )
+    assert conn.execute('select * from User where id=12345').fetchone() == (12345, 'Michael', 'test@orm.org', 'my-pwd')
+    assert conn.execute('select email from User where id=7').fetchone() == (None, )
+    # an error while loading rolls the whole call back
+    def failing_source():
+        yield User(id=1)
+        raise RuntimeError('source failed')
+    try:
+        User.save_many(failing_source())
+    except RuntimeError:
+        pass
+    assert conn.execute('select count(*) from User').fetchone() == (2501, )
+
+
+def test_codecs():
+    User = _user_model()
+    connect(':memory:')
+    User.create_table()
+    User(id=12345, name='Michael', email='test@orm.org', password='my-pwd').save()
+    assert User.__update__ == 'update User set name=?,email=?,password=? where id=?'
+    assert User.__encode__(User(id=1, email='a@b')) == (1, None, 'a@b', None)
+    u = User.find(12345)
+    assert type(u) is User and u == dict(id=12345, name='Michael', email='test@orm.org', password='my-pwd')
+    u.email = 'michael@orm.org'
+    assert u.update_row() == 1
+    assert User.find(12345).email == 'michael@orm.org'
+    assert User.find(-1) is None
+
+
+def test_schema():
+    User = _user_model()
+    connect(':memory:')
+    assert User.__create_table__ == ('create table if not exists User (id bigint primary key, '
+                                     'name varchar(100), email varchar(100), password varchar(100))')
+    assert User.__create_indexes__ == ['create index if not exists idx_User_name on User (name)']
+    User.create_table()
+    User.create_table() # 已经存在时什么也不做
+    User.save_many(User(id=i, name='user%d' % i) for i in range(100))
+
+    plan = User.explain(User.select(where={'name': 'user7'}))
+    assert plan.uses_index and 'idx_User_name' in plan.details[0]
+    assert User.explain(User.__find__, (7, )).uses_index
+    assert not User.explain(User.select(where={'email': 'a@b'})).uses_index
+
+    class Account(Model):
+        login = StringField('login', unique=True)
+        owner = IntegerField('owner')
+        created = DateTimeField('created')
+        indexes = [('owner', 'created')]
+
+    Account.create_table()
+    assert Account.__primary_key__ == 'login'
+    assert User.explain('select * from Account where owner=? and created>?', (1, '2020')).uses_index
+    Account(login='root', owner=1).save()
+    try:
+        Account(login='root', owner=2).save()
+        raise AssertionError('unique constraint not enforced')
+    except sqlite3.IntegrityError:
+        pass
+
+
+def test_record():
+    User = _user_model()
+    connect(':memory:')
+    User.create_table()
+    User(id=12345, name='Michael', email='michael@orm.org', password='my-pwd').save()
+    UserRecord = User.record_class()
+    assert UserRecord is User.record_class() and UserRecord.__table__ == 'User'
+    r = UserRecord.find(12345)
+    assert not hasattr(r, '__dict__')
+    assert r.email == r['email'] == 'michael@orm.org'
+    assert r == User.find(12345)
+    r.name = 'Mike'
+    r['password'] = 'secret'
+    assert r.update_row() == 1
+    assert User.find(12345).name == 'Mike'
+    assert UserRecord.save_many(UserRecord(id=i) for i in range(10000, 10010)) == 10
+    assert UserRecord(id=1).to_dict() == dict(id=1, name=None, email=None, password=None)
+    try:
+        UserRecord(age=3)
+    except TypeError:
+        pass
+    else:
+        assert False, 'expected TypeError'
+
+
+def test_query():
+    User = _user_model()
+    UserRecord = User.record_class()
+    connect(':memory:')
+    User.create_table()
+    User.save_many(User(id=i, name='user%d' % i) for i in range(20))
+    User(id=12345, name='Mike').save()
+    query = User.select(where='id < ?', args=(5, ), order_by='id desc', batch_size=2)
+    assert [u.id for u in query] == [4, 3, 2, 1, 0]
+    assert type(next(iter(query))) is User
+    assert next(query.iter_tuples()) == (4, 'user4', None, None)
+    assert [r.name for r in UserRecord.select(where={'id': 12345})] == ['Mike']
+    assert sum(1 for row in User.select(limit=10).iter_tuples()) == 10
+
+
+def test_session():
+    User = _user_model()
+    UserRecord = User.record_class()
+    connect(':memory:')
+    User.create_table()
+    User.save_many(User(id=i, name='user%d' % i) for i in range(10))
+    User(id=12345, name='Mike', password='secret').save()
+    with Session() as session:
+        a = session.get(User, 12345)
+        assert session.get(User, 12345) is a
+        a.name = 'Michael'
+        a.name = 'Michael L.'
+        b = session.get(User, 7)
+        b.email = 'user7@orm.org'
+        r = session.get(UserRecord, 8)
+        r.email = 'user8@orm.org'
+        session.add(User(id=20000, name='new'))
+    assert User.find(12345).name == 'Michael L.' and User.find(12345).password == 'secret'
+    assert User.find(7).email == 'user7@orm.org' and User.find(7).name == 'user7'
+    assert User.find(8).email == 'user8@orm.org'
+    assert User.find(20000).name == 'new'
+    assert session._changes(a) == [] and session.new == []
+    assert Session._update_sql[(User, ('name', ))] == 'update User set name=? where id=?'
+
+
+def test_query_cache():
+    User = _user_model()
+    connect(':memory:')
+    User.create_table()
+    User.save_many(User(id=i, name='user%d' % i) for i in range(10))
+    User(id=12345, name='Michael L.').save()
+    cache = enable_cache(max_entries=3)
+    try:
+        assert User.find(7) == User.find(7) and User.find(7) is not User.find(7)
+        assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 1
+        query = User.select(where='id < ?', args=(3, ))
+        assert [u.id for u in query] == [0, 1, 2] and [u.id for u in query] == [0, 1, 2]
+        assert cache.hits == 4 and len(cache) == 2
+        assert User.find(-1) is None and User.find(-1) is None # 查不到也缓存
+        assert User.find(12345).name == 'Michael L.' # 第4个结果：挤掉最久没用的User.find(7)
+        assert cache.evictions == 1 and len(cache) == 3
+        u = User.find(12345)
+        u.name = 'Michael'
+        u.update_row() # 写User表，清掉User的所有缓存
+        assert len(cache) == 0 and cache.invalidations == 3
+        assert User.find(12345).name == 'Michael'
+        try:
+            with transaction():
+                User(id=30000, name='tmp').save()
+                assert User.find(30000).name == 'tmp'
+                raise RuntimeError('roll back')
+        except RuntimeError:
+            pass
+        # 事务里缓存的结果在事务结束时清掉了，不会留下回滚掉的行
+        assert len(cache) == 0 and User.find(30000) is None
+        next(iter(User.select(where={'name': 'user1'}))) # 没读完的结果不缓存
+        assert len(cache) == 1 and cache.bytes > 0
+    finally:
+        disable_cache()
+
+
+def test_converters():
+    conn = connect(':memory:')
+
+    class Measurement(Model):
+        id = IntegerField('id')
+        sensor = StringField('sensor', 'varchar(8)')
+        value = FloatField('value')
+        ok = BooleanField('ok')
+        taken = DateTimeField('taken')
+        raw = BlobField('raw')
+
+    conn.execute('create table Measurement (id bigint, sensor varchar(8), value real, ok boolean, taken datetime, raw blob)')
+    rejected = []
+    rows = [
+        Measurement(id='1', sensor='t1', value=1, ok=1, taken='2020-09-17T10:00:00', raw=bytearray(b'x')),
+        Measurement(id=2, sensor='too long a name', value='2.5'),
+        Measurement(id=3.5, sensor='t3', ok='maybe'),
+        Measurement(id=4, sensor='t4', value='4', taken=datetime.date(2020, 9, 17)),
+    ]
+    assert Measurement.save_many(rows, batch_size=2, rejected=rejected) == 2
+    assert [(r.batch, r.index, sorted(r.errors)) for r in rejected] == [(0, 1, ['sensor']), (1, 2, ['id', 'ok'])]
+    assert conn.execute('select * from Measurement order by id').fetchall() == [
+        (1, 't1', 1.0, 1, '2020-09-17 10:00:00', b'x'),
+        (4, 't4', 4.0, None, '2020-09-17 00:00:00', None)]
+    rejected = []
+    assert Measurement.save_many([Measurement(id=5, value=10 ** 400), Measurement(id=6)], rejected=rejected) == 1
+    assert [(r.index, list(r.errors)) for r in rejected] == [(0, ['value'])] # OverflowError is a rejected row too
+    rejected = []
+    rows = [Measurement(id=7, value='nan'), Measurement(id=8, value='1e400'), Measurement(id=9, value=float('-inf'))]
+    assert Measurement.save_many(rows, rejected=rejected) == 0 # 不是有限的数
+    assert [list(r.errors) for r in rejected] == [['value']] * 3
+    for column_type in ('', '(10)', '  '):
+        try:
+            make_converter(column_type)
+        except ValueError as e:
+            assert 'unsupported column type' in str(e)
+        else:
+            assert False, 'expected ValueError'
+    try:
+        Measurement(id=5, value='a lot').save()
+    except ValueError as e:
+        assert 'value' in str(e)
+    else:
+        assert False, 'expected ValueError'
+
+
+def test_async_pool():
+    import asyncio
+    import tempfile
+    User = _user_model()
+
+    async def async_demo(path):
+        pool = await create_pool(path, size=3)
+        async with pool.transaction() as aconn:
+            await aconn.execute('create table User (id bigint, name varchar(100), email varchar(100), password varchar(100))')
+        # more tasks than connections: they queue for the pool
+        await asyncio.gather(*[User(id=i, name='async%d' % i).asave() for i in range(20)])
+        assert pool._created == 3
+        assert await User.asave_many(User(id=i) for i in range(100, 200)) == 100
+        u = await User.afind(7)
+        assert u.name == 'async7'
+        u.email = 'async7@orm.org'
+        assert await u.aupdate_row() == 1
+        assert [u.email async for u in User.select(where={'id': 7})] == ['async7@orm.org']
+        assert len([row async for row in User.select(batch_size=7).aiter_tuples()]) == 120
+        # a connection that saw an error is closed, not handed out again
+        try:
+            async with pool.transaction() as aconn:
+                await aconn.execute('insert into Nowhere values (1)')
+        except sqlite3.OperationalError:
+            pass
+        else:
+            assert False, 'expected OperationalError'
+        assert aconn not in pool._idle and aconn._executor._shutdown and pool._created == 2
+        busy = await pool.acquire()
+        await close_pool() # closes the connection still checked out too
+        assert not pool._busy and pool._created == 0 and busy._executor._shutdown
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        asyncio.run(async_demo(path))
+    finally:
+        os.remove(path)
+
+
+def test_load_stream():
+    import tempfile
+    conn = connect(':memory:')
+
+    class Reading(Model):
+        id = IntegerField('id', primary_key=True)
+        sensor = StringField('sensor', 'varchar(8)')
+        value = FloatField('value')
+        ok = BooleanField('ok')
+        taken = DateTimeField('taken')
+
+    Reading.create_table()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'readings.csv')
+        with open(path, 'w') as f:
+            f.write('id,sensor,value,taken,note\n') # 没有ok这一列，note不是字段
+            for i in range(20000):
+                sensor = 'far too long' if i % 1000 == 999 else 's%d' % (i % 10)
+                f.write('%d,%s,%s,2020-09-17T10:00:00,\n' % (i, sensor, i / 2 if i % 3 else ''))
+        rejected = []
+        report = Reading.load_stream(path, workers=2, queue_size=2, commit_rows=5000, rejected=rejected)
+        assert report.rows == 19980 and report.rejected == 20 and report.rows_per_sec > 0
+        assert (rejected[0].batch, rejected[0].index, rejected[0].errors) == (0, 999, {'sensor': 'longer than 8 characters'})
+        assert rejected[1].model['id'] == '1999' and rejected[-1].index == 19999
+    assert conn.execute('select count(*), count(value), count(ok) from Reading').fetchone() == (19980, 13320, 0)
+    assert Reading.find(5) == dict(id=5, sensor='s5', value=2.5, ok=None, taken='2020-09-17 10:00:00')
+
+    lines = ['{"id": 100000, "sensor": "j1", "value": 1.5, "ok": true}\n', '\n', 'not json\n', '[1]\n',
+             '{"id": "x"}\n', '{"id": 100001, "taken": "2020-09-17"}\n', '{"id": 100002, "value": 1%s}\n' % ('0' * 400)]
+    rejected = []
+    report = Reading.load_stream(lines, format='jsonl', workers=0, rejected=rejected)
+    assert report.rows == 2 and report.rejected == 4
+    assert [(r.index, sorted(r.errors)) for r in rejected] == [(2, ['']), (3, ['']), (4, ['id']), (6, ['value'])]
+    assert Reading.find(100000).ok == 1 and Reading.find(100001).taken == '2020-09-17 00:00:00'
+    # 写的时候出错：当前事务回滚，已经提交的留下
+    try:
+        Reading.load_stream(['{"id": %d}\n' % i for i in (200000, 200001, 200000)], format='jsonl',
+                            workers=0, batch_size=1, commit_rows=2)
+    except sqlite3.IntegrityError:
+        pass
+    else:
+        assert False, 'expected IntegrityError'
+    assert conn.execute('select count(*) from Reading where id >= 200000').fetchone() == (2, )
+    try:
+        Reading.load_stream(lines)
+    except ValueError:
+        pass
+    else:
+        assert False, 'expected ValueError'
+
+
+def main(argv=None):
+    '''Run the demos below; "bench" runs the benchmarks instead.'''
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['bench']:
+        bench_main(argv[1:])
+        return
+
+    # h = Hello()
+    # h.hello()
+    # print(type(Hello))
+    # print(type(h))
+    # print(type(Hello) == type)
+
+    # h = Hello()
+    # print(h.hello())
+    # assert type(Hello) == type
+    # assert type(h) == Hello
+
+    # L = MyList()
+    # L.add(1)
+    # assert L == [1]
+
+    # u = User(id=12345, name='Michael', email='test@orm.org', password='my-pwd')
+    # u.save()
+    # print(hasattr(User, '__mappings__'))
+
+    test_save_many()
+    test_codecs()
+    test_schema()
+    test_record()
+    test_query()
+    test_session()
+    test_query_cache()
+    test_converters()
+    test_async_pool()
+    test_load_stream()
+    assert not logging.root.handlers, 'the ORM configured logging' # 只用模块自己的logger
+
+    first_orm_demo()
+
+
+def first_orm_demo():
+    '''The first version of the ORM: a dict whose metaclass collects the fields.'''
+    # class A(object):
+
+    #     def __new__(cls, name, bases, attrs):
+
+    #         return type.__new__(cls, name, bases, attrs)
+
+    # a = A()
+    class MetaClass(type):
+
+        def __new__(cls, name, bases, attrs):
+
+            if name == 'Base':
+                print('a')
+                return type.__new__(cls, name, bases, attrs)
+
+            print('c')
+
+            mappings = {}
+
+            for k, v in attrs.items():
+                if isinstance(v, Field):
+                    mappings[k] = v
+
+            for k in mappings.keys():
+                attrs.pop(k)
+
+
+            attrs['__mappings__'] = mappings
+            attrs['__table__'] = name
+
+            return type.__new__(cls, name, bases, attrs)
+
+
+    class Base(dict, metaclass=MetaClass):
+
+
+        def __init__(self, **kw):
+            print('d')
+            super(Base, self).__init__(**kw)
+
+        def __getattr__(self, key):
+
+            try:
+                return self[key]
+            except KeyError:
+                raise AttributeError('The model has no attribute {}'.format(key))
+
+        def __setattr__(self, key, value):
+
+            self[key] = value
+
+        def save(self):
+
+            fields = []
+            params = []
+            args = []
+
+            for k, v in self.__mappings__.items():
+                fields.append(v.name)
+                params.append('?')
+                args.append(getattr(self, k, None))
+            
+            sql = 'insert into %s (%s) values (%s)' % (self.__table__, ','.join(fields), ','.join(params))
+            print('SQL: %s' % sql)
+            print('ARGS: %s' % str(args))
+
+
+
+
+    class User(Base):
+
+        print('b')
+
+        id = IntegerField('id')
+        name = StringField('name')
+        email = StringField('email')
+        password = StringField('password')
+
+
+
+    # 下面这几个类定义在User之后：User用的其实是模块里ORM的Field，在函数里这么写就是未赋值的局部变量了
+    # class Field(object):
+
+    #     def __init__(self, name, column_type):
+
+    #         self.name = name
+    #         self.column_type = column_type
+
+    #     def __str__(self):
+
+    #         return '{0}: {1}'.format(self.__class__.__name__, self.name)
+
+
+    # class StringField(Field):
+
+    #     def __init__(self, name, column_type):
+
+    #         super(StringField, self).__init__(name, 'varchar(100)')
+
+
+    # class IntegerField(Field):
+
+    #     def __init__(self, name, column_type):
+
+    #         super(IntegerField, self).__init__(name, 'bigint')
+
+    u = User(id=12345, name='Fubuki', email='fubuki@outlook.com', password='nekodesu')
+    u.save()
+
+
+if __name__ == '__main__':
+    main()
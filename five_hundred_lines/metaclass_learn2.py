@@ -0,0 +1,161 @@
+import logging
+import time
+
+class Field(object):
+
+    pass
+
+class IntegerField(Field):
+
+    def __init__(self, val):
+        self.val = val
+
+class StringField(Field):
+
+    def __init__(self, val):
+        self.val = val
+
+
+
+class MetaClass(type):
+
+    def __new__(cls, name, bases, attrs):
+
+        # 先问一下级别：关掉的时候不用拼字符串，也不用进logging
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info('new MetaClass:%s', name)
+
+        if name in ('Base', 'Record'):
+            return type.__new__(cls, name, bases, attrs)
+        
+        mappings = dict()
+
+        for k,v in attrs.items():
+
+            if isinstance(v, Field):
+                mappings[k] = v
+
+        for key in mappings.keys():
+            attrs.pop(key)
+        
+        
+        attrs['__mappings__'] = mappings
+
+        if not any(issubclass(b, dict) for b in bases):
+            # Record的子类：字段直接放进__slots__
+            attrs['__slots__'] = tuple(mappings)
+
+        return type.__new__(cls, name, bases, attrs)
+
+
+class Base(dict, metaclass=MetaClass):
+    def __init__(self, **kw):
+
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info('init Base:%s', self.__class__.__name__)
+
+        super().__init__(**kw)
+
+    def __getattr__(self, k):
+
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info('construct attr:%s', k)
+
+        try:
+            return self[k]
+        except KeyError:
+            raise AttributeError('Attribute not found')
+
+    def __setattr__(self, k, v):
+
+        self[k] = v
+
+
+class Record(metaclass=MetaClass):
+    '''Like Base, but the declared fields are __slots__ instead of dict entries.'''
+
+    __slots__ = ()
+
+    def __init__(self, **kw):
+
+        for k in self.__mappings__:
+            setattr(self, k, kw.pop(k, None))
+        if kw:
+            raise TypeError('%s() got unexpected keyword arguments: %s' % (
+                type(self).__name__, ', '.join(sorted(kw))))
+
+    def __getitem__(self, k):
+
+        if k not in self.__mappings__:
+            raise KeyError(k)
+        return getattr(self, k)
+
+    def __setitem__(self, k, v):
+
+        if k not in self.__mappings__:
+            raise KeyError(k)
+        setattr(self, k, v)
+
+    def keys(self):
+
+        return self.__mappings__.keys()
+
+
+
+
+
+# 演示代码只在直接运行时执行，import这个模块没有副作用
+def main(argv=None):
+    '''The demo: a User whose attribute reads are logged.'''
+
+    logging.basicConfig(level=logging.INFO)
+
+    class User(Base):
+
+        # first __new__ Base
+
+        user_id = IntegerField(0)
+        user_name = StringField('a')
+
+        logging.info('load User class attrs')
+
+
+
+    user = User(user_id=0, user_name='sasaki')
+    logging.info('create user instance')
+    # print(User.__dict__)
+
+    name = user.user_name
+
+    time.sleep(0.5)
+
+    print(name)
+
+    print('attrs only to users:{}'.format(user.__dict__))
+
+    print('attrs to Users:{}'.format(User.__dict__))
+
+    print(hasattr(user, 'user_name'))
+
+    time.sleep(0.5)
+
+    print(getattr(user, 'user_name', None))
+
+    time.sleep(0.5)
+
+    print(getattr(user, 'user_score', None))
+
+    class UserRecord(Record):
+
+        user_id = IntegerField(0)
+
+    try:
+        UserRecord(user_id=1, user_score=3)
+    except TypeError as e:
+        assert 'user_score' in str(e)
+    else:
+        assert False, 'expected TypeError'
+
+
+if __name__ == '__main__':
+    main()
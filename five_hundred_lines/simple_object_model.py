@@ -0,0 +1,1678 @@
+'''
+
+A simple object model by Carl Friedrich Bolz
+'''
+
+import array
+import ast
+import bisect
+import functools
+import gc
+import inspect
+import json
+import marshal
+import mmap
+import os
+import pickle
+import struct
+import sys
+import textwrap
+import threading
+import time
+import tracemalloc
+import types
+import weakref
+
+class Base(object):
+    ''' The base class that all of the object model classes inherit from.'''
+
+    __slots__ = ['cls', '_fields', '__weakref__']
+
+    def __init__(self, cls, fields):
+        '''Every object has a class.'''
+        # cls: A class object
+        # fields: dictionary of fields and their values
+        self.cls = cls
+        self._fields = fields
+
+    def read_attr(self, fieldname):
+        '''read field 'fieldname' out of the object'''
+        # return self._read_dict(fieldname)
+        # 调用method时返回的是一个函数
+        # --------for attributed based model---------
+        result = self._read_dict(fieldname)
+        if result is not MISSING:
+            return result
+        result = self.cls._read_from_class(fieldname)
+        if _is_bindable(result): 
+            return _make_boundmethod(result, self)
+        if result is not MISSING: 
+            return result
+
+        # -------for meta-object protocols(plus the following codes)----------
+        meth = self.cls._read_from_class('__getattr__') # 从instance对应的类上找到__getattr__这个函数
+        if meth is not MISSING:
+            return meth(self, fieldname) # 返回get到的值
+        raise AttributeError(fieldname)
+
+
+    def write_attr(self, fieldname, value):
+        '''write field 'fieldname' into the object '''
+        # --------for attributed based model---------
+        # self._write_dict(fieldname, value)
+
+        # -------for meta-object protocols----------
+        meth = self.cls._read_from_class('__setattr__') # 同理找到__setattr__这个函数
+        return meth(self, fieldname, value)
+
+
+
+    def isinstance(self, cls):
+        '''return True if the object is an instance of class clf'''
+        return self.cls.issubclass(cls)
+
+    def callmethod(self, methname, *args):
+        ''' call method 'methname' with arguments 'args' on object '''
+        # meth = self.cls._read_from_class(methname)
+        # return meth(self, *args)
+        meth = self.read_attr(methname) # read_attr already returns a bound method
+        return meth(*args)
+
+    def _read_dict(self, fieldname):
+        ''' read an field 'fieldname' out of th object's dict  '''
+        return self._fields.get(fieldname, MISSING)
+
+    def _write_dict(self, fieldname, value):
+        ''' write a field 'fieldname' into the object's dict'''
+        self._fields[fieldname] = value
+
+def _is_bindable(meth):
+    # for attribute-based model
+    # return callable(meth)
+
+    # for descriptor protocol
+
+    return hasattr(meth, '__get__') # 判断是不是一个descriptor
+
+def _make_boundmethod(meth, self):
+    # for attribute-based model
+    # Use a closure to emulate a bound method
+    # 这里面用闭包的原因：_read_from_class函数返回一个f_A函数，该函数要穿入self和a两个参数，而调用的时候不显式地传入self，因此要把这个参数“隐藏”起来
+    # def bound(*args):
+    #     return meth(self, *args)
+    # return bound # 返回一个不需要传入self的函数
+
+    # for descriptor protocol
+    if JIT is not None and type(self) is Instance and isinstance(meth, types.FunctionType):
+        meth = JIT.lookup(meth, self) # 方法调用得够多时，换成针对self.map特化的版本
+    return meth.__get__(self, None)
+
+
+MISSING = object()
+
+# Concurrency: reads never take a lock.  Map transitions, writes to class fields
+# and JIT compilation are serialized by _LOCK.  Writing to any class bumps
+# _class_epoch, which makes every class lookup cache stale at once.
+_LOCK = threading.RLock()
+_class_epoch = 0
+_UNCACHED = object()
+
+
+class Instance(Base):
+    ''' Instance of a user-defined class.'''
+
+    # def __init__(self, cls):
+    #     assert isinstance(cls, Class)
+    #     Base.__init__(self, cls, {})
+
+    # The following codes are for the map optimization implementation
+
+    __slots__ = ['map', 'storage']
+
+    def __init__(self, cls):
+        assert isinstance(cls, Class)
+        Base.__init__(self, cls, None)
+        self.map = EMPTY_MAP
+        self.storage = []
+        if SPACE is not None:
+            SPACE.track(self)
+
+    def _read_dict(self, fieldname):
+        index = self.map.get_index(fieldname)
+        if index == -1:
+            return MISSING
+        return self.storage[index]
+
+    def _write_dict(self, fieldname, value):
+        index = self.map.get_index(fieldname)
+        if index != -1:
+            # indices never move, so overwriting needs no lock
+            self.storage[index] = value
+            return
+        with _LOCK:
+            index = self.map.get_index(fieldname) # another thread may have added it meanwhile
+            if index != -1:
+                self.storage[index] = value
+                return
+            if SPACE is not None:
+                SPACE.grow(self) # raises before anything changes if over the budget
+            new_map = self.map.next_map(fieldname)
+            # storage grows before the new map is published, so a lock-free reader
+            # that sees the new map always finds the value
+            self.storage.append(value)
+            self.map = new_map
+
+class Class(Base):
+    ''' A user-defined class.'''
+    # The Class class has attribute cls inherited from Base class, so it can be an instance of other class.
+
+    __slots__ = ['name', 'base_class', '_cache']
+
+    def __init__(self, name, base_class, fields, metaclass):
+        Base.__init__(self, metaclass, fields)
+        self.name = name
+        self.base_class = base_class
+        self._cache = (-1, {}) # (epoch, fieldname -> result of _read_from_class)
+
+    def method_resolution_order(self):
+        ''' compute the method resolution order of the class'''
+        # 找父类
+        if self.base_class is None:
+            return [self]
+        else:
+            return [self] + self.base_class.method_resolution_order()
+
+    def issubclass(self, cls):
+        ''' is self a subclass of cls'''
+        return cls in self.method_resolution_order()
+
+    def _read_from_class(self, methname):
+        # 找自己和所有父类中是否有methname方法，返回那个方法
+        # the epoch is read before walking the MRO: if a class is written meanwhile,
+        # the result lands in a cache that is already stale
+        epoch = _class_epoch
+        cache_epoch, cache = self._cache
+        if cache_epoch != epoch:
+            cache = {}
+            self._cache = (epoch, cache)
+        result = cache.get(methname, _UNCACHED)
+        if result is _UNCACHED:
+            result = MISSING
+            for cls in self.method_resolution_order():
+                if methname in cls._fields:
+                    result = cls._fields[methname]
+                    break
+            cache[methname] = result
+        return result
+
+    def _write_dict(self, fieldname, value):
+        global _class_epoch
+        with _LOCK:
+            self._fields[fieldname] = value
+            _class_epoch += 1
+
+
+#----The following codes are specifically for meta-object model-------
+def OBJECT__setattr__(self, fieldname, value):
+    # 给self实例增加一个fieldname属性，并赋上value
+    self._write_dict(fieldname, value)
+
+# set up the base hierarchy as in Python (the ObjVLisp model)
+# the ultimate base class is OBJECT
+# (OBJECT has to carry __setattr__ before TYPE is built on top of it, otherwise classes can't be written to)
+OBJECT = Class(name='object', base_class=None, fields={'__setattr__': OBJECT__setattr__}, metaclass=None)
+# TYPE is a subclass of OBJECT
+TYPE = Class(name='type', base_class=OBJECT, fields={}, metaclass=None)
+# TYPE is an instance of itself
+TYPE.cls = TYPE
+# OBJECT is an instance of TYPE
+OBJECT.cls = TYPE
+
+
+class Map(object):
+    __slots__ = ['attrs', 'next_maps']
+
+    def __init__(self, attrs):
+        self.attrs = attrs
+        self.next_maps = {}
+
+    def get_index(self, fieldname):
+        return self.attrs.get(fieldname, -1)
+
+    def next_map(self, fieldname):
+        assert fieldname not in self.attrs
+        result = self.next_maps.get(fieldname)
+        if result is not None:
+            return result
+        with _LOCK:
+            # two threads can miss at the same time, only one creates the map
+            result = self.next_maps.get(fieldname)
+            if result is None:
+                attrs = self.attrs.copy()
+                attrs[fieldname] = len(attrs)
+                result = self.next_maps[fieldname] = Map(attrs)
+        return result
+
+EMPTY_MAP = Map({})
+
+#------------------------------------------OBJECT SPACE-----------------------------------------------------
+
+# Memory is accounted per slot: the instance itself, its (empty) storage list,
+# and one pointer for every field in the storage.
+STORAGE_SIZE = sys.getsizeof([])
+SLOT_SIZE = struct.calcsize('P')
+
+class MemoryBudgetExceeded(MemoryError):
+    pass
+
+class ObjectSpace(object):
+    ''' Keeps track of the live instances through weakrefs and of the memory they hold.
+    With a budget (in bytes), creating an instance or adding a field that would go over it
+    raises MemoryBudgetExceeded before the storage grows.'''
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.bytes_used = 0
+        self._entries = {} # id(instance) -> [weakref, class, bytes]
+        # reentrant: a weakref callback can run in the middle of track()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _charge(self, nbytes):
+        if self.budget is not None and self.bytes_used + nbytes > self.budget:
+            raise MemoryBudgetExceeded('%d bytes needed, %d of %d bytes in use'
+                                       % (nbytes, self.bytes_used, self.budget))
+        self.bytes_used += nbytes
+
+    def track(self, obj):
+        ''' start accounting for the instance 'obj' '''
+        key = id(obj)
+        nbytes = sys.getsizeof(obj) + STORAGE_SIZE + SLOT_SIZE * len(obj.storage)
+        with self._lock:
+            if key in self._entries:
+                return
+            self._charge(nbytes)
+            # the callback runs before the id can be reused
+            ref = weakref.ref(obj, lambda ref, key=key: self._forget(key))
+            self._entries[key] = [ref, obj.cls, nbytes]
+
+    def grow(self, obj):
+        ''' account for one more field in the storage of 'obj' '''
+        with self._lock:
+            entry = self._entries.get(id(obj))
+            if entry is None:
+                return # created before this space was installed
+            self._charge(SLOT_SIZE)
+            entry[2] += SLOT_SIZE
+
+    def _forget(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes_used -= entry[2]
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def live_instances(self, cls=None):
+        ''' the live instances, optionally only those of class 'cls' '''
+        result = []
+        for ref, objcls, nbytes in self._snapshot():
+            obj = ref()
+            if obj is not None and (cls is None or objcls is cls):
+                result.append(obj)
+        return result
+
+    def report(self):
+        ''' per class: number of live instances, bytes held and instances per map layout'''
+        classes = {}
+        for ref, cls, nbytes in self._snapshot():
+            obj = ref()
+            if obj is None:
+                continue
+            info = classes.get(cls)
+            if info is None:
+                info = classes[cls] = {'class': cls.name, 'instances': 0, 'bytes': 0, 'maps': {}}
+            info['instances'] += 1
+            info['bytes'] += nbytes
+            layout = ','.join(obj.map.attrs)
+            info['maps'][layout] = info['maps'].get(layout, 0) + 1
+        return list(classes.values())
+
+# set to an ObjectSpace to account for new instances
+SPACE = None
+
+#------------------------------------------TRACING SPECIALIZER-----------------------------------------------------
+
+# Methods like f_A do self.read_attr('x') every time they run, going through
+# map.get_index() and the class lookup on each call.
+# The tracer counts how often a method is bound to an instance with a given map.
+# Once that pair gets hot, the source of the method is rewritten so that every
+# self.read_attr('name') whose name the map already knows becomes self.storage[i],
+# and the result is compiled behind a guard on self.map.
+# Maps only ever grow by appending, so an index that holds when the guard passes
+# stays valid for the rest of the call even if the method adds new fields.
+
+HOT_THRESHOLD = 50
+
+class Trace(object):
+    ''' What the tracer has seen for one method function.'''
+
+    def __init__(self, func, tracer):
+        self.func = func
+        self.tracer = tracer
+        self.calls = 0
+        self.maps = {} # map -> how many calls have been seen with it
+        self.classes = set() # classes of the receivers
+        self.specialized = {} # map -> specialized function (or func itself if nothing to rewrite)
+        self.deopts = 0 # guard failures
+        self.unspecializable = False
+
+
+class Tracer(object):
+    ''' Record the maps seen by hot method calls and compile specialized versions.'''
+
+    def __init__(self, threshold=HOT_THRESHOLD):
+        self.threshold = threshold
+
+    def trace_of(self, func):
+        ''' the Trace of 'func' for this tracer, created on first use '''
+        # trace存在函数自己身上，类被丢掉时跟着函数一起回收；
+        # 放在tracer的字典里（哪怕是WeakKeyDictionary，trace也强引用着func）会一直泄漏
+        trace = func.__dict__.get('_jit_trace')
+        if trace is None or trace.tracer is not self:
+            trace = func._jit_trace = Trace(func, self)
+        return trace
+
+    def lookup(self, func, obj):
+        ''' return the function that should be bound to 'obj' instead of 'func' '''
+        trace = self.trace_of(func)
+        objmap = obj.map
+        specialized = trace.specialized.get(objmap)
+        if specialized is not None:
+            return specialized
+        if trace.unspecializable:
+            return func
+
+        trace.calls += 1
+        trace.classes.add(obj.cls)
+        count = trace.maps[objmap] = trace.maps.get(objmap, 0) + 1
+        if count < self.threshold:
+            return func
+
+        # the counters above are allowed to race, compiling is not
+        with _LOCK:
+            specialized = trace.specialized.get(objmap)
+            if specialized is not None:
+                return specialized
+            specialized = _specialize(func, objmap, self._make_deopt(trace))
+            if specialized is None:
+                trace.unspecializable = True
+                return func
+            trace.specialized[objmap] = specialized
+        return specialized
+
+    def _make_deopt(self, trace):
+        # the guard failed: the bound method outlived the map it was specialized for
+        func = trace.func
+        def deopt(*args, **kwargs):
+            trace.deopts += 1
+            return func(*args, **kwargs)
+        return deopt
+
+
+class _ReadAttrRewriter(ast.NodeTransformer):
+    ''' Turn self.read_attr('name') into self.storage[i] for the names known to a map.'''
+
+    def __init__(self, selfname, objmap):
+        self.selfname = selfname
+        self.map = objmap
+        self.count = 0
+        self.rebinds_self = False
+        self.top = None
+
+    def visit_FunctionDef(self, node):
+        # nested scopes may shadow self, leave them alone
+        if self.top is None:
+            self.top = node
+            self.generic_visit(node)
+        return node
+
+    visit_AsyncFunctionDef = visit_Lambda = visit_ClassDef = visit_FunctionDef
+
+    def visit_Name(self, node):
+        if node.id == self.selfname and not isinstance(node.ctx, ast.Load):
+            self.rebinds_self = True
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        func = node.func
+        if not (isinstance(func, ast.Attribute) and func.attr == 'read_attr'
+                and isinstance(func.value, ast.Name) and func.value.id == self.selfname
+                and len(node.args) == 1 and not node.keywords
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            return node
+        index = self.map.get_index(node.args[0].value)
+        if index == -1:
+            return node # a class attribute or __getattr__, keep the generic path
+        self.count += 1
+        storage = ast.Attribute(ast.Name(self.selfname, ast.Load()), 'storage', ast.Load())
+        return ast.copy_location(ast.Subscript(storage, ast.Constant(index), ast.Load()), node)
+
+
+def _specialize(func, objmap, deopt):
+    ''' compile a copy of 'func' that reads the fields known to 'objmap' straight from storage.
+    Returns func itself if there is nothing to rewrite and None if func can't be specialized.'''
+    code = func.__code__
+    if func.__closure__ or code.co_flags & (inspect.CO_GENERATOR | inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR):
+        return None
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    except (OSError, TypeError, SyntaxError):
+        return None
+    funcdef = tree.body[0]
+    if not isinstance(funcdef, ast.FunctionDef) or funcdef.name != func.__name__:
+        return None
+    arguments = funcdef.args
+    positional = arguments.posonlyargs + arguments.args
+    if not positional:
+        return None
+
+    selfname = positional[0].arg
+    rewriter = _ReadAttrRewriter(selfname, objmap)
+    rewriter.visit(funcdef)
+    if rewriter.rebinds_self:
+        return None
+    if not rewriter.count:
+        return func
+
+    # guard: if self.map changed since binding, call the original function
+    forward = [arg.arg for arg in positional]
+    if arguments.vararg:
+        forward.append('*' + arguments.vararg.arg)
+    forward.extend('%s=%s' % (arg.arg, arg.arg) for arg in arguments.kwonlyargs)
+    if arguments.kwarg:
+        forward.append('**' + arguments.kwarg.arg)
+    guard = ast.parse('if %s.map is not _jit_map:\n    return _jit_deopt(%s)' % (selfname, ', '.join(forward))).body[0]
+    funcdef.body.insert(0, guard)
+
+    # defaults and annotations are copied over from func instead of being evaluated again
+    funcdef.decorator_list = []
+    funcdef.returns = None
+    for arg in positional + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg]:
+        if arg is not None:
+            arg.annotation = None
+    arguments.defaults = []
+    arguments.kw_defaults = [None] * len(arguments.kwonlyargs)
+    ast.increment_lineno(funcdef, code.co_firstlineno - 1)
+
+    # the factory closes over the guard map and the deopt function
+    module = ast.parse('def _jit_factory(_jit_map, _jit_deopt):\n    pass')
+    module.body[0].body = [funcdef, ast.Return(ast.Name(funcdef.name, ast.Load()))]
+    ast.fix_missing_locations(module)
+    namespace = {}
+    exec(compile(module, code.co_filename, 'exec'), func.__globals__, namespace)
+    specialized = namespace['_jit_factory'](objmap, deopt)
+    specialized.__defaults__ = func.__defaults__
+    specialized.__kwdefaults__ = func.__kwdefaults__
+    functools.update_wrapper(specialized, func)
+    specialized.__dict__.pop('_jit_trace', None) # update_wrapper copied func.__dict__
+    return specialized
+
+# set to None to switch specialization off
+JIT = Tracer()
+
+#------------------------------------------SNAPSHOTS-----------------------------------------------------
+
+# Instances that share a map have the same fields in the same order, so a heap of
+# them is stored as a table of maps plus, per (class, map) group, a block of equally
+# wide storage rows.  Every cell is a one byte tag and an 8 byte payload:
+#   None/False/True   nothing
+#   int, float        the value itself (floats are stored as their bits)
+#   REF               the index of another instance in the snapshot
+#   POOL              an index into a pickled list holding every other value
+# The file is opened with mmap; loading it only restores the maps and reads the
+# group table, instances are created on first access.
+
+SNAPSHOT_MAGIC = b'OMSNAP01'
+SNAPSHOT_HEADER = struct.Struct('<8s8sQQQQ') # magic, byte order, meta offset/length, pool offset/length
+_TAG_NONE, _TAG_FALSE, _TAG_TRUE, _TAG_INT, _TAG_FLOAT, _TAG_REF, _TAG_POOL = range(7)
+_INT_MIN, _INT_MAX = -2 ** 63, 2 ** 63 - 1
+_FLOAT_BITS = struct.Struct('=d')
+_INT_BITS = struct.Struct('=q')
+
+class SnapshotError(Exception):
+    pass
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def save_snapshot(path, roots):
+    ''' write every Instance reachable from 'roots' to 'path'.
+    Classes are recorded by name; values that are neither instances nor simple
+    scalars must be picklable and must not contain instances themselves.'''
+    # find the instances, without recursion
+    seen = set()
+    order = []
+    stack = list(reversed(roots))
+    while stack:
+        obj = stack.pop()
+        if type(obj) is not Instance:
+            raise TypeError('can only snapshot Instance objects, not %r' % (obj, ))
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        order.append(obj)
+        for value in reversed(obj.storage):
+            if type(value) is Instance and id(value) not in seen:
+                stack.append(value)
+
+    # number them group by group, so that each group is a contiguous block of rows
+    groups = {} # (class, map) -> instances
+    for obj in order:
+        groups.setdefault((obj.cls, obj.map), []).append(obj)
+    classes = {}
+    maps = {}
+    numbering = {}
+    group_table = []
+    for (cls, objmap), objs in groups.items():
+        if classes.setdefault(cls.name, cls) is not cls:
+            raise SnapshotError('two different classes are called %r' % cls.name)
+        map_index = maps.setdefault(objmap, len(maps))
+        group_table.append([list(classes).index(cls.name), map_index, len(numbering), len(objs)])
+        for obj in objs:
+            numbering[id(obj)] = len(numbering)
+
+    # encode the rows
+    pool = []
+    pool_index = {}
+    blocks = []
+    for (cls, objmap), objs in groups.items():
+        tags = bytearray()
+        payloads = array.array('q')
+        for obj in objs:
+            for value in obj.storage:
+                if value is None:
+                    tag, payload = _TAG_NONE, 0
+                elif value is False:
+                    tag, payload = _TAG_FALSE, 0
+                elif value is True:
+                    tag, payload = _TAG_TRUE, 0
+                elif type(value) is int and _INT_MIN <= value <= _INT_MAX:
+                    tag, payload = _TAG_INT, value
+                elif type(value) is float:
+                    tag, payload = _TAG_FLOAT, _INT_BITS.unpack(_FLOAT_BITS.pack(value))[0]
+                elif type(value) is Instance:
+                    tag, payload = _TAG_REF, numbering[id(value)]
+                else:
+                    tag = _TAG_POOL
+                    # by identity: equal values can still differ ((1, 0) == (True, False), 0.0 == -0.0);
+                    # the instances keep the values alive until the snapshot is written
+                    payload = pool_index.setdefault(id(value), len(pool))
+                    if payload == len(pool):
+                        pool.append(value)
+                tags.append(tag)
+                payloads.append(payload)
+        blocks.append((tags, payloads))
+
+    with open(path, 'wb') as f:
+        f.write(b'\0' * SNAPSHOT_HEADER.size)
+        offset = SNAPSHOT_HEADER.size
+        for group, (tags, payloads) in zip(group_table, blocks):
+            offset = _align(offset)
+            f.seek(offset)
+            f.write(payloads.tobytes())
+            group.append(offset)
+            offset += len(payloads) * payloads.itemsize
+            f.write(tags)
+            group.append(offset)
+            offset += len(tags)
+        meta = marshal.dumps({
+            'classes': list(classes),
+            'maps': [tuple(objmap.attrs) for objmap in maps],
+            'groups': [tuple(group) for group in group_table],
+            'roots': [numbering[id(obj)] for obj in roots],
+        })
+        pool_data = pickle.dumps(pool, pickle.HIGHEST_PROTOCOL)
+        f.write(meta)
+        f.write(pool_data)
+        f.seek(0)
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, sys.byteorder.encode('ascii'),
+                                     offset, len(meta), offset + len(meta), len(pool_data)))
+
+def load_snapshot(path, classes):
+    ''' open a snapshot written by save_snapshot.
+    'classes' maps class names to the Class objects to use for the restored instances.'''
+    return Snapshot(path, classes)
+
+class Snapshot(object):
+    ''' A snapshot opened with mmap. snapshot[i] and snapshot.roots create instances on first access.'''
+
+    def __init__(self, path, classes):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open(classes)
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def _open(self, classes):
+        data = self._mmap
+        if len(data) < SNAPSHOT_HEADER.size:
+            raise SnapshotError('truncated snapshot')
+        magic, byteorder, meta_offset, meta_len, pool_offset, pool_len = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError('not a snapshot')
+        if byteorder.rstrip(b'\0').decode('ascii') != sys.byteorder:
+            raise SnapshotError('snapshot was written on a machine with another byte order')
+        if pool_offset + pool_len > len(data):
+            raise SnapshotError('truncated snapshot')
+        self._buffers = []
+        meta = marshal.loads(data[meta_offset:meta_offset + meta_len])
+        self._pool_range = (pool_offset, pool_offset + pool_len)
+        self._pool = None
+
+        try:
+            self._classes = [classes[name] for name in meta['classes']]
+        except KeyError as e:
+            raise SnapshotError('no class given for %s' % e)
+        # the maps are restored once, through the live transition tree, so restored
+        # instances share their maps (and JIT traces) with the ones created later
+        self._maps = []
+        for attrs in meta['maps']:
+            objmap = EMPTY_MAP
+            for fieldname in attrs:
+                objmap = objmap.next_map(fieldname)
+            self._maps.append(objmap)
+
+        view = memoryview(data)
+        self._buffers = [view] # every view into the mapping, they are released before it is closed
+        self._groups = []
+        self._starts = []
+        for class_index, map_index, start, count, payload_offset, tag_offset in meta['groups']:
+            width = len(meta['maps'][map_index])
+            size = count * width
+            payloads = view[payload_offset:payload_offset + 8 * size]
+            tags = view[tag_offset:tag_offset + size]
+            ints = payloads.cast('q')
+            floats = payloads.cast('d')
+            self._buffers.extend([payloads, tags, ints, floats])
+            self._groups.append((self._classes[class_index], self._maps[map_index], start, width,
+                                 tags, ints, floats))
+            self._starts.append(start)
+        self._length = sum(group[3] for group in meta['groups'])
+        self._instances = [None] * self._length
+        self._roots = meta['roots']
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        obj = self._instances[index]
+        if obj is None:
+            obj = self._materialize(index)
+        return obj
+
+    @property
+    def roots(self):
+        return [self[index] for index in self._roots]
+
+    def materialized(self):
+        ''' how many instances have been created so far'''
+        return self._length - self._instances.count(None)
+
+    def _pool_values(self):
+        if self._pool is None:
+            start, stop = self._pool_range
+            self._pool = pickle.loads(self._mmap[start:stop])
+        return self._pool
+
+    def _new_instance(self, index):
+        group = self._groups[bisect.bisect_right(self._starts, index) - 1]
+        obj = Instance.__new__(Instance) # bypass __init__, the object space sees it once it is filled
+        Base.__init__(obj, group[0], None)
+        obj.map = group[1]
+        obj.storage = []
+        self._instances[index] = obj
+        return obj
+
+    def _materialize(self, index):
+        # the instances it refers to are created too, with a worklist instead of recursion
+        instances = self._instances
+        first = self._new_instance(index)
+        pending = [index]
+        while pending:
+            index = pending.pop()
+            cls, objmap, start, width, tags, ints, floats = self._groups[bisect.bisect_right(self._starts, index) - 1]
+            base = (index - start) * width
+            storage = instances[index].storage
+            for i in range(base, base + width):
+                tag = tags[i]
+                if tag == _TAG_INT:
+                    value = ints[i]
+                elif tag == _TAG_REF:
+                    ref = ints[i]
+                    value = instances[ref]
+                    if value is None:
+                        value = self._new_instance(ref)
+                        pending.append(ref)
+                elif tag == _TAG_FLOAT:
+                    value = floats[i]
+                elif tag == _TAG_POOL:
+                    value = self._pool_values()[ints[i]]
+                elif tag == _TAG_NONE:
+                    value = None
+                else:
+                    value = tag == _TAG_TRUE
+                storage.append(value)
+            if SPACE is not None:
+                SPACE.track(instances[index])
+        return first
+
+    def close(self):
+        ''' release the mapping, the instances created so far stay usable'''
+        self._groups = []
+        for buffer in reversed(self._buffers):
+            buffer.release()
+        self._buffers = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+#------------------------------------------TEST CODE OF SIMPLE OBJECT MODEL-----------------------------------------------------
+
+def test_read_write_field():
+    # Python code
+    class A(object):
+        pass
+    obj = A()
+    obj.a = 1
+    assert obj.a == 1
+
+    obj.b = 5
+    assert obj.a == 1
+    assert obj.b == 5
+
+    obj.a = 2
+    assert obj.a == 2
+    assert obj.b == 5
+
+
+    # Object model code
+    A = Class(name='A', base_class=OBJECT, fields={}, metaclass=TYPE)
+    obj = Instance(A)
+    obj.write_attr('a', 1)
+    assert obj.read_attr('a') == 1
+
+    obj.write_attr('b', 5)
+    assert obj.read_attr('a') == 1
+    assert obj.read_attr('b') == 5
+
+    obj.write_attr('a', 2)
+    assert obj.read_attr('a') == 2
+    assert obj.read_attr('b') == 5
+
+
+def test_read_write_field_class():
+    # classes are objects too
+    # Python code
+    class A(object):
+        pass
+    A.a = 1
+    assert A.a == 1
+    A.a = 6
+    assert A.a == 6
+
+    # Object model code
+    A = Class(name='A', base_class=OBJECT, fields={'a':1}, metaclass=TYPE)
+    assert A.read_attr('a') == 1
+    A.write_attr('a', 5)
+    assert A.read_attr('a') == 5
+
+def test_isinstance():
+    # Python code
+    class A(object):
+        pass
+    class B(A):
+        pass
+    b = B()
+    assert isinstance(b, B)
+    assert isinstance(b, A)
+    assert isinstance(b, object)
+    assert not isinstance(b, type)
+
+    # Object model code
+    A = Class(name='A', base_class=OBJECT, fields={}, metaclass=TYPE)
+    B = Class(name='B', base_class=A, fields={}, metaclass=TYPE)
+    b = Instance(B)
+    assert b.isinstance(B)
+    assert b.isinstance(A)
+    assert b.isinstance(OBJECT)
+    assert not b.isinstance(TYPE)
+
+
+def test_callmethod_simple():
+    # Python code
+    class A(object):
+        def f(self):
+            return self.x + 1
+    obj = A()
+    obj.x = 1
+    assert obj.f() == 2
+
+    class B(A):
+        pass
+    obj = B()
+    obj.x = 1
+    assert obj.f() == 2
+
+    # Object model code
+    def f_A(self):
+        return self.read_attr('x') + 1
+    A = Class(name='A', base_class=OBJECT, fields={'f': f_A}, metaclass=TYPE)
+    obj = Instance(A)
+    obj.write_attr('x', 1)
+    assert obj.callmethod('f') == 2
+
+    B = Class(name='B', base_class=A, fields={}, metaclass=TYPE)
+    obj = Instance(B)
+    obj.write_attr('x', 2)
+    assert obj.callmethod('f') == 3
+
+
+def test_callmethod_subclassing_and_arguments():
+    # Python code
+    class A(object):
+        def g(self, arg):
+            return self.x + arg
+    obj = A()
+    obj.x = 1
+    assert obj.g(4) == 5
+
+    class B(A):
+        def g(self, arg):
+            return self.x + arg * 2
+    obj = B()
+    obj.x = 4
+    assert obj.g(4) == 12
+
+    # Object model code
+    def g_A(self, arg):
+        return self.read_attr('x') + arg
+    A = Class(name='A', base_class=OBJECT, fields={'g': g_A}, metaclass=TYPE)
+    obj = Instance(A)
+    obj.write_attr('x', 1)
+    assert obj.callmethod('g', 4) == 5
+
+    def g_B(self, arg):
+        return self.read_attr('x') + arg * 2
+    B = Class(name='B', base_class=A, fields={'g': g_B}, metaclass=TYPE)
+    obj = Instance(B)
+    obj.write_attr('x', 4)
+    assert obj.callmethod('g', 4) == 12
+
+
+'''Differences between attribute-based model and method-based model'''
+
+def test_bound_method():
+    # Python code
+    class A(object):
+        def f(self, a):
+            return self.x + a + 1
+    obj = A()
+    obj.x = 2
+    m = obj.f
+    assert m(4) == 7
+
+    class B(A):
+        pass
+    obj = B()
+    obj.x = 1
+    m = obj.f
+    assert  m(10) == 12
+
+    # Object model code
+    def f_A(self, a):
+        return self.read_attr('x') + a + 1
+    A = Class(name='A', base_class=OBJECT, fields={'f': f_A}, metaclass=TYPE)
+    obj = Instance(A)
+    obj.write_attr('x', 2)
+    m = obj.read_attr('f') # return a function
+    assert m(4) == 7
+
+    a = obj.read_attr('x')
+    assert a == 2
+
+    obj.write_attr('x', 5)
+    a = obj.read_attr('x')
+    assert a == 5
+
+
+    B = Class(name='B', base_class=A, fields={}, metaclass=TYPE)
+    obj = Instance(B)
+    obj.write_attr('x', 1)
+    m = obj.read_attr('f') # m是一个函数名
+    assert m(10) == 12
+
+def test_getattr():
+    # Python code
+    class A(object):
+        def __getattr__(self, name):
+            if name == 'fahrenheit':
+                return self.celsius * 9.0 / 5.0 + 32
+            raise AttributeError(name)
+
+        def __setattr__(self, name, value):
+            if name == 'fahrenheit':
+                self.celsius = (value - 32) * 5.0 / 9.0
+            else:
+                # call the base implementation
+                object.__setattr__(self, name, value)
+
+    obj = A()
+    obj.celsius = 30
+    assert obj.fahrenheit == 86 # test __getattr__
+    obj.celsius = 40
+    assert obj.fahrenheit == 104
+
+    obj.fahrenheit = 86 # test __setattr__
+    assert obj.celsius == 30
+    assert obj.fahrenheit == 86
+
+    # Object model code
+    def __getattr__(self, name):
+        if name == 'fahrenheit':
+            return self.read_attr('celsius') * 9.0 / 5.0 + 32
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name == 'fahrenheit':
+            self.write_attr('celsius', (value - 32) * 5.0 / 9.0)
+        else:
+            # call the base implementation
+            OBJECT.read_attr('__setattr__')(self, name, value)
+
+    A = Class(name='A', base_class=OBJECT, 
+            fields={'__getattr__': __getattr__, '__setattr__': __setattr__}, metaclass=TYPE)
+    obj = Instance(A)
+    obj.write_attr('celsius', 30)
+    print('---')
+    assert obj.read_attr('fahrenheit') == 86 # test __getattr__
+    print(obj._fields)
+    obj.write_attr('celsius', 40)
+    assert obj.read_attr('fahrenheit') == 104
+    obj.write_attr('fahrenheit', 86) # test __setattr__
+    assert obj.read_attr('celsius') == 30
+    assert obj.read_attr('fahrenheit') == 86
+
+def test_get():
+    # Python code
+    class FahrenheitGetter(object):
+        def __get__(self, inst, cls):
+            return inst.celsius * 9.0 / 5.0 + 32
+
+    class A(object):
+        fahrenheit = FahrenheitGetter()
+    obj = A()
+    obj.celsius = 30
+    assert obj.fahrenheit == 86
+
+    # Object model code
+    class FahrenheitGetter(object):
+        # 这是一个descriptor，因为它定义了__get__()
+        def __get__(self, inst, cls):
+            return inst.read_attr('celsius') * 9.0 / 5.0 + 32
+
+    A = Class(name='A', base_class=OBJECT, 
+            fields={'fahrenheit': FahrenheitGetter()}, metaclass=TYPE)
+    obj = Instance(A)
+    obj.write_attr('celsius', 30)
+    print(obj.read_attr('fahrenheit'))
+    assert obj.read_attr('fahrenheit') == 86
+
+
+def test_maps():
+    # white box test inspecting the implementation
+    Point = Class(name='Point', base_class=OBJECT, fields={}, metaclass=TYPE)
+    p1 = Instance(Point)
+    p1.write_attr('x', 1)
+    p1.write_attr('y', 2)
+    assert p1.storage == [1, 2]
+    assert p1.map.attrs == {'x': 0, 'y': 1}
+
+
+    p2 = Instance(Point)
+    p2.write_attr('x', 5)
+    p2.write_attr('y', 6)
+    assert p1.map is p2.map
+    assert p2.storage == [5, 6]
+
+
+    p1.write_attr('x', -1)
+    p1.write_attr('y', -2)
+    assert p1.map is p2.map
+    assert p1.storage == [-1, -2]
+
+
+    p3 = Instance(Point)
+    p3.write_attr('x', 100)
+    p3.write_attr('z', -343)
+    assert p3.map is not p1.map
+    assert p3.map.attrs == {'x': 0, 'z': 1}
+
+
+def test_jit_specialize():
+    # white box test of the tracing specializer
+    global JIT
+    old_jit, JIT = JIT, Tracer(threshold=3)
+    try:
+        def f_A(self, a):
+            return self.read_attr('x') + a + self.read_attr('y')
+        A = Class(name='A', base_class=OBJECT, fields={'f': f_A}, metaclass=TYPE)
+        obj = Instance(A)
+        obj.write_attr('x', 1)
+        obj.write_attr('y', 2)
+        for i in range(5):
+            assert obj.callmethod('f', 10) == 13
+        trace = JIT.trace_of(f_A)
+        specialized = trace.specialized[obj.map]
+        assert specialized is not f_A
+        assert specialized.__wrapped__ is f_A
+        assert obj.read_attr('f').__func__ is specialized
+        assert trace.classes == {A}
+
+        # the specialized code reads the current storage
+        obj.write_attr('x', 100)
+        assert obj.callmethod('f', 10) == 112
+
+        # a bound method that outlives its map deoptimizes
+        m = obj.read_attr('f')
+        obj.write_attr('z', 0)
+        assert m(10) == 112
+        assert trace.deopts == 1
+
+        # instances with another layout get their own trace
+        p = Instance(A)
+        p.write_attr('y', 2)
+        p.write_attr('x', 1)
+        for i in range(5):
+            assert p.callmethod('f', 10) == 13
+        assert p.map is not obj.map
+        assert trace.specialized[p.map] is not specialized
+
+        # dropping the class releases its functions together with their traces
+        ref = weakref.ref(f_A)
+        del A, obj, p, m, specialized, trace, f_A
+        gc.collect()
+        assert ref() is None
+    finally:
+        JIT = old_jit
+
+
+def test_jit_keeps_generic_path():
+    global JIT
+    old_jit, JIT = JIT, Tracer(threshold=1)
+    try:
+        # fields that are not in the map still go through read_attr
+        def g_A(self):
+            return self.read_attr('c')
+        A = Class(name='A', base_class=OBJECT, fields={'g': g_A, 'c': 5}, metaclass=TYPE)
+        obj = Instance(A)
+        assert obj.callmethod('g') == 5
+        assert JIT.trace_of(g_A).specialized[obj.map] is g_A
+
+        # methods that rebind self are never specialized
+        def h_A(self):
+            self = self.read_attr('other')
+            return self
+        A.write_attr('h', h_A)
+        obj.write_attr('other', 7)
+        assert obj.callmethod('h') == 7
+        assert JIT.trace_of(h_A).unspecializable
+    finally:
+        JIT = old_jit
+
+
+def test_slots():
+    A = Class(name='A', base_class=OBJECT, fields={}, metaclass=TYPE)
+    obj = Instance(A)
+    assert not hasattr(obj, '__dict__')
+    assert not hasattr(A, '__dict__')
+    assert not hasattr(EMPTY_MAP, '__dict__')
+
+
+def test_object_space():
+    global SPACE
+    old_space, SPACE = SPACE, ObjectSpace()
+    try:
+        Point = Class(name='Point', base_class=OBJECT, fields={}, metaclass=TYPE)
+        Line = Class(name='Line', base_class=OBJECT, fields={}, metaclass=TYPE)
+        p1 = Instance(Point)
+        p1.write_attr('x', 1)
+        p1.write_attr('y', 2)
+        p2 = Instance(Point)
+        p2.write_attr('x', 1)
+        line = Instance(Line)
+        assert len(SPACE) == 3
+        assert SPACE.live_instances(Point) == [p1, p2]
+
+        report = {info['class']: info for info in SPACE.report()}
+        assert report['Point']['instances'] == 2
+        assert report['Point']['maps'] == {'x,y': 1, 'x': 1}
+        assert report['Line']['maps'] == {'': 1}
+        header = sys.getsizeof(p1) + STORAGE_SIZE
+        assert report['Point']['bytes'] == 2 * header + 3 * SLOT_SIZE
+        assert SPACE.bytes_used == 3 * header + 3 * SLOT_SIZE
+
+        # overwriting a field doesn't cost anything
+        p1.write_attr('x', 5)
+        assert SPACE.bytes_used == 3 * header + 3 * SLOT_SIZE
+
+        del p2, line
+        assert len(SPACE) == 1
+        assert SPACE.bytes_used == header + 2 * SLOT_SIZE
+    finally:
+        SPACE = old_space
+
+
+def test_object_space_budget():
+    global SPACE
+    A = Class(name='A', base_class=OBJECT, fields={}, metaclass=TYPE)
+    header = sys.getsizeof(Instance(A)) + STORAGE_SIZE
+    old_space, SPACE = SPACE, ObjectSpace(budget=header + SLOT_SIZE)
+    try:
+        obj = Instance(A)
+        obj.write_attr('x', 1)
+        try:
+            obj.write_attr('y', 2)
+        except MemoryBudgetExceeded:
+            pass
+        else:
+            assert False, 'expected MemoryBudgetExceeded'
+        # nothing changed
+        assert obj.map.attrs == {'x': 0}
+        assert obj.storage == [1]
+        try:
+            Instance(A)
+        except MemoryBudgetExceeded:
+            pass
+        else:
+            assert False, 'expected MemoryBudgetExceeded'
+        assert len(SPACE) == 1
+    finally:
+        SPACE = old_space
+
+
+def test_class_lookup_cache():
+    A = Class(name='A', base_class=OBJECT, fields={'a': 1}, metaclass=TYPE)
+    B = Class(name='B', base_class=A, fields={}, metaclass=TYPE)
+    obj = Instance(B)
+    assert obj.read_attr('a') == 1
+    # writing to a base class invalidates the caches of its subclasses
+    A.write_attr('a', 2)
+    assert obj.read_attr('a') == 2
+    B.write_attr('a', 3)
+    assert obj.read_attr('a') == 3
+    assert A.read_attr('a') == 2
+
+
+def test_snapshot():
+    def f_A(self):
+        return self.read_attr('x')
+    Point = Class(name='Point', base_class=OBJECT, fields={'f': f_A}, metaclass=TYPE)
+    Node = Class(name='Node', base_class=OBJECT, fields={}, metaclass=TYPE)
+    points = []
+    for i in range(10):
+        p = Instance(Point)
+        p.write_attr('x', i)
+        p.write_attr('y', i * 0.5)
+        points.append(p)
+    first = Instance(Node)
+    second = Instance(Node)
+    first.write_attr('next', second)
+    first.write_attr('label', 'first')
+    first.write_attr('point', points[3])
+    second.write_attr('next', first) # a cycle
+    second.write_attr('label', None)
+    second.write_attr('flags', (True, False))
+    second.write_attr('big', 2 ** 100)
+    second.write_attr('ok', True)
+    second.write_attr('same', (True, False)) # equal to flags, but a different value
+    second.write_attr('ints', (1, 0))
+    second.write_attr('floats', (1.0, -0.0))
+    second.write_attr('zeros', (1, 0.0))
+
+    import tempfile
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        save_snapshot(path, [first] + points)
+        with load_snapshot(path, {'Point': Point, 'Node': Node}) as snapshot:
+            assert len(snapshot) == 12
+            assert snapshot.materialized() == 0
+            roots = snapshot.roots
+            restored = roots[0]
+            assert restored.read_attr('label') == 'first'
+            assert restored.map is first.map # maps are shared with the live ones
+            other = restored.read_attr('next')
+            assert other.read_attr('next') is restored
+            assert other.read_attr('label') is None
+            assert other.read_attr('flags') == (True, False)
+            assert other.read_attr('big') == 2 ** 100
+            assert other.read_attr('ok') is True
+            for name in ('flags', 'same', 'ints', 'floats', 'zeros'):
+                value, expected = other.read_attr(name), second.read_attr(name)
+                assert list(map(type, value)) == list(map(type, expected)) and repr(value) == repr(expected), name
+            assert restored.read_attr('point') is roots[4]
+            for p, q in zip(points, roots[1:]):
+                assert q.storage == p.storage
+                assert q.callmethod('f') == p.read_attr('x')
+        # instances outlive the mapping
+        assert restored.read_attr('next').read_attr('big') == 2 ** 100
+
+        with load_snapshot(path, {'Point': Point, 'Node': Node}) as snapshot:
+            snapshot[len(snapshot) - 1]
+            assert snapshot.materialized() == 1 # a point doesn't refer to anything
+
+        try:
+            load_snapshot(path, {'Point': Point})
+        except SnapshotError:
+            pass
+        else:
+            assert False, 'expected SnapshotError'
+    finally:
+        os.remove(path)
+
+
+def test_threads():
+    result = run_stress(threads=6, n=400)
+    assert result['errors'] == []
+
+
+#------------------------------------------BENCHMARKS OF SIMPLE OBJECT MODEL-----------------------------------------------------
+
+# Each bench_* function builds the same little scenario twice, once with the object model
+# and once with native Python classes (like the tests above), and returns a function
+# run(n) that performs the operation n times.
+
+def bench_read_attr(native):
+    if native:
+        class A(object):
+            pass
+        obj = A()
+        obj.x = 1
+        def run(n):
+            for i in range(n):
+                obj.x
+    else:
+        A = Class(name='A', base_class=OBJECT, fields={}, metaclass=TYPE)
+        obj = Instance(A)
+        obj.write_attr('x', 1)
+        def run(n):
+            for i in range(n):
+                obj.read_attr('x')
+    return run
+
+def bench_write_attr(native):
+    if native:
+        class A(object):
+            pass
+        obj = A()
+        def run(n):
+            for i in range(n):
+                obj.x = i
+    else:
+        A = Class(name='A', base_class=OBJECT, fields={}, metaclass=TYPE)
+        obj = Instance(A)
+        def run(n):
+            for i in range(n):
+                obj.write_attr('x', i)
+    return run
+
+def bench_callmethod(native):
+    if native:
+        class A(object):
+            def f(self, a):
+                return self.x + a
+        obj = A()
+        obj.x = 1
+        def run(n):
+            for i in range(n):
+                obj.f(i)
+    else:
+        def f_A(self, a):
+            return self.read_attr('x') + a
+        A = Class(name='A', base_class=OBJECT, fields={'f': f_A}, metaclass=TYPE)
+        obj = Instance(A)
+        obj.write_attr('x', 1)
+        def run(n):
+            for i in range(n):
+                obj.callmethod('f', i)
+    return run
+
+def bench_isinstance(native):
+    if native:
+        class A(object):
+            pass
+        class B(A):
+            pass
+        obj = B()
+        def run(n):
+            for i in range(n):
+                isinstance(obj, A)
+    else:
+        A = Class(name='A', base_class=OBJECT, fields={}, metaclass=TYPE)
+        B = Class(name='B', base_class=A, fields={}, metaclass=TYPE)
+        obj = Instance(B)
+        def run(n):
+            for i in range(n):
+                obj.isinstance(A)
+    return run
+
+DEEP_HIERARCHY = 10
+
+def bench_deep_lookup(native):
+    # the attribute lives on the root of a DEEP_HIERARCHY levels deep hierarchy
+    if native:
+        cls = type('C0', (object,), {'c': 1})
+        for i in range(1, DEEP_HIERARCHY):
+            cls = type('C%d' % i, (cls,), {})
+        obj = cls()
+        def run(n):
+            for i in range(n):
+                obj.c
+    else:
+        cls = Class(name='C0', base_class=OBJECT, fields={'c': 1}, metaclass=TYPE)
+        for i in range(1, DEEP_HIERARCHY):
+            cls = Class(name='C%d' % i, base_class=cls, fields={}, metaclass=TYPE)
+        obj = Instance(cls)
+        def run(n):
+            for i in range(n):
+                obj.read_attr('c')
+    return run
+
+def bench_descriptor(native):
+    if native:
+        class FahrenheitGetter(object):
+            def __get__(self, inst, cls):
+                return inst.celsius * 9.0 / 5.0 + 32
+        class A(object):
+            fahrenheit = FahrenheitGetter()
+        obj = A()
+        obj.celsius = 30
+        def run(n):
+            for i in range(n):
+                obj.fahrenheit
+    else:
+        class FahrenheitGetter(object):
+            def __get__(self, inst, cls):
+                return inst.read_attr('celsius') * 9.0 / 5.0 + 32
+        A = Class(name='A', base_class=OBJECT, fields={'fahrenheit': FahrenheitGetter()}, metaclass=TYPE)
+        obj = Instance(A)
+        obj.write_attr('celsius', 30)
+        def run(n):
+            for i in range(n):
+                obj.read_attr('fahrenheit')
+    return run
+
+def bench_getattr_fallback(native):
+    if native:
+        class A(object):
+            def __getattr__(self, name):
+                if name == 'fahrenheit':
+                    return self.celsius * 9.0 / 5.0 + 32
+                raise AttributeError(name)
+        obj = A()
+        obj.celsius = 30
+        def run(n):
+            for i in range(n):
+                obj.fahrenheit
+    else:
+        def __getattr__(self, name):
+            if name == 'fahrenheit':
+                return self.read_attr('celsius') * 9.0 / 5.0 + 32
+            raise AttributeError(name)
+        A = Class(name='A', base_class=OBJECT, fields={'__getattr__': __getattr__}, metaclass=TYPE)
+        obj = Instance(A)
+        obj.write_attr('celsius', 30)
+        def run(n):
+            for i in range(n):
+                obj.read_attr('fahrenheit')
+    return run
+
+
+def measure(run, n, repeat):
+    ''' time run(n) 'repeat' times, then once more under tracemalloc for the memory numbers'''
+    run(min(n, 1000)) # warm up, so that the JIT and the native caches are in their steady state
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(repeat):
+            start = time.perf_counter()
+            run(n)
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        run(n)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # 两次快照之差只看得到run结束后还活着的block，临时分配又释放的数不到
+    live = sum(stat.count_diff for stat in after.compare_to(before, 'lineno') if stat.count_diff > 0)
+
+    best = min(timings)
+    return {
+        'ops_per_sec': n / best if best else float('inf'),
+        'best_sec': best,
+        'mean_sec': sum(timings) / len(timings),
+        'live_blocks': live, # blocks still alive after the run
+        'peak_bytes': peak,
+    }
+
+def run_benchmarks(n=100000, repeat=5, names=None):
+    ''' run every bench_* scenario on the object model and on native classes, return a JSON-able dict'''
+    scenarios = sorted((name[len('bench_'):], func) for name, func in globals().items()
+                       if name.startswith('bench_') and name != 'bench_main')
+    results = []
+    for name, scenario in scenarios:
+        if names and name not in names:
+            continue
+        for native in (False, True):
+            result = {'scenario': name, 'impl': 'native' if native else 'object_model'}
+            result.update(measure(scenario(native), n, repeat))
+            results.append(result)
+    return {
+        'python': sys.version.split()[0],
+        'implementation': sys.implementation.name,
+        'jit': JIT is not None,
+        'n': n,
+        'repeat': repeat,
+        'results': results,
+    }
+
+def bench_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the simple object model against native Python objects.')
+    parser.add_argument('-n', type=int, default=100000, help='operations per run')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per scenario, the best one is reported')
+    parser.add_argument('--no-jit', action='store_true', help='switch the tracing specializer off')
+    parser.add_argument('-o', '--output', help='write the JSON report to this file instead of stdout')
+    parser.add_argument('scenarios', nargs='*', help='only run these scenarios')
+    args = parser.parse_args(argv)
+
+    global JIT
+    if args.no_jit:
+        JIT = None
+    report = json.dumps(run_benchmarks(args.n, args.repeat, args.scenarios), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+def run_stress(threads=8, n=20000):
+    ''' hammer one class hierarchy from several threads at once, then check that nothing got lost.
+    Threads take turns being readers, writers (new instances and new fields on a shared one)
+    and class mutators.'''
+    def f_A(self):
+        return self.read_attr('x')
+    def g_A(self):
+        return self.read_attr('x') + 1
+    A = Class(name='A', base_class=OBJECT, fields={'f': f_A, 'version': -1}, metaclass=TYPE)
+    B = Class(name='B', base_class=A, fields={}, metaclass=TYPE)
+    shared = Instance(B)
+    shared.write_attr('x', 0)
+    names = ['a%d' % i for i in range(8)]
+
+    roles = ['reader', 'writer', 'mutator']
+    created = [[] for k in range(threads)]
+    ops = [0] * threads
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def reader(k):
+        for i in range(n):
+            if shared.read_attr('x') != 0 or shared.callmethod('f') not in (0, 1):
+                errors.append('thread %d read a wrong value' % k)
+            shared.read_attr('version')
+        ops[k] = 3 * n
+
+    def writer(k):
+        # the writers walk the same map transitions in different orders
+        order = names[k % len(names):] + names[:k % len(names)]
+        field = 't%d' % k
+        for i in range(n // len(names)):
+            obj = Instance(B)
+            for name in order:
+                obj.write_attr(name, i)
+            created[k].append(obj)
+            shared.write_attr(field, i)
+        ops[k] = (n // len(names)) * (len(names) + 1)
+
+    def mutator(k):
+        for i in range(n):
+            A.write_attr('version', i)
+            A.write_attr('f', g_A if i % 2 else f_A)
+        A.write_attr('f', f_A)
+        ops[k] = 2 * n + 1
+
+    def work(k):
+        barrier.wait()
+        try:
+            {'reader': reader, 'writer': writer, 'mutator': mutator}[roles[k % len(roles)]](k)
+        except Exception as e:
+            errors.append('thread %d: %r' % (k, e))
+
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6) # switch threads as often as possible on GIL builds
+    try:
+        workers = [threading.Thread(target=work, args=(k,)) for k in range(threads)]
+        start = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.setswitchinterval(old_interval)
+
+    # invariants
+    for k, objs in enumerate(created):
+        for i, obj in enumerate(objs):
+            if len(obj.storage) != len(obj.map.attrs) or any(obj.read_attr(name) != i for name in names):
+                errors.append('instance %d of thread %d is corrupted' % (i, k))
+                break
+        if objs and shared.read_attr('t%d' % k) != len(objs) - 1:
+            errors.append('lost a write of thread %d to the shared instance' % k)
+    if len(shared.storage) != len(shared.map.attrs):
+        errors.append('shared instance is corrupted')
+    mutators = [k for k in range(threads) if roles[k % len(roles)] == 'mutator']
+    if mutators and Instance(B).read_attr('version') != n - 1:
+        errors.append('stale class lookup cache')
+
+    import sysconfig
+    gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    return {
+        'python': sys.version.split()[0],
+        'free_threaded': bool(sysconfig.get_config_var('Py_GIL_DISABLED')),
+        'gil_enabled': gil_enabled,
+        'threads': threads,
+        'n': n,
+        'seconds': elapsed,
+        'ops_per_sec': sum(ops) / elapsed if elapsed else float('inf'),
+        'errors': errors,
+    }
+
+def stress_main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='Multi-threaded stress benchmark of the simple object model.')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('-n', type=int, default=20000, help='iterations per thread')
+    args = parser.parse_args(argv)
+    result = run_stress(args.threads, args.n)
+    print(json.dumps(result, indent=2))
+    if result['errors']:
+        sys.exit(1)
+
+
+
+def main(argv=None):
+    '''Run test_maps(); "bench" and "stress" run the benchmarks and the thread stress test.'''
+    argv = sys.argv[1:] if argv is None else argv
+    # test_read_write_field()
+    # test_read_write_field_class()
+    # test_callmethod_simple()
+    # test_callmethod_subclassing_and_arguments()
+    # test_bound_method()
+    # test_getattr()
+
+    # def clouser(func, self):
+    #     def bound(*args):
+    #         return func(self, *args)
+    #     return bound
+
+    # test_get()
+    # class A(object):
+        
+    #     def __init__(self, c=0):
+    #         self.__c = c
+
+    #     def __str__(self):
+    #         return 'A'
+
+    # a = A()
+    # b = A()
+    # a.x = 1
+    # b.y = 2
+    # print(hasattr(a, '_A__c'))
+    # print(a.__str__())
+
+    if argv[:1] == ['bench']:
+        # python -m five_hundred_lines.simple_object_model bench [-n N] [--repeat R] [-o report.json] [scenario ...]
+        bench_main(argv[1:])
+    elif argv[:1] == ['stress']:
+        # python -m five_hundred_lines.simple_object_model stress [--threads N] [-n N]
+        stress_main(argv[1:])
+    else:
+        test_maps()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+'''Importing the package must be cheap and quiet: python -m pytest -q five_hundred_lines'''
+
+import subprocess
+import sys
+
+import five_hundred_lines
+from five_hundred_lines.benchmark import ROOT, measure_import
+
+# 每个模块（连同它导入的标准库）-X importtime的cumulative上限，秒
+IMPORT_BUDGET_SEC = 0.1
+
+
+def _run(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def test_import_has_no_side_effects():
+    for name in five_hundred_lines.__all__:
+        process = _run('import logging, five_hundred_lines.%s as m; '
+                       'assert not logging.root.handlers, "logging was configured"' % name)
+        assert process.stdout == '' and process.stderr == '', (name, process.stdout, process.stderr)
+
+
+def test_submodules_are_lazy():
+    process = _run('import sys, five_hundred_lines; '
+                   'print(sorted(m for m in sys.modules if m.startswith("five_hundred_lines."))); '
+                   'five_hundred_lines.simple_object_model; '
+                   'print(sorted(m for m in sys.modules if m.startswith("five_hundred_lines.")))')
+    before, after = process.stdout.splitlines()
+    assert before == '[]'
+    assert after == "['five_hundred_lines.simple_object_model']"
+
+
+def test_import_time_budget():
+    for name in five_hundred_lines.__all__:
+        module = 'five_hundred_lines.' + name
+        seconds = measure_import(module, repeat=3)
+        assert seconds is not None and seconds < IMPORT_BUDGET_SEC, (module, seconds)